@@ -1,121 +1,831 @@
+import asyncio
+import base64
+import hashlib
+import hmac
 import os
-import json
-from flask import Flask, render_template, request, jsonify
-from fireworks import LLM
+import mimetypes
+import re
+import secrets
+import threading
+import time
+from functools import lru_cache
+from flask import Blueprint, Flask, Response, current_app, g, render_template, request, jsonify, send_from_directory, stream_with_context
 from dotenv import load_dotenv
+import assets
+import metrics
+import responses
+from cancellation import DEADLINE_HEADER, RequestCancelledError, client_timeout, count_cancellation, request_scope, wsgi_disconnect_check
+from conversation_history import ConversationHistory
+from conversation_store import SessionLocks, create_conversation_store, create_transcript_store
+from intents import create_faq_responder
+from llm_backends import create_llm_backend
+from prompt_budget import PromptTooLongError, count_tokens, create_prompt_budget, prompt_tokens
+from rate_limiter import API_KEY_HEADER, RateLimitedError, create_rate_limiter
+from resilience import UpstreamError
+from response_cache import cache_key, create_response_cache
+from scheduler import AsyncRequestScheduler, RequestScheduler, SchedulerBusyError, scheduler_settings
+from summarizer import create_summarizer
+from warm_answers import create_warm_answers
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
+# Routes live on a blueprint so create_app() can build the application on demand
+main = Blueprint('main', __name__)
+
+# Cookie identifying the caller's conversation; session ids are random and opaque, and the
+# cookie carries them signed ("<id>.<signature>") so clients can't make up their own
+SESSION_COOKIE = 'intellimind_session'
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+DEFAULT_SESSION_ID = 'default'
+# Where the session signing key is kept when SECRET_KEY isn't set, shared by the workers on the node
+SECRET_KEY_FILE = os.getenv('SECRET_KEY_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.secret_key'))
+
+# Send a one-token request when a worker starts so its first user doesn't pay the cold start
+LLM_WARMUP = os.getenv('LLM_WARMUP', 'false').lower() in ('1', 'true', 'yes')
+LLM_WARMUP_ATTEMPTS = 3
 
 class IntelliMindAssistant:
     """IntelliMind Assistant - A smart AI assistant using Sentient models and FireworksAI"""
     
-    def __init__(self):
-        self.api_key = os.getenv('FIREWORKS_API_KEY')
-        if not self.api_key:
-            raise ValueError("FIREWORKS_API_KEY environment variable is required")
+    def __init__(self, store=None, cache=None, backend=None):
+        # Model backend (FireworksAI by default, see LLM_BACKEND), built on the first LLM request
+        self._llm = backend
+        self._llm_lock = threading.Lock()
         
-        # Initialize FireworksAI LLM with Sentient-compatible model
-        self.llm = LLM(
-            model="llama-v3p1-8b-instruct",  # Using a model compatible with Sentient framework
-            api_key=self.api_key,
-            deployment_type="auto"  # Required parameter for FireworksAI
-        )
+        # Prompt sizing: how much history fits the model's context, and the completion size cap
+        self.budget = create_prompt_budget()
+        
+        # Sampling parameters shared by every completion request (max_tokens is the upper bound)
+        self.generation_params = {"max_tokens": self.budget.max_output_tokens, "temperature": 0.7}
+        
+        # Conversation context for maintaining state, keyed by session
+        self.store = store or create_conversation_store()
+        # Threaded and gevent workers run a session's requests concurrently; its updates take turns
+        self.session_locks = SessionLocks()
+        # Every turn of each conversation, not just the window, for exports (None when disabled)
+        self.transcript_max_messages = int(os.getenv("CONVERSATION_TRANSCRIPT_MESSAGES", "1000"))
+        self.transcripts = create_transcript_store(self.transcript_max_messages)
+        
+        # Optional cache of responses to repeated prompts (None when disabled)
+        self.cache = cache if cache is not None else create_response_cache()
+        
+        # Canned answers to FAQ questions, served without an upstream call (None when disabled)
+        self.faq = create_faq_responder()
         
-        # Conversation context for maintaining state
-        self.conversation_history = []
+        # Rolling summary of turns that fell out of the window, updated in the background
+        # (the demo responder can't summarize, so it runs without one)
+        self.summarizer = None
+        if self.backend_name != 'demo':
+            self.summarizer = create_summarizer(self.generate_background)
         
-    def process_message(self, user_message):
-        """Process user message using Sentient-inspired logic and FireworksAI"""
+        # Documentation and earlier-turn retrieval, built on first use so startup doesn't load NumPy
+        self._retriever = None
+        self._retriever_loaded = False
+        self._retriever_lock = threading.Lock()
+        
+        # Optional per-tenant request rate limit and upstream token accounting (None when disabled)
+        self.limiter = create_rate_limiter()
+        
+        # Upstream call scheduling: single-flight, concurrency limit and fair queuing
+        self.scheduler = RequestScheduler(**scheduler_settings())
+        self.async_scheduler = AsyncRequestScheduler(**scheduler_settings())
+        
+        # Answers to common openers (and, optionally, likely next turns) prepared in the background
+        # (pointless for the instant demo responder)
+        self.warm = None
+        if self.backend_name != 'demo':
+            self.warm = create_warm_answers(self.warm_prompt, self.generate_background)
+        
+    @property
+    def llm(self):
+        """The model backend, created on first use so startup never imports the SDK or needs an API key"""
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    self._llm = create_llm_backend()
+        return self._llm
+    
+    @property
+    def llm_loaded(self):
+        return self._llm is not None
+    
+    @property
+    def retriever(self):
+        """The retriever, created on first use (None when RETRIEVAL is off or NumPy isn't installed)"""
+        if not self._retriever_loaded:
+            with self._retriever_lock:
+                if not self._retriever_loaded:
+                    try:
+                        from retrieval import create_retriever
+                        self._retriever = create_retriever()
+                    except ImportError as e:
+                        print(f"⚠️  Retrieval disabled: {e}")
+                    self._retriever_loaded = True
+        return self._retriever
+    
+    @property
+    def backend_name(self):
+        """Name of the model backend, without building it"""
+        if self._llm is not None:
+            return self._llm.name
+        return os.getenv('LLM_BACKEND', 'fireworks').lower()
+    
+    def build_messages(self, history, session_id=DEFAULT_SESSION_ID):
+        """Build the message list sent to the model, and its generation parameters, from the conversation history"""
+        system_messages = [
+            {
+                "role": "system", 
+                "content": "You are IntelliMind Assistant, an advanced AI assistant powered by Sentient's framework and FireworksAI. You provide helpful, intelligent, and context-aware responses. Maintain conversation context and be conversational yet informative."
+            }
+        ]
+        
+        # Older turns reach the model as a compact summary instead of verbatim
+        if self.summarizer is not None:
+            summary = self.summarizer.load(session_id)
+            if summary is not None:
+                system_messages.append(summary)
+        
+        # Documentation passages and earlier turns relevant to the new message
+        window = history.window()
+        if self.retriever is not None and window and window[-1]["role"] == "user":
+            with metrics.STAGE_SECONDS.time(stage='retrieval'):
+                context = self.retriever.context_message(window[-1]["content"], session_id)
+            if context is not None:
+                system_messages.append(context)
+        
+        # Add the longest slice of the conversation window that fits the model's context,
+        # and let the completion use the space that is left (up to the configured cap)
+        messages, max_tokens, prompt_tokens = self.budget.fit(system_messages, window)
+        params = dict(self.generation_params, max_tokens=max_tokens)
+        return messages, params, prompt_tokens
+    
+    def warm_prompt(self, session_id, history, user_message):
+        """Messages and parameters a turn would send for user_message after history"""
+        turn = ConversationHistory(history)
+        turn.append({"role": "user", "content": user_message})
+        # Openers are prepared for no session in particular; this one never has a summary or memory
+        messages, params, _ = self.build_messages(turn, session_id or 'warm-answers')
+        return messages, params
+    
+    def upstream_idle(self):
+        """Whether nobody is waiting for an upstream slot and at most half the slots are busy"""
+        running = self.scheduler.running + self.async_scheduler.running
+        queued = self.scheduler.queued + self.async_scheduler.queued
+        return not queued and running < max(1, self.scheduler.max_concurrency // 2)
+    
+    def start_turn(self, user_message, session_id):
+        """Load the session history, add the user message and build the prompt"""
+        with metrics.STAGE_SECONDS.time(stage='prompt_assembly'):
+            history = ConversationHistory(self.store.load(session_id))
+            history.append({"role": "user", "content": user_message})
+            messages, params, prompt_tokens = self.build_messages(history, session_id)
+        
+        metrics.HISTORY_WINDOW_MESSAGES.observe(sum(1 for message in messages if message["role"] != "system"))
+        metrics.TOKENS_IN.observe(prompt_tokens)
+        return history, messages, params
+    
+    def finish_turn(self, session_id, history, assistant_response):
+        """Record the assistant response in the session history"""
+        with self.session_locks(session_id):
+            # Another request of this session may have finished a turn since this one loaded the
+            # history; build on the stored copy so neither turn overwrites the other
+            stored = self.store.load(session_id)
+            if stored != history.base:
+                history = history.rebase(stored)
+            history.append({"role": "assistant", "content": assistant_response})
+            self.store.save(session_id, history.to_list())
+            if self.transcripts is not None:
+                self.transcripts.append(session_id, history.added, self.transcript_max_messages)
+        
+        # Fold the turns this one pushed out of the window into the summary, off the request path
+        if self.summarizer is not None:
+            self.summarizer.submit(session_id, history.evicted)
+        
+        # ...and make them retrievable by what they said, not only through the summary
+        if history.evicted and self.retriever is not None:
+            self.retriever.remember(session_id, history.evicted)
+        
+        # High-value sessions get their likely next turn prepared while the upstream is idle
+        if self.warm is not None:
+            self.warm.turn_finished(session_id, history.to_list())
+    
+    def record_usage(self, tenant, messages, assistant_response):
+        """Charge an upstream generation's tokens to the tenant that asked for it"""
+        if self.limiter is not None and tenant is not None:
+            self.limiter.record_usage(tenant, prompt_tokens(messages), count_tokens(assistant_response))
+    
+    def instant_response(self, user_message, messages, params, session_id, history):
+        """A response that needs no upstream call: an FAQ answer, a prepared answer or a cached response"""
+        if self.faq is not None:
+            answer = self.faq.answer(user_message)
+            if answer is not None:
+                intent, response = answer
+                metrics.FAQ_ANSWERS.inc(intent=intent)
+                return response
+        if self.warm is not None:
+            # The history before this turn's user message
+            response = self.warm.answer(session_id, history.to_list()[:-1], user_message)
+            if response is not None:
+                return response
+        return self.cached_response(messages, params)
+    
+    def cached_response(self, messages, params):
+        """Return a cached response for this prompt, if the cache is enabled and has one"""
+        if self.cache is None:
+            return None
+        return self.cache.get(messages, params)
+    
+    def cache_response(self, messages, params, assistant_response):
+        """Remember a freshly generated response for this prompt"""
+        if self.cache is not None:
+            self.cache.set(messages, params, assistant_response)
+    
+    def generate(self, messages, params):
+        """Call the model backend, recording upstream latency and completion size"""
+        with metrics.UPSTREAM_SECONDS.time(backend=self.llm.name, mode='complete'):
+            assistant_response = self.llm.complete(messages, **params)
+        metrics.TOKENS_OUT.observe(count_tokens(assistant_response))
+        return assistant_response
+    
+    def generate_turn(self, messages, params, tenant):
+        """generate() for a turn, charging the tenant and caching the response
+
+        Run by whichever request leads a single-flight call, so a shared upstream
+        call is charged (and cached) once, to the tenant that made it.
+        """
+        assistant_response = self.generate(messages, params)
+        self.record_generation(tenant, messages, params, assistant_response)
+        return assistant_response
+    
+    def record_generation(self, tenant, messages, params, assistant_response):
+        """Charge a fresh response's tokens to the tenant and cache it"""
+        self.record_usage(tenant, messages, assistant_response)
+        self.cache_response(messages, params, assistant_response)
+    
+    def generate_stream(self, messages, params):
+        """Stream tokens from the model backend, recording time-to-first-token and latency"""
+        start = time.perf_counter()
+        tokens = 0
+        for token in self.llm.stream(messages, **params):
+            if not tokens:
+                metrics.UPSTREAM_TTFT_SECONDS.observe(time.perf_counter() - start, backend=self.llm.name)
+            tokens += 1
+            yield token
+        metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, backend=self.llm.name, mode='stream')
+        metrics.TOKENS_OUT.observe(tokens)
+    
+    def generate_background(self, messages, params, tenant=None):
+        """generate() at low priority, for prepared answers: raises SchedulerBusyError unless the upstream is idle"""
+        # The sync scheduler's slot is taken either way; the ASGI path's requests count as load too
+        if not self.upstream_idle():
+            raise SchedulerBusyError("The model is busy; background work waits for an idle moment")
+        with self.scheduler.background_slot():
+            assistant_response = self.generate(messages, params)
+        self.record_usage(tenant, messages, assistant_response)
+        return assistant_response
+    
+    async def agenerate(self, messages, params):
+        """Awaitable generate()"""
+        with metrics.UPSTREAM_SECONDS.time(backend=self.llm.name, mode='complete'):
+            assistant_response = await self.llm.acomplete(messages, **params)
+        metrics.TOKENS_OUT.observe(count_tokens(assistant_response))
+        return assistant_response
+    
+    async def agenerate_turn(self, messages, params, tenant):
+        """Awaitable generate_turn()"""
+        assistant_response = await self.agenerate(messages, params)
+        await asyncio.to_thread(self.record_generation, tenant, messages, params, assistant_response)
+        return assistant_response
+    
+    async def agenerate_stream(self, messages, params):
+        """Async generator variant of generate_stream()"""
+        start = time.perf_counter()
+        tokens = 0
+        async for token in self.llm.astream(messages, **params):
+            if not tokens:
+                metrics.UPSTREAM_TTFT_SECONDS.observe(time.perf_counter() - start, backend=self.llm.name)
+            tokens += 1
+            yield token
+        metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, backend=self.llm.name, mode='stream')
+        metrics.TOKENS_OUT.observe(tokens)
+    
+    def process_message(self, user_message, session_id=DEFAULT_SESSION_ID, tenant=None, shortcuts=True):
+        """Process user message using Sentient-inspired logic and FireworksAI
+
+        With shortcuts=False the answer always comes from the model, never from the FAQ,
+        prepared answers or the response cache (batch evaluation runs).
+        """
         try:
-            # Add user message to conversation history
-            self.conversation_history.append({"role": "user", "content": user_message})
+            # Add user message to conversation history and prepare messages for the API
+            history, messages, params = self.start_turn(user_message, session_id)
             
-            # Prepare messages for the API (including conversation context)
-            messages = [
-                {
-                    "role": "system", 
-                    "content": "You are IntelliMind Assistant, an advanced AI assistant powered by Sentient's framework and FireworksAI. You provide helpful, intelligent, and context-aware responses. Maintain conversation context and be conversational yet informative."
-                }
-            ]
-            
-            # Add conversation history (limit to last 10 messages to avoid token limits)
-            messages.extend(self.conversation_history[-10:])
-            
-            # Generate response using FireworksAI
-            response = self.llm.chat.completions.create(
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7
-            )
-            
-            assistant_response = response.choices[0].message.content
+            assistant_response = None
+            if shortcuts:
+                assistant_response = self.instant_response(user_message, messages, params, session_id, history)
+            if assistant_response is None:
+                # Generate response using FireworksAI, sharing the call with identical in-flight prompts
+                assistant_response = self.scheduler.run(
+                    session_id,
+                    cache_key(messages, params),
+                    lambda: self.generate_turn(messages, params, tenant)
+                )
             
             # Add assistant response to conversation history
-            self.conversation_history.append({"role": "assistant", "content": assistant_response})
+            self.finish_turn(session_id, history, assistant_response)
             
             return assistant_response
             
         except Exception as e:
-            return f"I apologize, but I encountered an error: {str(e)}. Please try again."
+            # Errors reach the route, which answers with the matching HTTP status
+            metrics.ERRORS.inc(type=type(e).__name__)
+            raise
     
-    def clear_conversation(self):
+    def process_message_stream(self, user_message, session_id=DEFAULT_SESSION_ID, tenant=None):
+        """Process user message and yield response tokens as FireworksAI produces them"""
+        history, messages, params = self.start_turn(user_message, session_id)
+        
+        cached = self.instant_response(user_message, messages, params, session_id, history)
+        if cached is not None:
+            yield cached
+            self.finish_turn(session_id, history, cached)
+            return
+        
+        tokens = []
+        try:
+            with self.scheduler.slot(session_id):
+                for token in self.generate_stream(messages, params):
+                    tokens.append(token)
+                    yield token
+        finally:
+            # A cancelled stream still used the tokens generated so far
+            self.record_usage(tenant, messages, "".join(tokens))
+        
+        # Only a completed generation goes into the conversation history
+        assistant_response = "".join(tokens)
+        self.cache_response(messages, params, assistant_response)
+        self.finish_turn(session_id, history, assistant_response)
+    
+    async def process_message_async(self, user_message, session_id=DEFAULT_SESSION_ID, tenant=None):
+        """Awaitable process_message for the ASGI app; waits on FireworksAI without blocking
+
+        Store reads and writes, retrieval scoring and the cache run in threads
+        (asyncio.to_thread), never on the event loop.
+        """
+        try:
+            history, messages, params = await asyncio.to_thread(self.start_turn, user_message, session_id)
+            assistant_response = await asyncio.to_thread(
+                self.instant_response, user_message, messages, params, session_id, history)
+            if assistant_response is None:
+                assistant_response = await self.async_scheduler.run(
+                    session_id,
+                    cache_key(messages, params),
+                    lambda: self.agenerate_turn(messages, params, tenant)
+                )
+            await asyncio.to_thread(self.finish_turn, session_id, history, assistant_response)
+            return assistant_response
+            
+        except Exception as e:
+            metrics.ERRORS.inc(type=type(e).__name__)
+            raise
+    
+    async def process_message_stream_async(self, user_message, session_id=DEFAULT_SESSION_ID, tenant=None):
+        """Async generator variant of process_message_stream for the ASGI app (blocking work runs in threads)"""
+        history, messages, params = await asyncio.to_thread(self.start_turn, user_message, session_id)
+        
+        cached = await asyncio.to_thread(self.instant_response, user_message, messages, params, session_id, history)
+        if cached is not None:
+            yield cached
+            await asyncio.to_thread(self.finish_turn, session_id, history, cached)
+            return
+        
+        tokens = []
+        try:
+            async with self.async_scheduler.slot(session_id):
+                async for token in self.agenerate_stream(messages, params):
+                    tokens.append(token)
+                    yield token
+        finally:
+            # Not awaited: this also runs when the stream is cancelled, which must not wait any longer
+            asyncio.get_running_loop().run_in_executor(None, self.record_usage, tenant, messages, "".join(tokens))
+        
+        assistant_response = "".join(tokens)
+        await asyncio.to_thread(self.cache_response, messages, params, assistant_response)
+        await asyncio.to_thread(self.finish_turn, session_id, history, assistant_response)
+    
+    def iter_transcript(self, session_id):
+        """Yield the session's whole conversation, oldest first (only the window without a transcript store)"""
+        store = self.transcripts if self.transcripts is not None else self.store
+        return store.iter_messages(session_id)
+    
+    def clear_conversation(self, session_id=DEFAULT_SESSION_ID):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.store.clear(session_id)
+        if self.transcripts is not None:
+            self.transcripts.clear(session_id)
+        if self.summarizer is not None:
+            self.summarizer.clear(session_id)
+        if self._retriever is not None:
+            self._retriever.forget(session_id)
+        if self.warm is not None:
+            self.warm.forget(session_id)
         return "Conversation history cleared."
 
 # Initialize the assistant
 assistant = IntelliMindAssistant()
 
-@app.route('/')
+# Per-worker gauges, read whenever metrics are collected
+metrics.CONVERSATION_SESSIONS.set_function(assistant.store.session_count)
+metrics.CONVERSATION_BYTES.set_function(lambda: getattr(assistant.store, 'total_bytes', 0))
+metrics.SCHEDULER_QUEUE_DEPTH.set_function(lambda: assistant.scheduler.queued + assistant.async_scheduler.queued)
+metrics.SCHEDULER_RUNNING.set_function(lambda: assistant.scheduler.running + assistant.async_scheduler.running)
+metrics.SUMMARY_PENDING.set_function(lambda: assistant.summarizer.pending if assistant.summarizer else 0)
+
+def start_llm_client():
+    """With LLM_WARMUP, build and warm this worker's LLM client in the background after the fork"""
+    if not LLM_WARMUP:
+        # The client is built on the first LLM request instead
+        return
+    
+    def warm_up():
+        for attempt in range(LLM_WARMUP_ATTEMPTS):
+            try:
+                assistant.llm.start(warm_up=True)
+                return
+            except Exception as e:
+                print(f"⚠️  LLM warm-up attempt {attempt + 1} failed: {e}")
+                time.sleep(2 ** attempt)
+    
+    threading.Thread(target=warm_up, name='llm-warmup', daemon=True).start()
+
+def start_warm_answers():
+    """Start preparing opener answers as soon as the worker boots, instead of on its first chat"""
+    if assistant.warm is not None:
+        assistant.warm.start()
+
+def llm_ready():
+    """Whether this worker can serve chats without a cold start"""
+    if not LLM_WARMUP:
+        return True
+    return assistant.llm_loaded and assistant.llm.warm
+
+def llm_status():
+    """Model client state for /health; never builds the client itself"""
+    loaded = assistant.llm_loaded
+    status = {'loaded': loaded, 'warm': loaded and assistant.llm.warm, 'ready': llm_ready()}
+    if loaded and hasattr(assistant.llm, 'stats'):
+        status['circuit_breakers'] = assistant.llm.stats()
+    return status
+
+@lru_cache(maxsize=None)
+def secret_key():
+    """SECRET_KEY, or a random key created once in SECRET_KEY_FILE"""
+    if os.getenv('SECRET_KEY'):
+        return os.getenv('SECRET_KEY').encode('utf-8')
+    try:
+        with open(SECRET_KEY_FILE, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    # Written aside and linked into place, so concurrently starting workers all end up with the same key
+    temp_path = f"{SECRET_KEY_FILE}.{os.getpid()}.tmp"
+    descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'wb') as f:
+        f.write(secrets.token_bytes(32))
+    try:
+        os.link(temp_path, SECRET_KEY_FILE)
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(temp_path)
+    with open(SECRET_KEY_FILE, 'rb') as f:
+        return f.read()
+
+def session_signature(session_id):
+    digest = hmac.new(secret_key(), session_id.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode('ascii')
+
+def sign_session_id(session_id):
+    """Cookie value for a session id"""
+    return f"{session_id}.{session_signature(session_id)}"
+
+def verified_session_id(cookie):
+    """The session id in a cookie value, or None unless the server issued it"""
+    session_id, _, signature = (cookie or '').partition('.')
+    if not SESSION_ID_PATTERN.match(session_id):
+        return None
+    if not hmac.compare_digest(signature.encode('ascii', 'replace'), session_signature(session_id).encode('ascii')):
+        return None
+    return session_id
+
+def get_session_id():
+    """Return the caller's conversation session id, or a new one (issued by check_rate_limit())"""
+    # Unsigned or forged ids get a new session, which is rate limited by address until it's issued
+    session_id = verified_session_id(request.cookies.get(SESSION_COOKIE))
+    if session_id is None:
+        session_id = request.environ.setdefault('intellimind.new_session', secrets.token_urlsafe(24))
+    return session_id
+
+def check_rate_limit(session_id):
+    """Spend one request of the caller's allowance, then issue the session if it's new
+
+    Returns the tenant to charge (None without a limiter). Only chat requests
+    call this, so 429s and the other routes never hand out a session.
+    """
+    tenant = None
+    if assistant.limiter is not None:
+        # A session id issued just now says nothing about the caller, so it is limited by address
+        new_session = request.environ.get('intellimind.new_session') == session_id
+        forwarded_for = request.headers.get('X-Forwarded-For')
+        tenant = assistant.limiter.tenant(
+            None if new_session else session_id,
+            request.remote_addr,
+            forwarded_for=forwarded_for,
+            api_key=request.headers.get(API_KEY_HEADER),
+        )
+        assistant.limiter.check(tenant, assistant.limiter.address(request.remote_addr, forwarded_for))
+    request.environ['intellimind.issue_session'] = True
+    return tenant
+
+def mark_high_value(session_id, tenant):
+    """Have the next turns prepared in advance (charged to tenant) for sessions presenting a high-value API key"""
+    if assistant.warm is not None:
+        assistant.warm.mark_high_value(session_id, request.headers.get(API_KEY_HEADER), tenant)
+
+def rate_limited_response(error):
+    """429 response telling the client when to retry"""
+    response = jsonify({'error': str(error), 'retry_after': error.retry_after})
+    response.status_code = error.status_code
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+@main.before_app_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@main.after_app_request
+def record_request_metrics(response):
+    """Count the request and its latency (for streams: time until the stream starts)"""
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if 'request_start' in g:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    metrics.REGISTRY.flush()
+    return response
+
+@main.after_app_request
+def set_session_cookie(response):
+    """Hand newly issued session ids back to the browser"""
+    new_session = request.environ.get('intellimind.new_session')
+    if new_session and request.environ.get('intellimind.issue_session'):
+        response.set_cookie(SESSION_COOKIE, sign_session_id(new_session), httponly=True, samesite='Lax')
+    return response
+
+# Rendered pages, per worker: their templates take no per-request data.
+# template -> (asset manifest version, html), since pages link to the built assets
+rendered_pages = {}
+
+def render_page(template):
+    """Serve a static page, rendered once per asset build (on every request in debug mode) and revalidated by ETag"""
+    assets.manifest.refresh()
+    version = assets.manifest.version
+    rendered_version, html = rendered_pages.get(template, (None, None))
+    if rendered_version != version or current_app.debug:
+        html = render_template(template)
+        rendered_pages[template] = (version, html)
+    response = Response(html, mimetype='text/html')
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@main.app_template_global()
+def asset_url(filename):
+    """URL of a static asset: the fingerprinted build, or the source in debug mode"""
+    if current_app.debug:
+        return '/static/' + filename
+    return assets.asset_url(filename)
+
+@main.after_app_request
+def compress_response(response):
+    """Compress complete text and JSON responses the client accepts in gzip or brotli"""
+    # Streams (SSE, exports) and files are left alone; exports compress themselves as they go
+    if (response.direct_passthrough or response.is_streamed or request.method == 'HEAD'
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or not responses.compressible(response.mimetype, response.content_length)):
+        return response
+    encoding = responses.choose_encoding(request.headers.get('Accept-Encoding'))
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+    response.set_data(responses.compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    if 'ETag' in response.headers:
+        response.headers['ETag'] = responses.weak_etag(response.headers['ETag'])
+    return response
+
+@main.route('/static/<path:filename>')
+def static_asset(filename):
+    """Static files; built assets are sent precompressed and cached by browsers for good"""
+    path, encoding = assets.manifest.variant(filename, request.headers.get('Accept-Encoding'))
+    immutable = assets.manifest.is_immutable(filename)
+    response = send_from_directory(
+        assets.STATIC_DIR, path,
+        mimetype=mimetypes.guess_type(filename)[0],
+        max_age=assets.IMMUTABLE_MAX_AGE if immutable else None,
+    )
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@main.route('/')
 def index():
     """Main page"""
-    return render_template('index.html')
+    return render_page('index.html')
 
-@app.route('/chat', methods=['POST'])
+@main.route('/chat', methods=['POST'])
 def chat():
     """Handle chat messages"""
     try:
-        data = request.get_json()
-        user_message = data.get('message', '')
+        # Over-limit callers are turned away before any work is done
+        session_id = get_session_id()
+        tenant = check_rate_limit(session_id)
+        mark_high_value(session_id, tenant)
+        
+        with metrics.STAGE_SECONDS.time(stage='request_parsing'):
+            data = request.get_json()
+            user_message = data.get('message', '')
         
         if not user_message.strip():
             return jsonify({'error': 'Message cannot be empty'}), 400
         
-        # Process the message
-        response = assistant.process_message(user_message)
+        # Process the message, under the client's deadline and abandoning it if the client disconnects
+        timeout = client_timeout(request.headers.get(DEADLINE_HEADER))
+        with request_scope(timeout, wsgi_disconnect_check(request.environ)):
+            response = assistant.process_message(user_message, session_id, tenant)
         
-        return jsonify({
-            'response': response,
-            'status': 'success'
-        })
+        with metrics.STAGE_SECONDS.time(stage='response_serialization'):
+            return jsonify({
+                'response': response,
+                'status': 'success'
+            })
         
+    except RateLimitedError as e:
+        return rate_limited_response(e)
+    except PromptTooLongError as e:
+        return jsonify({'error': str(e)}), 413
+    except RequestCancelledError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except SchedulerBusyError as e:
+        return jsonify({'error': str(e)}), 503
+    except UpstreamError as e:
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/clear', methods=['POST'])
+def sse_event(data, event=None):
+    """Format a payload as a Server-Sent Events frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {responses.dumps(data)}\n\n"
+
+@main.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Handle chat messages, streaming response tokens as Server-Sent Events"""
+    session_id = get_session_id()
+    try:
+        tenant = check_rate_limit(session_id)
+    except RateLimitedError as e:
+        return rate_limited_response(e)
+    mark_high_value(session_id, tenant)
+    
+    with metrics.STAGE_SECONDS.time(stage='request_parsing'):
+        data = request.get_json(silent=True) or {}
+        user_message = data.get('message', '')
+    
+    if not user_message.strip():
+        return jsonify({'error': 'Message cannot be empty'}), 400
+    
+    timeout = client_timeout(request.headers.get(DEADLINE_HEADER))
+    disconnected = wsgi_disconnect_check(request.environ)
+    
+    def generate():
+        with request_scope(timeout, disconnected):
+            try:
+                for token in assistant.process_message_stream(user_message, session_id, tenant):
+                    yield sse_event({'token': token})
+                yield sse_event({'status': 'success'}, event='done')
+            except GeneratorExit:
+                # The server closes the response when a write to the client fails; closing
+                # the generator chain cancels the upstream stream (see ResilientBackend.stream)
+                count_cancellation('client_disconnect', 'stream')
+                raise
+            except Exception as e:
+                metrics.ERRORS.inc(type=type(e).__name__)
+                yield sse_event({'error': str(e)}, event='error')
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Stop nginx from buffering the stream before it reaches the browser
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@main.route('/clear', methods=['POST'])
 def clear_chat():
     """Clear conversation history"""
     try:
-        assistant.clear_conversation()
+        assistant.clear_conversation(get_session_id())
         return jsonify({'status': 'success', 'message': 'Conversation cleared'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/updates')
+@main.route('/history/export')
+def export_history():
+    """Download the caller's whole conversation as JSON, streamed one message at a time"""
+    session_id = get_session_id()
+    
+    def generate():
+        yield b'{"messages":['
+        for i, message in enumerate(assistant.iter_transcript(session_id)):
+            yield (b',' if i else b'') + responses.dump_bytes(message)
+        yield b']}'
+    
+    body = generate()
+    encoding = responses.choose_encoding(request.headers.get('Accept-Encoding'))
+    headers = {
+        'Content-Disposition': 'attachment; filename="intellimind-conversation.json"',
+        'Cache-Control': 'no-store',
+        'Vary': 'Accept-Encoding',
+    }
+    if encoding:
+        body = responses.compress_stream(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(stream_with_context(body), mimetype='application/json', headers=headers)
+
+@main.route('/updates')
 def updates():
     """Update log page"""
-    return render_template('updates.html')
+    return render_page('updates.html')
 
-@app.route('/health')
+@main.route('/health')
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'app': 'IntelliMind Assistant'})
+    status = {
+        'status': 'healthy',
+        'app': 'IntelliMind Assistant',
+        'backend': assistant.backend_name,
+        'scheduler': assistant.scheduler.stats()
+    }
+    if assistant.cache is not None:
+        status['response_cache'] = assistant.cache.stats()
+    # Only the log store has maintenance state worth watching (segments, compactions, recovery)
+    if hasattr(assistant.store, 'stats'):
+        status['conversation_log'] = assistant.store.stats()
+    status['llm'] = llm_status()
+    return jsonify(status)
+
+@main.route('/ready')
+def ready():
+    """Readiness check: 503 until the worker's LLM client is warm (see LLM_WARMUP)"""
+    if not llm_ready():
+        return jsonify({'status': 'warming', 'ready': False}), 503
+    return jsonify({'status': 'ready', 'ready': True})
+
+@main.route('/stats')
+def stats():
+    """Rate limiting counters, per-tenant upstream token usage and warm-answer state"""
+    return jsonify({
+        'rate_limit': assistant.limiter.stats() if assistant.limiter is not None else None,
+        'warm_answers': assistant.warm.stats() if assistant.warm is not None else None,
+    })
+
+@main.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def create_app():
+    """Build the Flask application; the model client is created on the first LLM request"""
+    # Static files are served by the blueprint, which knows about the built assets
+    app = Flask(__name__, static_folder=None)
+    app.json = responses.CompactJSONProvider(app)
+    app.register_blueprint(main)
+    return app
+
+# Default WSGI entry point (gunicorn app:app)
+app = create_app()
 
 if __name__ == '__main__':
     print("🧠 IntelliMind Assistant Starting...")
+    print(f"🤖 LLM backend: {assistant.backend_name}")
     print("🔗 Powered by Sentient's framework and FireworksAI")
     print("🌐 Access the web interface at: http://localhost:5000")
+    start_llm_client()
     app.run(debug=True, host='0.0.0.0', port=5000)
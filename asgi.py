@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+IntelliMind Assistant - ASGI Entry Point
+Async variant of the routes in app.py. Requests wait on FireworksAI without
+holding a worker, so a single process can serve hundreds of concurrent chats.
+
+Run with:  uvicorn asgi:app --host 0.0.0.0 --port 5000
+The sync app:app entry point in app.py stays available for gunicorn.
+"""
+
+import asyncio
+import hashlib
+import mimetypes
+import os
+import secrets
+import time
+from starlette.applications import Starlette
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware import Middleware
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import HTMLResponse, JSONResponse as StarletteJSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+
+import assets
+import metrics
+import responses
+from app import (SESSION_COOKIE, assistant, llm_ready, llm_status, sign_session_id, sse_event, start_llm_client,
+                 start_warm_answers, verified_session_id)
+from cancellation import DEADLINE_HEADER, RequestCancelledError, client_timeout, count_cancellation, request_scope
+from prompt_budget import PromptTooLongError
+from rate_limiter import API_KEY_HEADER, RateLimitedError
+from resilience import UpstreamError
+from scheduler import SchedulerBusyError
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class JSONResponse(StarletteJSONResponse):
+    """Compact JSON, via orjson when it is installed"""
+
+    def render(self, content):
+        return responses.dump_bytes(content)
+
+templates = Jinja2Templates(directory=os.path.join(BASE_DIR, 'templates'))
+templates.env.globals['asset_url'] = assets.asset_url
+
+# Rendered pages: their templates take no per-request data.
+# template -> (asset manifest version, html, etag), since pages link to the built assets
+rendered_pages = {}
+
+def rendered_page(template):
+    """(asset manifest version, html, etag) of a page, rendered again after an asset rebuild"""
+    assets.manifest.refresh()
+    version = assets.manifest.version
+    if rendered_pages.get(template, (None,))[0] != version:
+        html = templates.get_template(template).render()
+        rendered_pages[template] = (version, html, '"%s"' % hashlib.sha1(html.encode('utf-8')).hexdigest())
+    return rendered_pages[template]
+
+async def render_page(request, template):
+    """Serve a static page, rendered once per asset build and revalidated by ETag"""
+    # Checking the manifest and rendering read files, so they run in the threadpool
+    _, html, etag = await run_in_threadpool(rendered_page, template)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    # A compressed response carries the weak form of the tag, which comes back as W/"..."
+    if request.headers.get('if-none-match', '').replace('W/', '') == etag:
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(html, headers=headers)
+
+class AssetFiles(StaticFiles):
+    """Static files; built assets are sent precompressed and cached by browsers for good"""
+
+    async def get_response(self, path, scope):
+        filename = path.replace(os.sep, '/')
+        variant, encoding = await run_in_threadpool(
+            assets.manifest.variant, filename, Headers(scope=scope).get('accept-encoding'))
+        response = await super().get_response(variant, scope)
+        if response.status_code in (200, 304) and assets.manifest.is_immutable(filename):
+            response.headers['Cache-Control'] = f'public, max-age={assets.IMMUTABLE_MAX_AGE}, immutable'
+            response.headers['Vary'] = 'Accept-Encoding'
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+                response.headers['Content-Type'] = mimetypes.guess_type(filename)[0]
+        return response
+
+def get_session_id(request):
+    """Return the caller's conversation session id, or a new one (issued by check_rate_limit())"""
+    # Unsigned or forged ids get a new session, which is rate limited by address until it's issued
+    session_id = verified_session_id(request.cookies.get(SESSION_COOKIE))
+    if session_id is None:
+        session_id = request.state.new_session = secrets.token_urlsafe(24)
+    return session_id
+
+async def wait_for_disconnect(request):
+    """Return once the client has closed the connection"""
+    # The body has already been read, so the next ASGI message is the disconnect
+    while (await request.receive())['type'] != 'http.disconnect':
+        pass
+
+async def until_disconnected(request, coroutine):
+    """Await a coroutine, cancelling it (and its upstream call) if the client disconnects first"""
+    task = asyncio.ensure_future(coroutine)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            return task.result()
+        count_cancellation('client_disconnect', 'complete')
+        raise RequestCancelledError("The client closed the connection")
+    finally:
+        task.cancel()
+        watcher.cancel()
+
+def check_rate_limit(request, session_id):
+    """Spend one request of the caller's allowance, then issue the session if it's new
+
+    Returns the tenant to charge (None without a limiter). Only chat requests
+    call this, so 429s and the other routes never hand out a session.
+    """
+    tenant = None
+    if assistant.limiter is not None:
+        # A session id issued just now says nothing about the caller, so it is limited by address
+        new_session = getattr(request.state, 'new_session', None) == session_id
+        remote_addr = request.client.host if request.client else None
+        forwarded_for = request.headers.get('X-Forwarded-For')
+        tenant = assistant.limiter.tenant(
+            None if new_session else session_id,
+            remote_addr,
+            forwarded_for=forwarded_for,
+            api_key=request.headers.get(API_KEY_HEADER),
+        )
+        assistant.limiter.check(tenant, assistant.limiter.address(remote_addr, forwarded_for))
+    request.state.issue_session = True
+    return tenant
+
+def mark_high_value(request, session_id, tenant):
+    """Have the next turns prepared in advance (charged to tenant) for sessions presenting a high-value API key"""
+    if assistant.warm is not None:
+        assistant.warm.mark_high_value(session_id, request.headers.get(API_KEY_HEADER), tenant)
+
+def rate_limited_response(error):
+    """429 response telling the client when to retry"""
+    return JSONResponse(
+        {'error': str(error), 'retry_after': error.retry_after},
+        status_code=error.status_code,
+        headers={'Retry-After': str(error.retry_after)},
+    )
+
+class SessionCookieMiddleware(BaseHTTPMiddleware):
+    """Hand newly issued session ids back to the browser"""
+
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        new_session = getattr(request.state, 'new_session', None)
+        if new_session and getattr(request.state, 'issue_session', False):
+            response.set_cookie(SESSION_COOKIE, sign_session_id(new_session), httponly=True, samesite='lax')
+        return response
+
+class CompressionMiddleware:
+    """Compress complete text and JSON responses the client accepts in gzip or brotli"""
+
+    # Plain ASGI rather than BaseHTTPMiddleware, which would buffer streams (SSE must flush every event)
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        encoding = None
+        if scope['type'] == 'http' and scope['method'] != 'HEAD':
+            encoding = responses.choose_encoding(Headers(scope=scope).get('accept-encoding'))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+            if start is None:
+                # Already decided to pass this response through
+                return await send(message)
+            headers = MutableHeaders(raw=start['headers'])
+            body = message.get('body', b'')
+            # Only complete bodies are compressed; streamed ones go out as they come
+            if (message.get('more_body') or 'content-encoding' in headers
+                    or start['status'] < 200 or start['status'] in (204, 304)
+                    or not responses.compressible(headers.get('content-type'), len(body))):
+                await send(start)
+                start = None
+                return await send(message)
+            body = responses.compress(body, encoding)
+            headers['Content-Encoding'] = encoding
+            headers['Content-Length'] = str(len(body))
+            headers.add_vary_header('Accept-Encoding')
+            if 'etag' in headers:
+                headers['ETag'] = responses.weak_etag(headers['etag'])
+            await send(start)
+            start = None
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self.app(scope, receive, send_compressed)
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """Count requests and their latency (for streams: time until the stream starts)"""
+
+    async def dispatch(self, request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        endpoint = ROUTE_PATHS.get(request.scope.get('endpoint'), 'unmatched')
+        metrics.REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        # Writing the snapshot runs gauge callbacks and file I/O, so it goes to the threadpool (when due)
+        if metrics.REGISTRY.flush_due():
+            await run_in_threadpool(metrics.REGISTRY.flush)
+        return response
+
+async def index(request):
+    """Main page"""
+    return await render_page(request, 'index.html')
+
+async def chat(request):
+    """Handle chat messages"""
+    try:
+        # Over-limit callers are turned away before any work is done
+        session_id = get_session_id(request)
+        # The limiter may hit SQLite; like every store call, it stays off the event loop
+        tenant = await run_in_threadpool(check_rate_limit, request, session_id)
+        mark_high_value(request, session_id, tenant)
+
+        with metrics.STAGE_SECONDS.time(stage='request_parsing'):
+            data = await request.json()
+            user_message = data.get('message', '')
+
+        if not user_message.strip():
+            return JSONResponse({'error': 'Message cannot be empty'}, status_code=400)
+
+        # Process the message, under the client's deadline and abandoning it if the client disconnects
+        with request_scope(client_timeout(request.headers.get(DEADLINE_HEADER))):
+            response = await until_disconnected(
+                request, assistant.process_message_async(user_message, session_id, tenant))
+
+        with metrics.STAGE_SECONDS.time(stage='response_serialization'):
+            return JSONResponse({
+                'response': response,
+                'status': 'success'
+            })
+
+    except RateLimitedError as e:
+        return rate_limited_response(e)
+    except PromptTooLongError as e:
+        return JSONResponse({'error': str(e)}, status_code=413)
+    except RequestCancelledError as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status_code)
+    except SchedulerBusyError as e:
+        return JSONResponse({'error': str(e)}, status_code=503)
+    except UpstreamError as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status_code)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+async def chat_stream(request):
+    """Handle chat messages, streaming response tokens as Server-Sent Events"""
+    session_id = get_session_id(request)
+    try:
+        tenant = await run_in_threadpool(check_rate_limit, request, session_id)
+    except RateLimitedError as e:
+        return rate_limited_response(e)
+    mark_high_value(request, session_id, tenant)
+
+    with metrics.STAGE_SECONDS.time(stage='request_parsing'):
+        try:
+            data = await request.json()
+        except ValueError:
+            data = {}
+        user_message = data.get('message', '')
+
+    if not user_message.strip():
+        return JSONResponse({'error': 'Message cannot be empty'}, status_code=400)
+
+    timeout = client_timeout(request.headers.get(DEADLINE_HEADER))
+
+    async def generate():
+        with request_scope(timeout):
+            try:
+                async for token in assistant.process_message_stream_async(user_message, session_id, tenant):
+                    yield sse_event({'token': token})
+                yield sse_event({'status': 'success'}, event='done')
+            except asyncio.CancelledError:
+                # StreamingResponse cancels us when the client disconnects; the upstream stream is closed on the way out
+                count_cancellation('client_disconnect', 'stream')
+                raise
+            except Exception as e:
+                metrics.ERRORS.inc(type=type(e).__name__)
+                yield sse_event({'error': str(e)}, event='error')
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Stop nginx from buffering the stream before it reaches the browser
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+async def clear_chat(request):
+    """Clear conversation history"""
+    try:
+        await run_in_threadpool(assistant.clear_conversation, get_session_id(request))
+        return JSONResponse({'status': 'success', 'message': 'Conversation cleared'})
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+async def export_history(request):
+    """Download the caller's whole conversation as JSON, streamed one message at a time"""
+    session_id = get_session_id(request)
+
+    # A plain generator: Starlette reads it in a thread, so store reads don't block the loop
+    def generate():
+        yield b'{"messages":['
+        for i, message in enumerate(assistant.iter_transcript(session_id)):
+            yield (b',' if i else b'') + responses.dump_bytes(message)
+        yield b']}'
+
+    body = generate()
+    encoding = responses.choose_encoding(request.headers.get('accept-encoding'))
+    headers = {
+        'Content-Disposition': 'attachment; filename="intellimind-conversation.json"',
+        'Cache-Control': 'no-store',
+        'Vary': 'Accept-Encoding',
+    }
+    if encoding:
+        body = responses.compress_stream(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return StreamingResponse(body, media_type='application/json', headers=headers)
+
+async def updates(request):
+    """Update log page"""
+    return await render_page(request, 'updates.html')
+
+async def health(request):
+    """Health check endpoint"""
+    status = {
+        'status': 'healthy',
+        'app': 'IntelliMind Assistant',
+        'backend': assistant.backend_name,
+        'scheduler': assistant.async_scheduler.stats()
+    }
+    if assistant.cache is not None:
+        status['response_cache'] = await run_in_threadpool(assistant.cache.stats)
+    if hasattr(assistant.store, 'stats'):
+        status['conversation_log'] = await run_in_threadpool(assistant.store.stats)
+    status['llm'] = llm_status()
+    return JSONResponse(status)
+
+async def ready(request):
+    """Readiness check: 503 until the worker's LLM client is warm (see LLM_WARMUP)"""
+    if not llm_ready():
+        return JSONResponse({'status': 'warming', 'ready': False}, status_code=503)
+    return JSONResponse({'status': 'ready', 'ready': True})
+
+async def stats(request):
+    """Rate limiting counters, per-tenant upstream token usage and warm-answer state"""
+    return JSONResponse({
+        'rate_limit': await run_in_threadpool(assistant.limiter.stats) if assistant.limiter is not None else None,
+        'warm_answers': assistant.warm.stats() if assistant.warm is not None else None,
+    })
+
+async def metrics_endpoint(request):
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(await run_in_threadpool(metrics.REGISTRY.render), media_type='text/plain; version=0.0.4')
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/chat', chat, methods=['POST']),
+        Route('/chat/stream', chat_stream, methods=['POST']),
+        Route('/clear', clear_chat, methods=['POST']),
+        Route('/history/export', export_history),
+        Route('/updates', updates),
+        Route('/health', health),
+        Route('/ready', ready),
+        Route('/stats', stats),
+        Route('/metrics', metrics_endpoint),
+        Mount('/static', AssetFiles(directory=assets.STATIC_DIR), name='static'),
+    ],
+    middleware=[Middleware(MetricsMiddleware), Middleware(SessionCookieMiddleware), Middleware(CompressionMiddleware)],
+    # Each uvicorn worker process builds (and optionally warms) its own LLM client and warm answers
+    on_startup=[start_llm_client, start_warm_answers],
+)
+
+# Route template for each endpoint, used as a bounded-cardinality metrics label
+ROUTE_PATHS = {getattr(route, 'endpoint', None) or route.app: route.path for route in app.routes}
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("🧠 IntelliMind Assistant (async) Starting...")
+    print("🌐 Access the web interface at: http://localhost:5000")
+    uvicorn.run(app, host='0.0.0.0', port=5000)
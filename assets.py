@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+IntelliMind Assistant - Static Assets
+Build step and lookup helpers for the CSS and JavaScript in static/.
+
+`python assets.py` minifies each asset, names the result after a hash of its
+content (css/style.css -> dist/css/style.3f9a1c2b7d.css) and writes gzip and,
+when the brotli package is installed, brotli variants next to it. A manifest
+maps the source names to the built ones. Since a built file's name changes
+whenever its content does, it can be cached by browsers forever.
+
+The app looks names up through asset_url(), so templates keep referring to
+css/style.css. Without a build the original files are served, revalidated
+on every page load.
+
+Running workers pick up a new build by themselves: they reload the manifest
+when it changes. A build also keeps the files of the one before it, so pages
+rendered earlier, and browsers still holding them, don't link to missing files.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = 'dist'
+MANIFEST_PATH = os.path.join(STATIC_DIR, DIST_DIR, 'manifest.json')
+
+# Assets the build processes, relative to static/
+ASSET_EXTENSIONS = ('.css', '.js')
+# Built assets are content-addressed, so they never change under the same URL
+IMMUTABLE_MAX_AGE = 31536000
+# Encodings we pre-generate, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# How often workers check the manifest for a new build
+RELOAD_CHECK_SECONDS = 1.0
+
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+CSS_SPACE = re.compile(r"\s+")
+CSS_PUNCTUATION = re.compile(r"\s*([{};,>])\s*")
+
+
+def minify_css(source):
+    """Drop comments and collapse whitespace"""
+    css = CSS_COMMENT.sub("", source)
+    css = CSS_SPACE.sub(" ", css)
+    css = CSS_PUNCTUATION.sub(r"\1", css)
+    # "color: red" -> "color:red", but leave selectors like "a :hover" alone
+    css = re.sub(r"([;{])\s*([-\w]+)\s*:\s*", r"\1\2:", css)
+    return css.replace(";}", "}").strip() + "\n"
+
+
+def minify_js(source):
+    """Drop comments, indentation and blank lines, leaving strings, template literals and regexes intact"""
+    # Line breaks are kept: removing them could change meaning through automatic semicolon insertion
+    out = []
+    i = 0
+    length = len(source)
+    # Last significant character, to tell a regex literal from a division
+    previous = ""
+    while i < length:
+        char = source[i]
+        if char in "'\"`":
+            end = i + 1
+            while end < length and source[end] != char:
+                end += 2 if source[end] == "\\" else 1
+            out.append(source[i:end + 1])
+            previous = char
+            i = end + 1
+        elif source.startswith("//", i):
+            while i < length and source[i] != "\n":
+                i += 1
+        elif source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            i = length if end < 0 else end + 2
+            out.append(" ")
+        elif char == "/" and (not previous or previous in "(,=:[!&|?{};+-*%<>~^"):
+            end = i + 1
+            in_class = False
+            while end < length and (source[end] != "/" or in_class):
+                if source[end] == "\\":
+                    end += 1
+                elif source[end] == "[":
+                    in_class = True
+                elif source[end] == "]":
+                    in_class = False
+                end += 1
+            out.append(source[i:end + 1])
+            previous = "/"
+            i = end + 1
+        else:
+            out.append(char)
+            if not char.isspace():
+                previous = char
+            i += 1
+    lines = (line.strip() for line in "".join(out).splitlines())
+    return "\n".join(line for line in lines if line) + "\n"
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def compressors():
+    """(encoding, suffix, compress) for each variant we can produce here"""
+    available = []
+    try:
+        import brotli
+        available.append(('br', '.br', lambda data: brotli.compress(data, quality=11)))
+    except ImportError:
+        pass
+    # mtime=0 keeps builds reproducible
+    available.append(('gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)))
+    return available
+
+
+def build(static_dir=STATIC_DIR):
+    """Minify, fingerprint and precompress every asset; returns the manifest"""
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    staging = dist_dir + '.tmp'
+    old = dist_dir + '.old'
+    shutil.rmtree(staging, ignore_errors=True)
+    manifest = {}
+    variants = compressors()
+
+    for root, dirs, files in os.walk(static_dir):
+        # Never re-process earlier builds
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) not in (dist_dir, staging, old))
+        for name in sorted(files):
+            stem, extension = os.path.splitext(name)
+            if extension not in ASSET_EXTENSIONS:
+                continue
+            source_path = os.path.join(root, name)
+            source_name = os.path.relpath(source_path, static_dir).replace(os.sep, '/')
+            with open(source_path, encoding='utf-8') as f:
+                data = MINIFIERS[extension](f.read()).encode('utf-8')
+
+            digest = hashlib.sha256(data).hexdigest()[:10]
+            built_name = f"{DIST_DIR}/{os.path.dirname(source_name) + '/' if '/' in source_name else ''}{stem}.{digest}{extension}"
+            target = os.path.join(staging, os.path.relpath(built_name, DIST_DIR))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+            for _, suffix, compress in variants:
+                with open(target + suffix, 'wb') as f:
+                    f.write(compress(data))
+            manifest[source_name] = built_name
+
+    keep_previous_build(dist_dir, staging)
+    with open(os.path.join(staging, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    # Swap the whole directory so a running app never sees half a build
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(dist_dir):
+        os.replace(dist_dir, old)
+    os.replace(staging, dist_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+
+def keep_previous_build(dist_dir, staging):
+    """Copy the current build's files into the new one, for pages that still link to them"""
+    try:
+        with open(os.path.join(dist_dir, 'manifest.json'), encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        return
+    # Only the files the current manifest names: a build is kept for one more build, not forever
+    for built_name in previous.values():
+        relative = os.path.relpath(built_name, DIST_DIR)
+        for suffix in ('',) + tuple(suffix for _, suffix in ENCODINGS):
+            source = os.path.join(dist_dir, relative + suffix)
+            target = os.path.join(staging, relative + suffix)
+            if os.path.isfile(source) and not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(source, target)
+
+
+class AssetManifest:
+    """Maps source asset names to built ones and picks precompressed variants
+
+    Reloaded when the manifest file changes, so a rebuild takes effect without a restart.
+    """
+
+    def __init__(self, static_dir=STATIC_DIR):
+        self.static_dir = static_dir
+        self.path = os.path.join(static_dir, DIST_DIR, 'manifest.json')
+        self._entries = None
+        self._variants = {}
+        # Identity of the manifest file loaded, and when it was last compared with the disk
+        self._stamp = None
+        self._checked = 0.0
+        # Bumped on every reload, so pages rendered with the old names can be rendered again
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @property
+    def entries(self):
+        self.refresh()
+        return self._entries
+
+    def refresh(self):
+        """Reload the manifest if a build replaced it (checked at most every RELOAD_CHECK_SECONDS)"""
+        now = time.monotonic()
+        if self._entries is not None and now - self._checked < RELOAD_CHECK_SECONDS:
+            return
+        with self._lock:
+            if self._entries is not None and now - self._checked < RELOAD_CHECK_SECONDS:
+                return
+            self._checked = now
+            stamp = self._file_stamp()
+            if self._entries is not None and stamp == self._stamp:
+                return
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                entries = {}
+            self._entries, self._stamp = entries, stamp
+            self._variants = {}
+            self.version += 1
+
+    def url(self, filename):
+        """URL path of an asset: the built file when there is one, otherwise the source"""
+        return '/static/' + self.entries.get(filename, filename)
+
+    def is_immutable(self, filename):
+        return filename.startswith(DIST_DIR + '/')
+
+    def variant(self, filename, accept_encoding):
+        """(file to send, Content-Encoding or None) for a request of filename"""
+        if not self.is_immutable(filename):
+            return filename, None
+        self.refresh()
+        accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted and self._exists(filename + suffix):
+                return filename + suffix, encoding
+        return filename, None
+
+    def _exists(self, filename):
+        exists = self._variants.get(filename)
+        if exists is None:
+            exists = self._variants[filename] = os.path.isfile(os.path.join(self.static_dir, filename))
+        return exists
+
+
+# Shared by the Flask and ASGI apps
+manifest = AssetManifest()
+
+
+def asset_url(filename):
+    """Template helper: URL of a static asset, fingerprinted when built"""
+    return manifest.url(filename)
+
+
+def main():
+    print("📦 Building static assets...")
+    built = build()
+    for source_name, built_name in sorted(built.items()):
+        source_size = os.path.getsize(os.path.join(STATIC_DIR, source_name))
+        sizes = [f"{os.path.getsize(os.path.join(STATIC_DIR, built_name)):,} B minified"]
+        for encoding, suffix in ENCODINGS:
+            path = os.path.join(STATIC_DIR, built_name + suffix)
+            if os.path.exists(path):
+                sizes.append(f"{os.path.getsize(path):,} B {encoding}")
+        print(f"   {source_name} ({source_size:,} B) -> {built_name}: {', '.join(sizes)}")
+    if not any(os.path.exists(os.path.join(STATIC_DIR, name + '.br')) for name in built.values()):
+        print("ℹ️  Install the brotli package to also generate .br variants")
+    print("✅ Static assets built")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
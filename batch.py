@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+IntelliMind Assistant Batch Runner
+Runs a JSONL file of prompts or conversations through the assistant with a
+bounded pool of workers and writes one JSONL result per input line.
+
+Input lines look like either of:
+  {"id": "q1", "prompt": "What is Sentient?"}
+  {"id": "c1", "messages": ["Hi, I'm Ana", "What's my name?"]}
+
+A conversation's messages are sent in order within one session; every input
+line gets its own session, cleared once its result is written. Lines without
+an "id" are identified by their line number, and malformed lines get an error
+result like any other failed record.
+
+Every response comes from the model: the FAQ answers, prepared answers and
+response cache the web app may answer from are skipped, unless --shortcuts
+is given.
+
+Results are appended as they complete (so their order may differ from the
+input) and progress is checkpointed next to the output file. Re-running the
+same command resumes where the previous run stopped, without repeating or
+duplicating results. Input is read lazily, so memory use doesn't grow with
+the size of the run.
+
+Examples:
+  python demo.py batch prompts.jsonl --output results.jsonl --workers 16
+  python batch.py prompts.jsonl --output results.jsonl --rate 600
+"""
+
+import argparse
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Write the checkpoint at least this often, and after this many results
+CHECKPOINT_SECONDS = 2.0
+CHECKPOINT_EVERY = 100
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through IntelliMind Assistant")
+    parser.add_argument('input', help="JSONL file of prompts or conversations")
+    parser.add_argument('--output', help="JSONL results file (default: <input>.results.jsonl)")
+    parser.add_argument('--workers', type=int, default=8, help="Records processed concurrently")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="Most model requests per minute across all workers (default: unlimited)")
+    parser.add_argument('--restart', action='store_true', help="Ignore any checkpoint and start over")
+    parser.add_argument('--limit', type=int, help="Stop after this many input lines")
+    parser.add_argument('--shortcuts', action='store_true',
+                        help="Allow FAQ, prepared and cached answers instead of always calling the model")
+    return parser.parse_args(argv)
+
+
+class Checkpoint:
+    """Which input lines are done, and how much of the output file holds their results"""
+
+    def __init__(self, path):
+        self.path = path
+        # Every line before next_line is done; lines after it that finished early are in done
+        self.next_line = 0
+        self.done = set()
+        self.output_bytes = 0
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        self.next_line = state['next_line']
+        self.done = set(state['done'])
+        self.output_bytes = state['output_bytes']
+        return True
+
+    def is_done(self, line_number):
+        return line_number < self.next_line or line_number in self.done
+
+    def mark_done(self, line_number, output_bytes):
+        self.done.add(line_number)
+        # The set only holds lines finished ahead of a slower one, so it stays about as small as the pool
+        while self.next_line in self.done:
+            self.done.remove(self.next_line)
+            self.next_line += 1
+        self.output_bytes = output_bytes
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'next_line': self.next_line, 'done': sorted(self.done), 'output_bytes': self.output_bytes}, f)
+        os.replace(tmp, self.path)
+
+
+class RequestPacer:
+    """Client-side limit on model requests per minute, shared by the workers"""
+
+    def __init__(self, requests_per_minute):
+        from rate_limiter import MemoryRateLimitBackend
+
+        self.rate = requests_per_minute / 60.0
+        # A small burst keeps the pool busy without overshooting the quota
+        self.burst = max(1.0, min(self.rate, 10.0))
+        self.backend = MemoryRateLimitBackend(max_tenants=1)
+
+    def acquire(self):
+        while True:
+            wait_seconds = self.backend.take('batch', self.rate, self.burst)
+            if wait_seconds <= 0:
+                return
+            time.sleep(wait_seconds)
+
+
+def read_records(path, checkpoint, limit=None):
+    """(line_number, record) for each input line not yet done, read lazily"""
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f):
+            if limit is not None and line_number >= limit:
+                return
+            if checkpoint.is_done(line_number) or not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = InvalidRecord(f"Invalid JSON: {e}")
+            yield line_number, record
+
+
+class InvalidRecord:
+    """Stands in for an input line that isn't valid JSON"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def conversation(record):
+    """The user messages of a record, in order; ValueError if the record is malformed"""
+    if isinstance(record, InvalidRecord):
+        raise ValueError(record.error)
+    if not isinstance(record, dict):
+        raise ValueError("Record is not a JSON object")
+    if 'prompt' in record:
+        messages = [record['prompt']]
+    else:
+        messages = record.get('messages') or []
+        if not isinstance(messages, list):
+            raise ValueError("\"messages\" is not a list")
+        messages = [message.get('content') if isinstance(message, dict) else message for message in messages]
+    if not messages:
+        raise ValueError("Record has no prompt or messages")
+    if not all(isinstance(message, str) and message.strip() for message in messages):
+        raise ValueError("Every prompt and message needs non-empty text")
+    return messages
+
+
+def run_record(assistant, pacer, line_number, record, shortcuts=False):
+    """Send a record's messages through the assistant in a fresh session and build its result"""
+    result = {'id': record.get('id', line_number) if isinstance(record, dict) else line_number}
+    try:
+        messages = conversation(record)
+    except ValueError as e:
+        result['error'] = str(e)
+        return result
+
+    session_id = 'batch-' + secrets.token_urlsafe(12)
+    responses = []
+    start = time.perf_counter()
+    try:
+        for message in messages:
+            if pacer is not None:
+                pacer.acquire()
+            responses.append(assistant.process_message(message, session_id, shortcuts=shortcuts))
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        assistant.clear_conversation(session_id)
+
+    if 'prompt' in record:
+        result['response'] = responses[0] if responses else None
+    else:
+        result['responses'] = responses
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(args):
+    output_path = args.output or os.path.splitext(args.input)[0] + '.results.jsonl'
+    checkpoint = Checkpoint(output_path + '.checkpoint')
+    if args.restart or not checkpoint.load():
+        checkpoint = Checkpoint(checkpoint.path)
+        resuming = False
+    else:
+        resuming = True
+
+    # Let every worker have an upstream call in flight at once
+    os.environ.setdefault('SCHEDULER_MAX_CONCURRENCY', str(args.workers))
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app import assistant
+
+    pacer = RequestPacer(args.rate) if args.rate > 0 else None
+
+    print("📦 IntelliMind Assistant - Batch Run")
+    print(f"   Input:   {args.input}")
+    print(f"   Output:  {output_path}")
+    print(f"   Workers: {args.workers}" + (f", {args.rate:g} requests/minute" if pacer else ""))
+    if resuming:
+        print(f"↩️  Resuming after {checkpoint.next_line + len(checkpoint.done)} completed records")
+
+    output = open(output_path, 'a+b')
+    # Drop results written after the last checkpoint; those records are run again
+    output.truncate(checkpoint.output_bytes if resuming else 0)
+    output.seek(0, os.SEEK_END)
+
+    lock = threading.Lock()
+    completed = errors = 0
+    last_checkpoint = time.monotonic()
+    start = time.monotonic()
+
+    def record_result(line_number, result):
+        nonlocal completed, errors, last_checkpoint
+        with lock:
+            output.write((json.dumps(result, ensure_ascii=False) + '\n').encode('utf-8'))
+            output.flush()
+            checkpoint.mark_done(line_number, output.tell())
+            completed += 1
+            errors += 'error' in result
+            now = time.monotonic()
+            if completed % CHECKPOINT_EVERY == 0 or now - last_checkpoint >= CHECKPOINT_SECONDS:
+                os.fsync(output.fileno())
+                checkpoint.save()
+                last_checkpoint = now
+                print(f"⏳ {completed} done, {errors} errors, {completed / (now - start):.1f} records/s")
+
+    def work(line_number, record):
+        record_result(line_number, run_record(assistant, pacer, line_number, record, args.shortcuts))
+
+    interrupted = False
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            pending = set()
+            for line_number, record in read_records(args.input, checkpoint, args.limit):
+                # Keep only a bounded number of records in memory
+                if len(pending) >= args.workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        future.result()
+                pending.add(pool.submit(work, line_number, record))
+            for future in pending:
+                future.result()
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\n⏸️  Interrupted; finishing the records in progress...")
+    finally:
+        with lock:
+            output.flush()
+            os.fsync(output.fileno())
+            checkpoint.save()
+            output.close()
+
+    elapsed = time.monotonic() - start
+    print(f"{'⏸️ ' if interrupted else '✅'} {completed} records in {elapsed:.1f}s "
+          f"({completed / elapsed if elapsed else 0:.1f}/s), {errors} errors")
+    if interrupted:
+        print("   Run the same command again to resume")
+    return 1 if interrupted else 0
+
+
+def main(argv=None):
+    return run_batch(parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+IntelliMind Assistant Benchmark Script
+Load-tests the /chat, /chat/stream, /clear and /health endpoints and reports
+throughput, latency percentiles, time-to-first-token and memory growth.
+
+By default the Flask app is started in-process with the stub LLM backend, so
+runs are offline and reproducible. Use --url to drive an already running
+deployment (e.g. gunicorn) instead.
+
+Examples:
+  python benchmark.py --concurrency 16 --requests 400
+  python benchmark.py --endpoint stream --stub-ttft-ms 300 --output results.json
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+ENDPOINTS = ('chat', 'stream', 'clear', 'health')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the IntelliMind Assistant HTTP endpoints")
+    parser.add_argument('--url', help="Benchmark a running server instead of an in-process app")
+    parser.add_argument('--endpoint', choices=ENDPOINTS, action='append',
+                        help="Endpoint to benchmark (repeatable, default: all)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent virtual users")
+    parser.add_argument('--requests', type=int, default=200, help="Measured requests per endpoint")
+    parser.add_argument('--message-size', type=int, default=100, help="User message length in characters")
+    parser.add_argument('--history-depth', type=int, default=0,
+                        help="Chat turns each user sends before measuring, to grow session history")
+    parser.add_argument('--backend', default='stub', help="LLM_BACKEND for the in-process app")
+    parser.add_argument('--stub-ttft-ms', type=float, default=50, help="Stub time-to-first-token")
+    parser.add_argument('--stub-tokens-per-second', type=float, default=500, help="Stub token rate")
+    parser.add_argument('--stub-response-tokens', type=int, default=50, help="Stub response length")
+    parser.add_argument('--output', help="Write machine-readable results to this JSON file")
+    return parser.parse_args()
+
+
+def current_rss_bytes():
+    """Resident set size of this process (Linux), falling back to peak RSS"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes elsewhere
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def start_local_server(args):
+    """Start the Flask app in a background thread and return its base URL"""
+    os.environ['LLM_BACKEND'] = args.backend
+    os.environ['STUB_TTFT_MS'] = str(args.stub_ttft_ms)
+    os.environ['STUB_TOKENS_PER_SECOND'] = str(args.stub_tokens_per_second)
+    os.environ['STUB_RESPONSE_TOKENS'] = str(args.stub_response_tokens)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from werkzeug.serving import make_server
+    from app import app
+
+    # Per-request access logging would dominate the measurement
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+class VirtualUser:
+    """One client with its own session cookie"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.cookie = None
+
+    def _connection(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=300)
+        return http.client.HTTPConnection(self.host, self.port, timeout=300)
+
+    def request(self, method, path, payload=None, streaming=False):
+        """Send a request; returns (status, latency, time_to_first_token)"""
+        headers = {}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+
+        connection = self._connection()
+        start = time.perf_counter()
+        ttft = None
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            set_cookie = response.getheader('Set-Cookie')
+            if set_cookie:
+                self.cookie = set_cookie.split(';', 1)[0]
+
+            if streaming:
+                # Time-to-first-token is when the first token frame arrives
+                for line in response:
+                    if ttft is None and line.startswith(b'data:') and b'"token"' in line:
+                        ttft = time.perf_counter() - start
+            else:
+                response.read()
+            return response.status, time.perf_counter() - start, ttft
+        finally:
+            connection.close()
+
+
+def run_endpoint(base_url, endpoint, args):
+    """Drive one endpoint at the configured concurrency and summarize the results"""
+    message = ("benchmark " * (args.message_size // 10 + 1))[:args.message_size]
+    requests_left = [args.requests]
+    lock = threading.Lock()
+    latencies, ttfts, errors = [], [], []
+
+    users = [VirtualUser(base_url) for _ in range(args.concurrency)]
+
+    # Grow each user's session history before measuring
+    for user in users:
+        for _ in range(args.history_depth):
+            user.request('POST', '/chat', {'message': message})
+
+    def worker(user):
+        while True:
+            with lock:
+                if requests_left[0] <= 0:
+                    return
+                requests_left[0] -= 1
+            try:
+                if endpoint == 'chat':
+                    status, latency, ttft = user.request('POST', '/chat', {'message': message})
+                elif endpoint == 'stream':
+                    status, latency, ttft = user.request('POST', '/chat/stream', {'message': message}, streaming=True)
+                elif endpoint == 'clear':
+                    status, latency, ttft = user.request('POST', '/clear')
+                else:
+                    status, latency, ttft = user.request('GET', '/health')
+            except Exception as e:
+                with lock:
+                    errors.append(type(e).__name__)
+                continue
+            with lock:
+                if status >= 400:
+                    errors.append(f"HTTP {status}")
+                latencies.append(latency)
+                if ttft is not None:
+                    ttfts.append(ttft)
+
+    rss_before = current_rss_bytes()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    rss_after = current_rss_bytes()
+
+    latencies.sort()
+    ttfts.sort()
+    completed = len(latencies)
+    result = {
+        'endpoint': endpoint,
+        'requests': completed,
+        'errors': len(errors),
+        'error_types': sorted(set(errors)),
+        'elapsed_s': elapsed,
+        'rps': completed / elapsed if elapsed > 0 else 0.0,
+        'latency_ms': {name: (percentile(latencies, pct) or 0.0) * 1000
+                       for name, pct in (('p50', 50), ('p95', 95), ('p99', 99))},
+    }
+    if ttfts:
+        result['ttft_ms'] = {name: percentile(ttfts, pct) * 1000
+                             for name, pct in (('p50', 50), ('p95', 95), ('p99', 99))}
+    if args.url is None:
+        # Only meaningful when the server runs in this process
+        result['memory_growth_bytes_per_request'] = (rss_after - rss_before) / max(completed, 1)
+    return result
+
+
+def print_result(result):
+    latency = result['latency_ms']
+    print(f"📊 {result['endpoint']}")
+    print(f"   Requests: {result['requests']}  Errors: {result['errors']}  RPS: {result['rps']:.1f}")
+    print(f"   Latency ms  p50: {latency['p50']:.1f}  p95: {latency['p95']:.1f}  p99: {latency['p99']:.1f}")
+    if 'ttft_ms' in result:
+        ttft = result['ttft_ms']
+        print(f"   TTFT ms     p50: {ttft['p50']:.1f}  p95: {ttft['p95']:.1f}  p99: {ttft['p99']:.1f}")
+    if 'memory_growth_bytes_per_request' in result:
+        print(f"   Memory growth: {result['memory_growth_bytes_per_request']:.0f} bytes/request")
+    if result['error_types']:
+        print(f"   ❌ Error types: {', '.join(result['error_types'])}")
+    print()
+
+
+def main():
+    args = parse_args()
+    endpoints = args.endpoint or list(ENDPOINTS)
+
+    print("=" * 60)
+    print("🧠 IntelliMind Assistant - Benchmark")
+    print("=" * 60)
+    print()
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        server, base_url = start_local_server(args)
+    print(f"🎯 Target: {base_url}")
+    print(f"⚙️  Concurrency: {args.concurrency}  Requests: {args.requests}  "
+          f"Message size: {args.message_size}  History depth: {args.history_depth}")
+    print()
+
+    results = []
+    try:
+        for endpoint in endpoints:
+            result = run_endpoint(base_url, endpoint, args)
+            results.append(result)
+            print_result(result)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    if args.output:
+        report = {
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'target': args.url or 'in-process',
+            'config': {
+                'concurrency': args.concurrency,
+                'requests': args.requests,
+                'message_size': args.message_size,
+                'history_depth': args.history_depth,
+                'backend': None if args.url else args.backend,
+                'stub_ttft_ms': args.stub_ttft_ms,
+                'stub_tokens_per_second': args.stub_tokens_per_second,
+                'stub_response_tokens': args.stub_response_tokens,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+    return 0 if all(result['errors'] == 0 for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
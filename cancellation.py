@@ -0,0 +1,107 @@
+"""
+IntelliMind Assistant - Request Cancellation
+Per-request deadlines and client-disconnect detection, carried from the route
+down to the upstream LLM call so an abandoned request stops using a worker.
+
+A client may send X-Request-Timeout (seconds) to shorten the deadline; it can
+never extend the server's own UPSTREAM_TIMEOUT. The route opens a
+request_scope() and everything below it (the scheduler, the resilience layer)
+reads the deadline and the disconnect check from context variables.
+"""
+
+import socket
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import metrics
+
+DEADLINE_HEADER = 'X-Request-Timeout'
+# Shortest deadline a client may ask for
+MIN_CLIENT_TIMEOUT = 0.5
+# How often a blocked upstream call checks whether its client is still connected
+CANCEL_POLL_INTERVAL = 0.25
+
+_deadline = ContextVar('request_deadline', default=None)
+_disconnected = ContextVar('request_disconnected', default=None)
+
+
+class RequestCancelledError(Exception):
+    """The client went away, so the request was abandoned"""
+
+    # Not a real response (nobody reads it); nginx's "client closed request" code, for the access log
+    status_code = 499
+
+
+def client_timeout(value):
+    """Seconds from the deadline header, or None when absent or malformed"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        return None
+    if seconds != seconds or seconds <= 0:
+        return None
+    return max(seconds, MIN_CLIENT_TIMEOUT)
+
+
+@contextmanager
+def request_scope(timeout=None, disconnected=None):
+    """Make a deadline (seconds from now) and a disconnect check visible to the code below"""
+    deadline_token = _deadline.set(time.monotonic() + timeout if timeout else None)
+    disconnected_token = _disconnected.set(disconnected)
+    try:
+        yield
+    finally:
+        _deadline.reset(deadline_token)
+        _disconnected.reset(disconnected_token)
+
+
+def remaining(default):
+    """Seconds left for this request, capped at default"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    return max(min(deadline - time.monotonic(), default), 0.0)
+
+
+def check_cancelled(mode='complete'):
+    """Raise RequestCancelledError if the client has disconnected"""
+    disconnected = _disconnected.get()
+    if disconnected is not None and disconnected():
+        count_cancellation('client_disconnect', mode)
+        raise RequestCancelledError("The client closed the connection")
+
+
+def count_cancellation(reason, mode):
+    metrics.CANCELLATIONS.inc(reason=reason, mode=mode)
+
+
+def socket_disconnected(sock):
+    """Check for a closed client socket without consuming any data"""
+    # Flask has read the request body, so a readable socket with nothing to read means EOF
+    try:
+        # gevent's sockets wait for data when a recv would block, whatever the flags, unless
+        # their timeout is zero; stdlib sockets just become non-blocking for the call
+        timeout = sock.gettimeout()
+        sock.settimeout(0.0)
+        try:
+            return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+        finally:
+            sock.settimeout(timeout)
+    except (BlockingIOError, InterruptedError):
+        return False
+    except (ValueError, AttributeError):
+        # TLS sockets don't support recv flags, and MSG_DONTWAIT is POSIX only
+        return False
+    except OSError:
+        return True
+
+
+def wsgi_disconnect_check(environ):
+    """Disconnect check for the WSGI request's client socket, or None if the server doesn't expose it"""
+    sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+    if sock is None or not hasattr(socket, 'MSG_DONTWAIT'):
+        return None
+    return lambda: socket_disconnected(sock)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+IntelliMind Assistant Concurrency Check
+Runs many chat turns at once through the Flask app, the way a gthread or
+gevent gunicorn worker would, and checks that no shared state was corrupted:
+every session keeps every one of its turns, user and assistant messages still
+alternate, the scheduler drains and the request metrics add up.
+
+Turns of the same session are sent concurrently on purpose, since that is
+where a lost update would show. Each profile runs in a fresh interpreter
+against the stub backend, so no API key or network is needed; the gevent
+profile monkey-patches the standard library first, as gunicorn.conf.py does.
+
+Examples:
+  python check_concurrency.py
+  python check_concurrency.py --profile gevent --sessions 50 --turns 8
+  python check_concurrency.py --store sqlite --concurrency 64
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PROFILES = ('gthread', 'gevent')
+
+PROBE = r"""
+import json, sys, time
+profile, sessions, turns, concurrency = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+if profile == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+import app as app_module
+import metrics
+
+def session_id(s):
+    return f"concurrency-check-{s:05d}"
+
+def message(s, t):
+    return f"Session {s} turn {t}: tell me more about request scheduling"
+
+def run_turn(job):
+    s, t = job
+    client = app_module.app.test_client(use_cookies=False)
+    headers = {'Cookie': f"{app_module.SESSION_COOKIE}={app_module.sign_session_id(session_id(s))}"}
+    # Alternate the complete and streaming paths
+    if t % 2:
+        response = client.post('/chat/stream', json={'message': message(s, t)}, headers=headers)
+        return response.status_code == 200 and 'event: done' in response.get_data(as_text=True)
+    response = client.post('/chat', json={'message': message(s, t)}, headers=headers)
+    return response.status_code == 200
+
+jobs = [(s, t) for t in range(turns) for s in range(sessions)]
+start = time.perf_counter()
+if profile == 'gevent':
+    from gevent.pool import Pool
+    results = Pool(concurrency).map(run_turn, jobs)
+else:
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(run_turn, jobs))
+elapsed = time.perf_counter() - start
+
+problems = []
+failed = results.count(False)
+if failed:
+    problems.append(f"{failed} of {len(jobs)} requests failed")
+
+assistant = app_module.assistant
+for s in range(sessions):
+    history = assistant.store.load(session_id(s))
+    roles = [m['role'] for m in history]
+    users = sorted(m['content'] for m in history if m['role'] == 'user')
+    if len(history) != 2 * turns:
+        problems.append(f"session {s}: {len(history)} messages stored, expected {2 * turns}")
+    elif roles != ['user', 'assistant'] * turns:
+        problems.append(f"session {s}: user and assistant messages out of order")
+    elif users != sorted(message(s, t) for t in range(turns)):
+        problems.append(f"session {s}: user messages lost or duplicated")
+
+scheduler = assistant.scheduler
+if scheduler.running or scheduler.queued:
+    problems.append(f"scheduler did not drain ({scheduler.running} running, {scheduler.queued} queued)")
+
+requests = sum(value for labels, value in metrics.REQUESTS.snapshot() if labels[0].startswith('/chat'))
+if requests != len(jobs):
+    problems.append(f"request counter is {requests}, expected {len(jobs)}")
+upstream = sum(value[-1] for _, value in metrics.UPSTREAM_SECONDS.snapshot())
+if upstream != len(jobs):
+    problems.append(f"{upstream} upstream calls recorded, expected {len(jobs)}")
+
+print(json.dumps({'requests': len(jobs), 'seconds': elapsed, 'problems': problems[:20],
+                  'problem_count': len(problems)}))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check the IntelliMind Assistant's shared state under concurrent requests")
+    parser.add_argument('--profile', choices=PROFILES, action='append',
+                        help="Worker profile to check (repeatable; default: all, skipping gevent when not installed)")
+    parser.add_argument('--sessions', type=int, default=20, help="Conversations to run")
+    parser.add_argument('--turns', type=int, default=6, help="Turns per conversation, all sent at once")
+    parser.add_argument('--concurrency', type=int, default=32, help="Requests in flight (threads or greenlets)")
+    parser.add_argument('--store', choices=('memory', 'sqlite', 'log'), default='memory',
+                        help="Conversation store to check against")
+    return parser.parse_args()
+
+
+def check(profile, args, workdir):
+    """Run the probe for one profile in a fresh interpreter"""
+    env = dict(
+        os.environ,
+        LLM_BACKEND='stub',
+        FIREWORKS_API_KEY='',
+        STUB_TTFT_MS='20',
+        STUB_TOKENS_PER_SECOND='2000',
+        STUB_RESPONSE_TOKENS='20',
+        STUB_ERROR_RATE='0',
+        CONVERSATION_STORE=args.store,
+        CONVERSATION_DB_PATH=os.path.join(workdir, f'{profile}.db'),
+        CONVERSATION_LOG_DIR=os.path.join(workdir, f'{profile}-log'),
+        # Every turn stays in the window, so a lost one shows up in the stored history
+        MAX_CONVERSATION_HISTORY=str(2 * args.turns),
+        HISTORY_TOKEN_BUDGET='1000000',
+        # Each turn must reach the (stub) upstream, and nothing else may
+        RESPONSE_CACHE='off',
+        FAQ_FASTPATH='false',
+        WARM_ANSWERS='false',
+        RATE_LIMIT='off',
+        METRICS_DIR='',
+        SCHEDULER_MAX_CONCURRENCY=str(args.concurrency),
+        SCHEDULER_MAX_QUEUE=str(args.sessions * args.turns),
+    )
+    completed = subprocess.run(
+        [sys.executable, '-c', PROBE, profile, str(args.sessions), str(args.turns), str(args.concurrency)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        return {'problems': [completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'probe failed'],
+                'problem_count': 1}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("🧠 IntelliMind Assistant - Concurrency Check")
+    print("=" * 60)
+    print(f"   {args.sessions} sessions x {args.turns} turns, {args.concurrency} in flight, {args.store} store")
+    print()
+
+    profiles = args.profile or PROFILES
+    ok = True
+    with tempfile.TemporaryDirectory() as workdir:
+        for profile in profiles:
+            if profile == 'gevent' and importlib.util.find_spec('gevent') is None:
+                if args.profile:
+                    print("❌ gevent: not installed (pip install gevent)")
+                    ok = False
+                else:
+                    print("⏭️  gevent: skipped, not installed (pip install gevent)")
+                continue
+            result = check(profile, args, workdir)
+            if result['problem_count']:
+                ok = False
+                print(f"❌ {profile}: {result['problem_count']} problems")
+                for problem in result['problems']:
+                    print(f"   - {problem}")
+            else:
+                print(f"✅ {profile}: {result['requests']} requests in {result['seconds']:.1f} s, state consistent")
+
+    print()
+    if ok:
+        print("✅ Assistant state is safe under concurrent requests")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+IntelliMind Assistant Startup Check
+Measures how long a fresh interpreter takes to import the app and answer its
+first /health request, and fails if that exceeds the import-time budget or if
+startup pulls in modules that should only load with the first LLM request.
+
+Each measurement runs in a new process so nothing is already cached in
+sys.modules. Keep the budget well under pm2's listen_timeout (3000 ms).
+
+Examples:
+  python check_startup.py
+  python check_startup.py --budget-ms 400 --runs 5
+  python check_startup.py --module asgi
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that belong to the model client and must stay out of worker startup
+DEFERRED_MODULES = ('fireworks', 'httpx', 'aiohttp', 'openai', 'grpc')
+
+PROBE = r"""
+import asyncio, json, sys, time
+start = time.perf_counter()
+module = __import__(sys.argv[1])
+imported = time.perf_counter()
+if sys.argv[1] == 'asgi':
+    # Call the ASGI app directly; a test client would import httpx itself
+    sent, received = [], []
+    async def receive():
+        if received:
+            return {'type': 'http.disconnect'}
+        received.append(True)
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+    async def send(message):
+        sent.append(message)
+    scope = {'type': 'http', 'method': 'GET', 'path': '/health', 'raw_path': b'/health', 'root_path': '',
+             'query_string': b'', 'headers': [], 'http_version': '1.1', 'scheme': 'http',
+             'server': ('127.0.0.1', 80), 'client': ('127.0.0.1', 0)}
+    asyncio.run(module.app(scope, receive, send))
+    status = sent[0]['status']
+else:
+    status = module.app.test_client().get('/health').status_code
+ready = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_health_ms': (ready - start) * 1000,
+    'health_status': status,
+    'modules': sorted(name for name in sys.modules if '.' not in name),
+}))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check the IntelliMind Assistant startup time budget")
+    parser.add_argument('--module', default='app', choices=('app', 'asgi'), help="Entry point module to import")
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', '500')),
+                        help="Maximum median time from interpreter start of import to first /health response")
+    parser.add_argument('--runs', type=int, default=3, help="Fresh processes to measure (the median is used)")
+    parser.add_argument('--top', type=int, default=10, help="Slowest imports to list")
+    return parser.parse_args()
+
+
+def measure(module):
+    """Import the app and hit /health in a fresh interpreter"""
+    # No API key: startup must not need one
+    env = dict(os.environ, FIREWORKS_API_KEY='')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, module],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(module, top):
+    """Direct imports of the entry point by cumulative time, from python -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, FIREWORKS_API_KEY=''), capture_output=True, text=True,
+    ).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split(':', 1)[1].split('|')
+        # The name column is indented by two spaces per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            imports.append((int(cumulative_us), name.strip()))
+    imports.sort(reverse=True)
+    return imports[:top]
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("🧠 IntelliMind Assistant - Startup Check")
+    print("=" * 60)
+    print()
+
+    results = [measure(args.module) for _ in range(args.runs)]
+    import_ms = statistics.median(result['import_ms'] for result in results)
+    health_ms = statistics.median(result['first_health_ms'] for result in results)
+    loaded = sorted(set(results[-1]['modules']) & set(DEFERRED_MODULES))
+
+    print(f"📦 Import {args.module}: {import_ms:.0f} ms (median of {args.runs})")
+    print(f"🩺 First /health response: {health_ms:.0f} ms (status {results[-1]['health_status']})")
+    print(f"🎯 Budget: {args.budget_ms:.0f} ms")
+    print()
+    print("🐢 Slowest imports (cumulative):")
+    for cumulative_us, name in slowest_imports(args.module, args.top):
+        print(f"   {cumulative_us / 1000:7.1f} ms  {name}")
+    print()
+
+    ok = True
+    if health_ms > args.budget_ms:
+        print(f"❌ Startup took {health_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+        ok = False
+    if loaded:
+        print(f"❌ Startup imported modules that should wait for the first LLM request: {', '.join(loaded)}")
+        ok = False
+    if results[-1]['health_status'] != 200:
+        print("❌ /health did not answer 200 without an API key")
+        ok = False
+    if ok:
+        print("✅ Startup is within budget")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+IntelliMind Assistant - Conversation History
+Fixed-capacity ring buffer of chat messages with a token-budget window, so a
+conversation holds O(window) memory and the prompt size stays predictable.
+"""
+
+import os
+from collections import deque
+
+# Token counts are cached per message text, so rebuilding a history only counts new messages
+from prompt_budget import message_tokens
+
+
+class ConversationHistory:
+    """Ring buffer of messages that drops the oldest turns past a token budget"""
+
+    def __init__(self, messages=(), capacity=None, token_budget=None):
+        if capacity is None:
+            capacity = int(os.getenv("MAX_CONVERSATION_HISTORY", "10"))
+        if token_budget is None:
+            token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+        self.capacity = capacity
+        self.token_budget = token_budget
+        # Messages pushed out since this history was built, for the conversation summarizer
+        self.evicted = []
+        self._messages = deque(maxlen=capacity)
+        self._tokens = deque(maxlen=capacity)
+        self.total_tokens = 0
+        # The messages this history was built from, and those appended since (see rebase())
+        self.base = list(messages)
+        self.added = []
+        for message in self.base:
+            self.append(message)
+        self.added = []
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def append(self, message):
+        """Add a message, evicting the oldest ones to stay within capacity and budget"""
+        if len(self._messages) == self.capacity:
+            self._evict_oldest()
+        tokens = message_tokens(message)
+        self.added.append(message)
+        self._messages.append(message)
+        self._tokens.append(tokens)
+        self.total_tokens += tokens
+        self._compact()
+
+    def window(self):
+        """Messages to send to the model, oldest first"""
+        return list(self._messages)
+
+    def to_list(self):
+        """Plain message list for storage"""
+        return list(self._messages)
+
+    def rebase(self, messages):
+        """A history of messages (e.g. a newer stored copy) with this one's added messages on top"""
+        history = ConversationHistory(messages, self.capacity, self.token_budget)
+        for message in self.added:
+            history.append(message)
+        return history
+
+    def _compact(self):
+        """Drop the oldest messages until the window fits the token budget"""
+        # The newest message is always kept, even if it alone exceeds the budget
+        while self.total_tokens > self.token_budget and len(self._messages) > 1:
+            self._evict_oldest()
+
+        # Never start the window with a dangling assistant reply
+        while len(self._messages) > 1 and self._messages[0]["role"] == "assistant":
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        message = self._messages.popleft()
+        self.total_tokens -= self._tokens.popleft()
+        self.evicted.append(message)
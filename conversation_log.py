@@ -0,0 +1,501 @@
+"""
+IntelliMind Assistant - Append-Only Conversation Log
+Durable conversation store (CONVERSATION_STORE=log) built on a segmented,
+append-only log that every worker on a node shares:
+
+- a turn appends only its new messages; sessions are never rewritten in place
+- an in-memory index maps each session to the log offsets of its current
+  messages, so resuming a session reads just those records
+- a checkpoint of the index lets a restarted worker replay only the log
+  written since, instead of the whole history
+- a background thread compacts the log down to the live messages, into a
+  new segment that supersedes the older ones, so a crash at any point of a
+  compaction replays to the same sessions
+- a record torn by a crash mid-write is truncated away on the next access
+
+Workers coordinate with an exclusive file lock and catch up on each other's
+appends by tailing the log before every operation.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from conversation_store import ConversationStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".log"
+CHECKPOINT_FILE = "index.json"
+GENERATION_FILE = "GENERATION"
+LOCK_FILE = "LOCK"
+
+# Each record is a big-endian payload length and CRC32, followed by the JSON payload
+HEADER = struct.Struct(">II")
+
+
+def message_digest(message):
+    """Short fingerprint used to match stored messages against a saved history"""
+    data = json.dumps(message, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def encode_record(record):
+    payload = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _overlap(old, new):
+    """Length of the longest suffix of old that is also a prefix of new"""
+    for length in range(min(len(old), len(new)), 0, -1):
+        if old[len(old) - length:] == new[:length]:
+            return length
+    return 0
+
+
+class _Session:
+    """Index entry: where a session's current messages live in the log"""
+
+    __slots__ = ("records", "updated")
+
+    def __init__(self, records=None, updated=0.0):
+        # [segment, position, length, digest] for each message, oldest first
+        self.records = records or []
+        self.updated = updated
+
+
+class LogConversationStore(ConversationStore):
+    """Conversation store on an append-only segmented log with a per-session offset index"""
+
+    def __init__(self, directory="conversation_log", ttl=3600, segment_bytes=16 * 1024 * 1024,
+                 compact_interval=300.0, compact_min_bytes=1024 * 1024, max_messages=100, fsync=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.segment_bytes = segment_bytes
+        self.compact_interval = compact_interval
+        self.compact_min_bytes = compact_min_bytes
+        # Upper bound on messages indexed per session, even without trim records
+        self.max_messages = max_messages
+        self.fsync = fsync
+        self.compactions = 0
+        self.recovered_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._pid = None
+        self._sessions = {}
+        self._generation = None
+        # Log position the index covers: everything before (segment, position) is applied
+        self._segment = None
+        self._position = 0
+        self._readers = {}
+        self._writer = None
+        self._checkpointed = None
+        # Recover the index (checkpoint plus log tail) now rather than on the first request
+        with self._locked():
+            pass
+
+    # -- process and lock management --------------------------------------
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _segment_path(self, segment):
+        return self._path(f"{SEGMENT_PREFIX}{segment:08d}{SEGMENT_SUFFIX}")
+
+    def _ensure_process(self):
+        """Reopen file handles after a fork; flock must not be shared with the parent"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._lock_fd = os.open(self._path(LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        # The inherited index stays valid; only the file handles are per process
+        self._readers = {}
+        self._writer = None
+        if self.compact_interval > 0:
+            threading.Thread(target=self._maintenance_loop, name="conversation-log", daemon=True).start()
+
+    @contextmanager
+    def _locked(self):
+        """Hold the process and cross-process lock with the index caught up to the log"""
+        with self._lock:
+            self._ensure_process()
+            if fcntl is not None:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                self._catch_up()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    # -- recovery and replay ---------------------------------------------
+
+    def _segments(self):
+        segments = []
+        for filename in os.listdir(self.directory):
+            if filename.startswith(SEGMENT_PREFIX) and filename.endswith(SEGMENT_SUFFIX):
+                segments.append(int(filename[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(segments)
+
+    def _read_generation(self):
+        try:
+            with open(self._path(GENERATION_FILE)) as generation_file:
+                return int(generation_file.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_atomic(self, name, data):
+        temp_path = self._path(name + ".tmp")
+        with open(temp_path, "w") as temp_file:
+            temp_file.write(data)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, self._path(name))
+        self._fsync_directory()
+
+    def _fsync_directory(self):
+        """Make renames and unlinks in the log directory durable"""
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        descriptor = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def _close_files(self):
+        for descriptor in self._readers.values():
+            os.close(descriptor)
+        self._readers = {}
+        if self._writer is not None:
+            os.close(self._writer[1])
+            self._writer = None
+
+    def _catch_up(self):
+        """Apply log records appended since the index was last brought up to date"""
+        generation = self._read_generation()
+        if generation != self._generation:
+            # First access, or another worker compacted the log: start over from the checkpoint
+            self._close_files()
+            self._generation = generation
+            self._restore_checkpoint()
+        self._replay()
+
+    def _restore_checkpoint(self):
+        """Load the index checkpoint if it matches the log, otherwise rebuild from the segments"""
+        self._sessions = {}
+        segments = self._segments()
+        self._segment = segments[0] if segments else None
+        self._position = 0
+        try:
+            with open(self._path(CHECKPOINT_FILE)) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return
+        segment, position = checkpoint["segment"], checkpoint["position"]
+        if checkpoint["generation"] != self._generation or segment not in segments:
+            return
+        if os.path.getsize(self._segment_path(segment)) < position:
+            return
+        self._sessions = {
+            session_id: _Session(records, updated)
+            for session_id, (updated, records) in checkpoint["sessions"].items()
+        }
+        self._segment, self._position = segment, position
+        self._checkpointed = (segment, position)
+
+    def _replay(self):
+        """Tail the log from the indexed position, truncating a torn record at its end"""
+        if self._segment is None:
+            segments = self._segments()
+            if not segments:
+                return
+            self._segment, self._position = segments[0], 0
+        try:
+            # Fast path: nothing appended and no new segment since the last operation
+            if (os.path.getsize(self._segment_path(self._segment)) == self._position
+                    and not os.path.exists(self._segment_path(self._segment + 1))):
+                return
+        except FileNotFoundError:
+            pass
+        for segment in [s for s in self._segments() if s >= self._segment]:
+            if segment != self._segment:
+                self._segment, self._position = segment, 0
+            path = self._segment_path(segment)
+            with open(path, "rb") as segment_file:
+                segment_file.seek(self._position)
+                data = segment_file.read()
+            offset = 0
+            while offset < len(data):
+                record = self._decode(data, offset)
+                if record is None:
+                    # Only a crash mid-append leaves a partial record: drop it
+                    self.recovered_bytes += len(data) - offset
+                    with open(path, "r+b") as segment_file:
+                        segment_file.truncate(self._position + offset)
+                    break
+                length = HEADER.size + record[1]
+                self._apply(record[0], segment, self._position + offset, length)
+                offset += length
+            self._position += offset
+
+    @staticmethod
+    def _decode(data, offset):
+        """(record, payload_length) at offset, or None if the bytes there are incomplete or corrupt"""
+        if len(data) - offset < HEADER.size:
+            return None
+        length, checksum = HEADER.unpack_from(data, offset)
+        payload = data[offset + HEADER.size:offset + HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return None
+        try:
+            return json.loads(payload), length
+        except ValueError:
+            return None
+
+    def _apply(self, record, segment, position, length):
+        """Update the index with one log record"""
+        kind = record["t"]
+        if kind == "r":
+            # A compacted segment starts here and holds every live message: whatever
+            # earlier segments said is superseded (they may linger if a compaction crashed)
+            self._sessions = {}
+            return
+        session_id = record["s"]
+        if kind == "c":
+            self._sessions.pop(session_id, None)
+            return
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+        session.updated = record["ts"]
+        if kind == "a":
+            session.records.append([segment, position, length, message_digest(record["m"])])
+            if len(session.records) > self.max_messages:
+                del session.records[0]
+        elif kind == "k":
+            # Keep only the newest n messages (older ones left the window)
+            keep = record["n"]
+            session.records = session.records[-keep:] if keep else []
+
+    # -- reading and appending --------------------------------------------
+
+    def _read_message(self, segment, position, length):
+        descriptor = self._readers.get(segment)
+        if descriptor is None:
+            descriptor = self._readers[segment] = os.open(self._segment_path(segment), os.O_RDONLY)
+        data = os.pread(descriptor, length, position)
+        return self._decode(data, 0)[0]["m"]
+
+    def _append(self, records):
+        """Write records at the end of the log and index them"""
+        if self._segment is None or self._position >= self.segment_bytes:
+            # Start a new segment; older ones are sealed and only change through compaction
+            self._segment = (self._segment or 0) + 1
+            self._position = 0
+        if self._writer is None or self._writer[0] != self._segment:
+            if self._writer is not None:
+                os.close(self._writer[1])
+            descriptor = os.open(self._segment_path(self._segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._writer = (self._segment, descriptor)
+
+        encoded = [encode_record(record) for record in records]
+        # One write per batch, so a crash leaves at most one torn record at the end
+        os.write(self._writer[1], b"".join(encoded))
+        if self.fsync:
+            os.fsync(self._writer[1])
+        for record, data in zip(records, encoded):
+            self._apply(record, self._segment, self._position, len(data))
+            self._position += len(data)
+
+    def _live(self, session):
+        return session is not None and time.time() - session.updated <= self.ttl
+
+    # -- ConversationStore interface --------------------------------------
+
+    def load(self, session_id):
+        with self._locked():
+            session = self._sessions.get(session_id)
+            if not self._live(session):
+                return []
+            return [self._read_message(*record[:3]) for record in session.records]
+
+    def iter_messages(self, session_id):
+        """Read a session's messages one at a time, stopping if the session changes meanwhile"""
+        with self._locked():
+            session = self._sessions.get(session_id)
+            digests = [record[3] for record in session.records] if self._live(session) else []
+        for index, digest in enumerate(digests):
+            # Positions move when the log is compacted, so each message is looked up afresh
+            with self._locked():
+                session = self._sessions.get(session_id)
+                if not self._live(session) or index >= len(session.records) or session.records[index][3] != digest:
+                    return
+                message = self._read_message(*session.records[index][:3])
+            yield message
+
+    def save(self, session_id, history):
+        history = list(history)
+        digests = [message_digest(message) for message in history]
+        now = time.time()
+        with self._locked():
+            session = self._sessions.get(session_id)
+            stored = [record[3] for record in session.records] if self._live(session) else []
+            kept = _overlap(stored, digests)
+            records = []
+            if session is not None and not kept:
+                records.append({"t": "c", "s": session_id, "ts": now})
+            elif kept < len(stored):
+                records.append({"t": "k", "s": session_id, "n": kept, "ts": now})
+            for message in history[kept:]:
+                records.append({"t": "a", "s": session_id, "m": message, "ts": now})
+            if records:
+                self._append(records)
+
+    def append(self, session_id, messages, max_messages):
+        now = time.time()
+        with self._locked():
+            session = self._sessions.get(session_id)
+            records = []
+            stored = 0
+            if self._live(session):
+                stored = len(session.records)
+            elif session is not None:
+                records.append({"t": "c", "s": session_id, "ts": now})
+            for message in messages:
+                records.append({"t": "a", "s": session_id, "m": message, "ts": now})
+            if stored + len(messages) > max_messages:
+                records.append({"t": "k", "s": session_id, "n": max_messages, "ts": now})
+            if records:
+                self._append(records)
+
+    def clear(self, session_id):
+        with self._locked():
+            if session_id in self._sessions:
+                self._append([{"t": "c", "s": session_id, "ts": time.time()}])
+
+    def session_count(self):
+        with self._locked():
+            return sum(1 for session in self._sessions.values() if self._live(session))
+
+    # -- maintenance ---------------------------------------------------------
+
+    def _log_bytes(self):
+        return sum(os.path.getsize(self._segment_path(segment)) for segment in self._segments())
+
+    def _live_bytes(self):
+        return sum(
+            record[2]
+            for session in self._sessions.values() if self._live(session)
+            for record in session.records
+        )
+
+    def checkpoint(self):
+        """Persist the index so a restart replays only the log written after this point"""
+        with self._locked():
+            if self._segment is None or self._checkpointed == (self._segment, self._position):
+                return
+            self._write_atomic(CHECKPOINT_FILE, json.dumps({
+                "generation": self._generation,
+                "segment": self._segment,
+                "position": self._position,
+                "sessions": {
+                    session_id: [session.updated, session.records]
+                    for session_id, session in self._sessions.items()
+                },
+            }))
+            self._checkpointed = (self._segment, self._position)
+
+    def compact(self, force=False):
+        """Rewrite the live messages into a new segment that supersedes all older ones
+
+        Crash-safe at every step: the new segment only appears, complete and synced,
+        under its final name; it starts with a reset record, so replaying older
+        segments before it (from a stale checkpoint or none) ends in the same index;
+        and the old segments are removed only after the checkpoint points past them.
+        """
+        with self._locked():
+            segments = self._segments()
+            if not segments:
+                return False
+            total = self._log_bytes()
+            if not force and (total < self.compact_min_bytes or self._live_bytes() * 2 > total):
+                return False
+
+            # Existing segments are never rewritten, so no checkpoint offset can point into changed data
+            target = segments[-1] + 1
+            temp_path = self._segment_path(target) + ".compact"
+            reset = encode_record({"t": "r", "ts": time.time()})
+            sessions = {}
+            position = len(reset)
+            with open(temp_path, "wb") as output:
+                output.write(reset)
+                for session_id, session in self._sessions.items():
+                    if not self._live(session):
+                        continue
+                    records = []
+                    for segment, record_position, length, digest in session.records:
+                        message = self._read_message(segment, record_position, length)
+                        data = encode_record({"t": "a", "s": session_id, "m": message, "ts": session.updated})
+                        output.write(data)
+                        records.append([target, position, len(data), digest])
+                        position += len(data)
+                    sessions[session_id] = _Session(records, session.updated)
+                output.flush()
+                os.fsync(output.fileno())
+            os.replace(temp_path, self._segment_path(target))
+            self._fsync_directory()
+
+            self._close_files()
+            self._sessions = sessions
+            self._segment, self._position = target, position
+            # Commit: the checkpoint points at the new segment, then other workers see the new
+            # generation and reload it
+            self._generation += 1
+            self._checkpointed = None
+            self.checkpoint()
+            self._write_atomic(GENERATION_FILE, str(self._generation))
+
+            for segment in self._segments():
+                if segment < target:
+                    os.remove(self._segment_path(segment))
+            # Left by a compaction that crashed before its rename
+            for filename in os.listdir(self.directory):
+                if filename.startswith(SEGMENT_PREFIX) and filename.endswith(".compact"):
+                    os.remove(self._path(filename))
+            self._fsync_directory()
+            self.compactions += 1
+            return True
+
+    def _maintenance_loop(self):
+        pid = os.getpid()
+        while True:
+            time.sleep(self.compact_interval)
+            if os.getpid() != pid:
+                return
+            try:
+                if not self.compact():
+                    self.checkpoint()
+            except Exception as e:
+                print(f"⚠️  Conversation log maintenance failed: {e}")
+
+    def stats(self):
+        """Log size and maintenance counters"""
+        with self._locked():
+            return {
+                "segments": len(self._segments()),
+                "log_bytes": self._log_bytes(),
+                "live_bytes": self._live_bytes(),
+                "compactions": self.compactions,
+                "recovered_bytes": self.recovered_bytes,
+            }
@@ -0,0 +1,395 @@
+"""
+IntelliMind Assistant - Conversation Store
+Session-keyed storage for conversation history, so each visitor gets their own
+context and gunicorn workers don't keep diverging copies of it. The durable
+append-only log backend lives in conversation_log.py.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Rough per-message overhead (dict, role string) used for the memory cap
+MESSAGE_OVERHEAD_BYTES = 100
+
+
+def estimate_history_bytes(history):
+    """Estimate the memory held by a list of messages"""
+    return sum(len(message["content"]) + MESSAGE_OVERHEAD_BYTES for message in history)
+
+
+def connect_sqlite(path, check_same_thread=True):
+    """Open an autocommit SQLite connection in WAL mode"""
+    connection = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=check_same_thread)
+    # WAL lets readers in other workers proceed while one worker writes
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class SessionLocks:
+    """Striped per-session locks, so one session's concurrent requests take turns updating its history"""
+
+    def __init__(self, stripes=64):
+        # A fixed set of locks: no per-session cleanup, and unrelated sessions rarely share one
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def __call__(self, session_id):
+        return self._locks[hash(session_id) % len(self._locks)]
+
+
+class ConversationStore:
+    """Interface for session-keyed conversation history storage"""
+
+    def load(self, session_id):
+        """Return the message list for a session (empty if unknown or expired)"""
+        raise NotImplementedError
+
+    def save(self, session_id, history):
+        """Replace the message list stored for a session"""
+        raise NotImplementedError
+
+    def append(self, session_id, messages, max_messages):
+        """Add messages to the end of a session's list, keeping only its newest max_messages"""
+        history = self.load(session_id) + list(messages)
+        self.save(session_id, history[-max_messages:])
+
+    def clear(self, session_id):
+        """Forget a session's conversation"""
+        raise NotImplementedError
+
+    def iter_messages(self, session_id):
+        """Yield a session's messages, oldest first (stores that can read them one at a time override this)"""
+        yield from self.load(session_id)
+
+    def session_count(self):
+        """Number of sessions currently stored"""
+        raise NotImplementedError
+
+
+class MemoryConversationStore(ConversationStore):
+    """In-process LRU store with idle TTL eviction and a memory cap"""
+
+    def __init__(self, ttl=3600, max_sessions=1000, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        # session_id -> (history, size_bytes, last_access), least recently used first
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            history, size, last_access = entry
+            if time.monotonic() - last_access > self.ttl:
+                self._remove(session_id)
+                return []
+            self._sessions[session_id] = (history, size, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            return list(history)
+
+    def save(self, session_id, history):
+        history = list(history)
+        size = estimate_history_bytes(history)
+        with self._lock:
+            self._remove(session_id)
+            self._sessions[session_id] = (history, size, time.monotonic())
+            self.total_bytes += size
+            self._evict()
+
+    def append(self, session_id, messages, max_messages):
+        messages = list(messages)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or time.monotonic() - entry[2] > self.ttl:
+                self._remove(session_id)
+                history, size = [], 0
+            else:
+                # Extend the stored list in place rather than copying the whole conversation
+                history, size, _ = entry
+                self.total_bytes -= size
+            history.extend(messages)
+            size += estimate_history_bytes(messages)
+            if len(history) > max_messages:
+                dropped = len(history) - max_messages
+                size -= estimate_history_bytes(history[:dropped])
+                del history[:dropped]
+            self._sessions[session_id] = (history, size, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            self.total_bytes += size
+            self._evict()
+
+    def clear(self, session_id):
+        with self._lock:
+            self._remove(session_id)
+
+    def session_count(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def _remove(self, session_id):
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+    def _evict(self):
+        """Drop expired sessions, then least recently used ones until under the caps"""
+        now = time.monotonic()
+        expired = [sid for sid, (_, _, last_access) in self._sessions.items() if now - last_access > self.ttl]
+        for session_id in expired:
+            self._remove(session_id)
+
+        while self._sessions and (len(self._sessions) > self.max_sessions or self.total_bytes > self.max_bytes):
+            session_id = next(iter(self._sessions))
+            self._remove(session_id)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """SQLite-backed store shared by every worker process on a node"""
+
+    def __init__(self, path="conversations.db", ttl=3600, table="conversations"):
+        self.path = path
+        self.ttl = ttl
+        self.table = table
+        # sqlite3 connections can't be shared across threads, so keep one per thread
+        self._local = threading.local()
+        self._connect().execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                session_id TEXT PRIMARY KEY,
+                history TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._connect().execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_updated_at ON {table} (updated_at)"
+        )
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = connect_sqlite(self.path)
+        return connection
+
+    def load(self, session_id):
+        row = self._connect().execute(
+            f"SELECT history FROM {self.table} WHERE session_id = ? AND updated_at >= ?",
+            (session_id, time.time() - self.ttl),
+        ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def save(self, session_id, history):
+        connection = self._connect()
+        now = time.time()
+        connection.execute(
+            f"INSERT OR REPLACE INTO {self.table} (session_id, history, updated_at) VALUES (?, ?, ?)",
+            (session_id, json.dumps(list(history)), now),
+        )
+        connection.execute(f"DELETE FROM {self.table} WHERE updated_at < ?", (now - self.ttl,))
+
+    def clear(self, session_id):
+        self._connect().execute(f"DELETE FROM {self.table} WHERE session_id = ?", (session_id,))
+
+    def session_count(self):
+        return self._connect().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+
+class SQLiteTranscriptStore(ConversationStore):
+    """SQLite store with one row per message, for long transcripts
+
+    Appending a turn inserts its messages instead of rewriting the whole
+    conversation, and iter_messages() streams rows rather than decoding one blob.
+    """
+
+    def __init__(self, path="conversations.db", ttl=3600, table="transcript_messages"):
+        self.path = path
+        self.ttl = ttl
+        self.table = table
+        self._local = threading.local()
+        connection = self._connect()
+        connection.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                message TEXT NOT NULL
+            )
+            """
+        )
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_session ON {table} (session_id, id)")
+        # Idle time is tracked per session, so expiry doesn't have to scan the messages
+        connection.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table}_sessions (
+                session_id TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_sessions_updated_at ON {table}_sessions (updated_at)"
+        )
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = connect_sqlite(self.path)
+        return connection
+
+    def _expire(self, connection, now):
+        expired = [row[0] for row in connection.execute(
+            f"SELECT session_id FROM {self.table}_sessions WHERE updated_at < ?", (now - self.ttl,)
+        )]
+        for session_id in expired:
+            self._delete(connection, session_id)
+
+    def _delete(self, connection, session_id):
+        connection.execute(f"DELETE FROM {self.table} WHERE session_id = ?", (session_id,))
+        connection.execute(f"DELETE FROM {self.table}_sessions WHERE session_id = ?", (session_id,))
+
+    def _live(self, connection, session_id):
+        return connection.execute(
+            f"SELECT 1 FROM {self.table}_sessions WHERE session_id = ? AND updated_at >= ?",
+            (session_id, time.time() - self.ttl),
+        ).fetchone() is not None
+
+    def load(self, session_id):
+        connection = self._connect()
+        if not self._live(connection, session_id):
+            return []
+        rows = connection.execute(
+            f"SELECT message FROM {self.table} WHERE session_id = ? ORDER BY id", (session_id,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_messages(self, session_id):
+        # A connection of its own: the export may be read from a different thread per chunk
+        connection = connect_sqlite(self.path, check_same_thread=False)
+        try:
+            if not self._live(connection, session_id):
+                return
+            cursor = connection.execute(
+                f"SELECT message FROM {self.table} WHERE session_id = ? ORDER BY id", (session_id,)
+            )
+            for row in cursor:
+                yield json.loads(row[0])
+        finally:
+            connection.close()
+
+    def append(self, session_id, messages, max_messages):
+        connection = self._connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._expire(connection, now)
+            connection.executemany(
+                f"INSERT INTO {self.table} (session_id, message) VALUES (?, ?)",
+                [(session_id, json.dumps(message)) for message in messages],
+            )
+            connection.execute(
+                f"""
+                DELETE FROM {self.table} WHERE session_id = ? AND id <= (
+                    SELECT id FROM {self.table} WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+                )
+                """,
+                (session_id, session_id, max_messages),
+            )
+            connection.execute(
+                f"INSERT OR REPLACE INTO {self.table}_sessions (session_id, updated_at) VALUES (?, ?)",
+                (session_id, now),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def save(self, session_id, history):
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete(connection, session_id)
+            connection.executemany(
+                f"INSERT INTO {self.table} (session_id, message) VALUES (?, ?)",
+                [(session_id, json.dumps(message)) for message in history],
+            )
+            connection.execute(
+                f"INSERT INTO {self.table}_sessions (session_id, updated_at) VALUES (?, ?)",
+                (session_id, time.time()),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def clear(self, session_id):
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete(connection, session_id)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def session_count(self):
+        return self._connect().execute(f"SELECT COUNT(*) FROM {self.table}_sessions").fetchone()[0]
+
+def create_conversation_store(namespace="conversations", max_messages=100):
+    """Build the conversation store selected by the CONVERSATION_STORE setting
+
+    Other namespaces (such as summaries) get a store of their own on the same
+    backend, so their entries never count as sessions or crowd conversations out.
+    """
+    backend = os.getenv("CONVERSATION_STORE", "memory").lower()
+    ttl = int(os.getenv("CONVERSATION_TTL", "3600"))
+
+    if backend == "memory":
+        return MemoryConversationStore(
+            ttl=ttl,
+            max_sessions=int(os.getenv("CONVERSATION_MAX_SESSIONS", "1000")),
+            max_bytes=int(os.getenv("CONVERSATION_MAX_BYTES", str(64 * 1024 * 1024))),
+        )
+    if backend == "sqlite":
+        return SQLiteConversationStore(
+            path=os.getenv("CONVERSATION_DB_PATH", "conversations.db"), ttl=ttl, table=namespace
+        )
+    if backend == "log":
+        from conversation_log import LogConversationStore
+
+        directory = os.getenv("CONVERSATION_LOG_DIR", "conversation_log")
+        if namespace != "conversations":
+            directory = os.path.join(directory, namespace)
+        return LogConversationStore(
+            directory=directory,
+            ttl=ttl,
+            segment_bytes=int(os.getenv("CONVERSATION_LOG_SEGMENT_BYTES", str(16 * 1024 * 1024))),
+            compact_interval=float(os.getenv("CONVERSATION_LOG_COMPACT_INTERVAL", "300")),
+            fsync=os.getenv("CONVERSATION_LOG_FSYNC", "false").lower() in ("1", "true", "yes"),
+            max_messages=max_messages,
+        )
+    raise ValueError(f"Unknown CONVERSATION_STORE backend: {backend}")
+
+
+def create_transcript_store(max_messages):
+    """Store for whole conversations (for /history/export), or None when max_messages is 0
+
+    The conversation store only holds the window sent to the model; this one
+    keeps up to max_messages of each session's messages.
+    """
+    if max_messages <= 0:
+        return None
+    if os.getenv("CONVERSATION_STORE", "memory").lower() == "sqlite":
+        return SQLiteTranscriptStore(
+            path=os.getenv("CONVERSATION_DB_PATH", "conversations.db"),
+            ttl=int(os.getenv("CONVERSATION_TTL", "3600")),
+        )
+    return create_conversation_store(namespace="transcripts", max_messages=max_messages)
@@ -144,6 +144,10 @@ def main():
             break
 
 if __name__ == "__main__":
+    # python demo.py batch <prompts.jsonl> [options] runs a prompt file non-interactively (see batch.py)
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        from batch import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
     main()
 
 
@@ -67,6 +67,7 @@ print_status "Installing Python dependencies..."
 pip install --upgrade pip
 pip install -r requirements.txt
 pip install gunicorn  # Add gunicorn for production
+python assets.py  # Minified, fingerprinted and precompressed static assets
 
 # Step 5: Create production environment file
 print_status "Creating production environment configuration..."
@@ -93,7 +94,7 @@ module.exports = {
   apps: [{
     name: '$APP_NAME',
     script: 'venv/bin/gunicorn',
-    args: '--bind 0.0.0.0:5000 --workers 4 --timeout 120 --access-logfile - --error-logfile - app:app',
+    args: '--config gunicorn.conf.py --bind 0.0.0.0:5000 --access-logfile - --error-logfile - app:app',
     cwd: '$APP_DIR',
     instances: 1,
     autorestart: true,
@@ -101,7 +102,9 @@ module.exports = {
     max_memory_restart: '1G',
     env: {
       NODE_ENV: 'production',
-      FLASK_ENV: 'production'
+      FLASK_ENV: 'production',
+      // Workers and threads are sized by gunicorn.conf.py
+      GUNICORN_PROFILE: 'gthread'
     },
     error_file: '/var/log/pm2/$APP_NAME-error.log',
     out_file: '/var/log/pm2/$APP_NAME-out.log',
@@ -135,8 +138,14 @@ server {
     # Static files
     location /static/ {
         alias $APP_DIR/static/;
-        expires 1y;
-        add_header Cache-Control "public, immutable";
+        # Send the .gz files built by assets.py instead of compressing on every request
+        gzip_static on;
+        location /static/dist/ {
+            alias $APP_DIR/static/dist/;
+            gzip_static on;
+            expires 1y;
+            add_header Cache-Control "public, immutable";
+        }
     }
 
     # Main application
@@ -2,7 +2,7 @@ module.exports = {
   apps: [{
     name: 'intellimind',
     script: 'python',
-    args: 'venv/bin/gunicorn --bind 0.0.0.0:5000 --workers 4 --timeout 120 --access-logfile - --error-logfile - app:app',
+    args: 'venv/bin/gunicorn --config gunicorn.conf.py --bind 0.0.0.0:5000 --access-logfile - --error-logfile - app:app',
     cwd: '/var/www/intellimind',
     instances: 1,
     autorestart: true,
@@ -10,7 +10,9 @@ module.exports = {
     max_memory_restart: '1G',
     env: {
       NODE_ENV: 'production',
-      FLASK_ENV: 'production'
+      FLASK_ENV: 'production',
+      // Workers and threads are sized by gunicorn.conf.py
+      GUNICORN_PROFILE: 'gthread'
     },
     error_file: '/var/log/pm2/intellimind-error.log',
     out_file: '/var/log/pm2/intellimind-out.log',
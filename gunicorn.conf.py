@@ -0,0 +1,124 @@
+"""
+Gunicorn configuration for IntelliMind Assistant
+Picked up automatically from the working directory (or pass -c gunicorn.conf.py).
+Command-line flags such as --workers and --timeout still take precedence.
+
+A chat request spends nearly all of its time waiting on FireworksAI, so each
+worker process serves many at once. GUNICORN_PROFILE picks how:
+
+- gthread (default): a pool of threads per worker process
+- gevent: greenlets, one per connection (pip install gevent); the standard
+  library is monkey-patched here, before the app is imported
+- sync: one request at a time per process
+
+Worker processes follow the CPU count. Each gets enough threads (or
+connections) to keep its share of the cores busy while the rest wait:
+1 + upstream latency / CPU time per request, per core. The latency is
+UPSTREAM_LATENCY_SECONDS when set, otherwise the mean recorded in METRICS_DIR
+by earlier runs, otherwise a 2 s guess.
+
+Check that the assistant's state holds up under each profile with
+`python check_concurrency.py`.
+"""
+
+import json
+import math
+import os
+
+from dotenv import load_dotenv
+
+# The app loads .env in each worker; the sizing needs it in the master too
+load_dotenv()
+
+PROFILE = os.getenv('GUNICORN_PROFILE', 'gthread').lower()
+if PROFILE not in ('gthread', 'gevent', 'sync'):
+    raise RuntimeError(f"Unknown GUNICORN_PROFILE: {PROFILE} (use gthread, gevent or sync)")
+
+if PROFILE == 'gevent':
+    try:
+        from gevent import monkey
+    except ImportError:
+        raise RuntimeError("GUNICORN_PROFILE=gevent needs the gevent package (pip install gevent)")
+    # Before anything creates locks, threads or sockets, including the app itself under --preload
+    monkey.patch_all()
+
+CPU_COUNT = os.cpu_count() or 1
+# CPU time a chat request needs besides the upstream call (parsing, prompt assembly, serialization)
+REQUEST_CPU_SECONDS = float(os.getenv('GUNICORN_REQUEST_CPU_MS', '20')) / 1000
+DEFAULT_UPSTREAM_LATENCY = 2.0
+
+
+def measured_upstream_latency(directory):
+    """Mean upstream call latency in the workers' metrics snapshots, or None"""
+    total, count = 0.0, 0
+    try:
+        filenames = os.listdir(directory)
+    except OSError:
+        return None
+    for filename in filenames:
+        if not (filename.startswith('metrics-') and filename.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as snapshot_file:
+                samples = json.load(snapshot_file)['metrics']['intellimind_upstream_seconds']['samples']
+        except (OSError, ValueError, KeyError):
+            continue
+        # Histogram samples end with their sum and count
+        for _, value in samples:
+            total += value[-2]
+            count += value[-1]
+    return total / count if count else None
+
+
+def upstream_latency():
+    """Seconds a request typically waits on the model"""
+    if os.getenv('UPSTREAM_LATENCY_SECONDS'):
+        return float(os.getenv('UPSTREAM_LATENCY_SECONDS'))
+    measured = measured_upstream_latency(os.getenv('METRICS_DIR')) if os.getenv('METRICS_DIR') else None
+    return measured or DEFAULT_UPSTREAM_LATENCY
+
+
+def per_worker(workers, limit, floor):
+    """Concurrent requests each worker needs so the CPUs never sit idle waiting on the model, within limits"""
+    in_flight = CPU_COUNT * (1 + upstream_latency() / REQUEST_CPU_SECONDS)
+    return max(floor, min(limit, math.ceil(in_flight / workers)))
+
+
+worker_class = PROFILE
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+if PROFILE == 'sync':
+    workers = int(os.getenv('WEB_CONCURRENCY') or 2 * CPU_COUNT + 1)
+else:
+    # At least two, so a worker restart never leaves the node without one
+    workers = int(os.getenv('WEB_CONCURRENCY') or max(2, CPU_COUNT))
+
+if PROFILE == 'gthread':
+    # Each thread holds a stack and, while waiting, an upstream connection
+    threads = per_worker(workers, int(os.getenv('GUNICORN_MAX_THREADS', '64')), 4)
+elif PROFILE == 'gevent':
+    # Greenlets are cheap; idle keep-alive connections hold one too
+    worker_connections = per_worker(workers, int(os.getenv('GUNICORN_MAX_CONNECTIONS', '1000')), 100)
+
+
+def on_starting(server):
+    cfg = server.cfg
+    concurrency = {'gthread': f"{cfg.threads} threads", 'gevent': f"{cfg.worker_connections} connections"}
+    print(f"⚙️  Gunicorn profile {PROFILE}: {cfg.workers} workers"
+          + (f" x {concurrency[PROFILE]}" if PROFILE in concurrency else "")
+          + f" (upstream latency {upstream_latency():.2f} s, {CPU_COUNT} CPUs)")
+
+
+def post_worker_init(worker):
+    """With LLM_WARMUP=true, build and warm up the worker's LLM client after the fork
+
+    Otherwise the client is built on the worker's first LLM call (with WARM_ANSWERS
+    on, that's preparing the opener answers, as soon as the upstream is idle). Either way it
+    is never created in the master, even with --preload, so HTTP connection pools
+    are not shared between processes.
+    """
+    from app import start_llm_client, start_warm_answers
+
+    start_llm_client()
+    # Opener answers are prepared after the fork too, each worker holding its own
+    start_warm_answers()
@@ -0,0 +1,136 @@
+"""
+IntelliMind Assistant - Intent Matching
+Data-driven keyword intents loaded from intents.json and compiled into one
+regular expression, so a single left-to-right pass over a message finds every
+intent it mentions. Patterns only match whole words ("hi" does not match
+inside "this").
+
+Three rule sets live in the file:
+
+- demo: keyword intents behind the demo backend's canned responses
+- faq:  questions answered without calling the model; these must match the
+        whole message, so "who are you" is answered but "who are you and
+        what is 2+2" still goes to the model
+- warm: common opening messages, each with the canonical prompt whose model
+        answer is prepared in advance (see warm_answers.py)
+"""
+
+import json
+import os
+import re
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INTENTS_PATH = os.path.join(BASE_DIR, 'intents.json')
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+class Intent:
+    """A named rule: the phrases that trigger it and the response it gives (or the prompt it stands for)"""
+
+    def __init__(self, name, patterns, response=None, priority=0, prompt=None):
+        self.name = name
+        self.patterns = patterns
+        self.response = response
+        self.priority = priority
+        self.prompt = prompt
+
+
+class IntentEngine:
+    """Compiled matcher over a set of intents"""
+
+    def __init__(self, intents, whole_message=False):
+        self.intents = list(intents)
+        self.whole_message = whole_message
+        self._by_group = {}
+        alternatives = []
+        for i, intent in enumerate(self.intents):
+            group = f"i{i}"
+            self._by_group[group] = intent
+            phrases = {self._prepare(pattern) for pattern in intent.patterns}
+            # Longest first, so "good morning" wins over a shorter phrase at the same position
+            escaped = "|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+            alternatives.append(f"(?P<{group}>{escaped})")
+        body = "|".join(alternatives) or "(?!)"
+        if whole_message:
+            self._pattern = re.compile(f"(?:{body})")
+        else:
+            # Word boundaries that also work for phrases starting or ending in punctuation ("next.js")
+            self._pattern = re.compile(f"(?<!\\w)(?:{body})(?!\\w)")
+
+    def _prepare(self, text):
+        """The form patterns and messages are compared in"""
+        if self.whole_message:
+            # Whole-message rules ignore punctuation, so "hi, there!" still matches "hi there"
+            return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+        return " ".join(text.lower().split())
+
+    def matches(self, text):
+        """Every intent mentioned in the text, in order of first mention"""
+        if self.whole_message:
+            match = self._pattern.fullmatch(self._prepare(text))
+            return [self._by_group[match.lastgroup]] if match else []
+        found = []
+        for match in self._pattern.finditer(self._prepare(text)):
+            intent = self._by_group[match.lastgroup]
+            if intent not in found:
+                found.append(intent)
+        return found
+
+    def match(self, text):
+        """The highest-priority intent in the text (the earliest mention on ties), or None"""
+        found = self.matches(text)
+        if not found:
+            return None
+        return max(found, key=lambda intent: (intent.priority, -found.index(intent)))
+
+
+def load_intents(path=None):
+    """Rule sets from the intents file, as {name: (intents, settings)}"""
+    with open(path or os.getenv('INTENTS_PATH', DEFAULT_INTENTS_PATH), encoding='utf-8') as f:
+        config = json.load(f)
+    rule_sets = {}
+    for name, rule_set in config.items():
+        intents = [
+            Intent(rule['name'], rule['patterns'], rule.get('response'), rule.get('priority', 0), rule.get('prompt'))
+            for rule in rule_set.get('intents', [])
+        ]
+        settings = {key: value for key, value in rule_set.items() if key != 'intents'}
+        rule_sets[name] = (intents, settings)
+    return rule_sets
+
+
+class DemoResponder:
+    """Keyword-intent responses for the demo backend"""
+
+    def __init__(self, path=None):
+        intents, settings = load_intents(path)['demo']
+        self.engine = IntentEngine(intents)
+        self.fallback = settings.get('fallback', "I understand you said: '{message}'.")
+
+    def respond(self, message):
+        intent = self.engine.match(message)
+        if intent is None:
+            return self.fallback.format(message=message)
+        return intent.response
+
+
+class FAQResponder:
+    """Canned answers to whole-message FAQ questions, given without calling the model"""
+
+    def __init__(self, path=None):
+        intents, _ = load_intents(path).get('faq', ([], {}))
+        self.engine = IntentEngine(intents, whole_message=True)
+
+    def answer(self, message):
+        """The FAQ answer to a message and its intent name, or None"""
+        intent = self.engine.match(message)
+        if intent is None:
+            return None
+        return intent.name, intent.response
+
+
+def create_faq_responder():
+    """Build the FAQ fast-path, or None when FAQ_FASTPATH is off"""
+    if os.getenv('FAQ_FASTPATH', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    return FAQResponder()
@@ -0,0 +1,354 @@
+"""
+IntelliMind Assistant - LLM Backends
+The model behind the assistant, selected with LLM_BACKEND:
+
+- fireworks: FireworksAI chat completions (default)
+- demo:      keyword responder that works without an API key
+- stub:      deterministic token generator with configurable time-to-first-token
+             and throughput (and an optional failure rate), for load-testing the
+             serving stack offline
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import sys
+import threading
+import time
+
+DEFAULT_MODEL = "llama-v3p1-8b-instruct"  # Using a model compatible with Sentient framework
+
+
+def gevent_patched():
+    """Whether gevent has monkey-patched this process (the gevent worker profile)"""
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("socket")
+
+
+def last_user_message(messages):
+    """Content of the most recent user message in a prompt"""
+    for message in reversed(messages):
+        if message["role"] == "user":
+            return message["content"]
+    return ""
+
+
+class LLMBackend:
+    """Interface for the model that generates assistant responses"""
+
+    name = "base"
+    # Backends without a remote client are ready as soon as they exist
+    warm = True
+
+    def start(self, warm_up=False):
+        """Create clients for this process (after any fork) and optionally prime them"""
+
+    def complete(self, messages, max_tokens, temperature):
+        """Return the full response text for a prompt"""
+        raise NotImplementedError
+
+    def stream(self, messages, max_tokens, temperature):
+        """Yield response text pieces as they are generated"""
+        yield self.complete(messages, max_tokens, temperature)
+
+    async def acomplete(self, messages, max_tokens, temperature):
+        """Awaitable complete()"""
+        return self.complete(messages, max_tokens, temperature)
+
+    async def astream(self, messages, max_tokens, temperature):
+        """Async generator variant of stream()"""
+        yield await self.acomplete(messages, max_tokens, temperature)
+
+
+class FireworksBackend(LLMBackend):
+    """FireworksAI chat completions"""
+
+    name = "fireworks"
+
+    def __init__(self, api_key=None, model=None, timeout=600, max_connections=None,
+                 max_keepalive_connections=None, keepalive_expiry=None):
+        self.api_key = api_key or os.getenv('FIREWORKS_API_KEY')
+        if not self.api_key:
+            raise ValueError("FIREWORKS_API_KEY environment variable is required")
+
+        self.model = model or os.getenv('FIREWORKS_MODEL', DEFAULT_MODEL)
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.warm = False
+        self._llm = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def llm(self):
+        return self.connect()
+
+    def connect(self):
+        """This process's FireworksAI client, created on first use"""
+        # A client inherited across fork() shares sockets with the parent, so each process builds its own
+        if self._llm is None or self._pid != os.getpid():
+            with self._lock:
+                if self._llm is None or self._pid != os.getpid():
+                    self._llm = self._create_client()
+                    self._pid = os.getpid()
+                    self.warm = False
+        return self._llm
+
+    def _create_client(self):
+        if gevent_patched():
+            # The SDK pulls in grpc, whose threads would block a gevent worker's event loop
+            # unless grpc is switched to cooperative mode before it is first used
+            try:
+                from grpc.experimental import gevent as grpc_gevent
+                grpc_gevent.init_gevent()
+            except ImportError:
+                pass
+
+        # Imported here so the demo and stub backends work without the SDK installed
+        from fireworks import LLM
+
+        # Initialize FireworksAI LLM with Sentient-compatible model
+        llm = LLM(
+            model=self.model,
+            api_key=self.api_key,
+            deployment_type="auto",  # Required parameter for FireworksAI
+            # Hard per-request ceiling; retries are left to the resilience layer (see resilience.py)
+            request_timeout=self.timeout,
+            max_retries=1,
+            max_connections=self.max_connections
+        )
+        self._configure_pool(llm)
+        return llm
+
+    def _configure_pool(self, llm):
+        """Apply the keep-alive pool limits to the SDK's sync HTTP client, where the SDK allows it"""
+        # The SDK has no public option for the httpx pool (it only forwards max_connections to
+        # its aiohttp session), so the private httpx client is rebuilt with the limits here.
+        # That relies on SDK internals (as of fireworks-ai 0.19): if they change, the SDK's own
+        # pool is kept rather than failing client creation.
+        if not (self.max_connections or self.max_keepalive_connections or self.keepalive_expiry):
+            return
+        import httpx
+
+        client = getattr(llm, "_client", None)
+        required = ("_client", "_build_headers", "extra_headers", "request_timeout")
+        if client is None or not all(hasattr(client, name) for name in required):
+            print("⚠️  This FireworksAI SDK version doesn't expose its HTTP client; keeping its default connection pool")
+            return
+        try:
+            pooled = httpx.Client(
+                headers=client._build_headers(client.extra_headers),
+                timeout=client.request_timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+        except Exception as e:
+            print(f"⚠️  Could not apply the FireworksAI connection pool limits ({e}); keeping the SDK default")
+            return
+        client._client.close()
+        client._client = pooled
+
+    def start(self, warm_up=False):
+        self.connect()
+        if warm_up:
+            # A one-token completion pays the TLS handshake and deployment resolution up front
+            self.complete([{"role": "user", "content": "ping"}], max_tokens=1, temperature=0.0)
+
+    def complete(self, messages, max_tokens, temperature):
+        response = self.llm.chat.completions.create(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        self.warm = True
+        return response.choices[0].message.content
+
+    def stream(self, messages, max_tokens, temperature):
+        stream = self.llm.chat.completions.create(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        self.warm = True
+        try:
+            for chunk in stream:
+                token = self._chunk_token(chunk)
+                if token:
+                    yield token
+        finally:
+            # Closing the response stops the generation upstream when the caller stops early
+            self._close_stream(stream)
+
+    async def acomplete(self, messages, max_tokens, temperature):
+        response = await self.llm.chat.completions.acreate(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        self.warm = True
+        return response.choices[0].message.content
+
+    async def astream(self, messages, max_tokens, temperature):
+        stream = await self.llm.chat.completions.acreate(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        self.warm = True
+        try:
+            async for chunk in stream:
+                token = self._chunk_token(chunk)
+                if token:
+                    yield token
+        finally:
+            await self._aclose_stream(stream)
+
+    @staticmethod
+    def _close_stream(stream):
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+    @staticmethod
+    async def _aclose_stream(stream):
+        close = getattr(stream, "aclose", None) or getattr(stream, "close", None)
+        if close is not None:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+
+    @staticmethod
+    def _chunk_token(chunk):
+        """Extract the text delta from a streamed completion chunk"""
+        if not chunk.choices:
+            return None
+        return chunk.choices[0].delta.content
+
+
+class DemoBackend(LLMBackend):
+    """Keyword-based demo responder - works without FireworksAI"""
+
+    name = "demo"
+
+    def __init__(self, intents_path=None):
+        from intents import DemoResponder
+
+        # Keyword rules live in intents.json and are matched in a single compiled pass
+        self.responder = DemoResponder(intents_path)
+
+    def complete(self, messages, max_tokens, temperature):
+        return self.generate_demo_response(last_user_message(messages))
+
+    def generate_demo_response(self, message):
+        """Generate demo responses based on message content"""
+        return self.responder.respond(message)
+
+
+STUB_WORDS = (
+    "IntelliMind", "is", "a", "deterministic", "stub", "response", "used", "for",
+    "offline", "load", "testing", "of", "the", "serving", "stack", "with", "fixed",
+    "latency", "and", "throughput.",
+)
+
+
+class StubBackend(LLMBackend):
+    """Deterministic token generator with a set time-to-first-token and token rate"""
+
+    name = "stub"
+
+    def __init__(self, ttft=0.2, tokens_per_second=50.0, response_tokens=100, error_rate=0.0):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+
+    def maybe_fail(self):
+        """Simulate a transient upstream failure for a share of calls"""
+        if self.error_rate and random.random() < self.error_rate:
+            raise ConnectionError("Simulated upstream failure")
+
+    def tokens(self, messages, max_tokens):
+        """The tokens this stub answers a prompt with; the same prompt always gets the same answer"""
+        digest = hashlib.sha256(last_user_message(messages).encode("utf-8")).digest()
+        offset = digest[0] % len(STUB_WORDS)
+        count = min(self.response_tokens, max_tokens)
+        words = [STUB_WORDS[(offset + i) % len(STUB_WORDS)] for i in range(count)]
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def token_delay(self):
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def complete(self, messages, max_tokens, temperature):
+        self.maybe_fail()
+        tokens = self.tokens(messages, max_tokens)
+        time.sleep(self.ttft + self.token_delay() * max(len(tokens) - 1, 0))
+        return "".join(tokens)
+
+    def stream(self, messages, max_tokens, temperature):
+        self.maybe_fail()
+        time.sleep(self.ttft)
+        for i, token in enumerate(self.tokens(messages, max_tokens)):
+            if i:
+                time.sleep(self.token_delay())
+            yield token
+
+    async def acomplete(self, messages, max_tokens, temperature):
+        self.maybe_fail()
+        tokens = self.tokens(messages, max_tokens)
+        await asyncio.sleep(self.ttft + self.token_delay() * max(len(tokens) - 1, 0))
+        return "".join(tokens)
+
+    async def astream(self, messages, max_tokens, temperature):
+        self.maybe_fail()
+        await asyncio.sleep(self.ttft)
+        for i, token in enumerate(self.tokens(messages, max_tokens)):
+            if i:
+                await asyncio.sleep(self.token_delay())
+            yield token
+
+
+def fireworks_client_settings(timeout):
+    """HTTP connection pool settings for the FireworksAI client from the environment"""
+    return {
+        "timeout": timeout,
+        "max_connections": int(os.getenv("FIREWORKS_MAX_CONNECTIONS", "32")),
+        "max_keepalive_connections": int(os.getenv("FIREWORKS_KEEPALIVE_CONNECTIONS", "16")),
+        "keepalive_expiry": float(os.getenv("FIREWORKS_KEEPALIVE_EXPIRY", "60")),
+    }
+
+
+def create_llm_backend():
+    """Build the LLM backend selected by the LLM_BACKEND setting, wrapped in the resilience policy"""
+    from resilience import ResilientBackend, resilience_settings
+
+    backend = os.getenv("LLM_BACKEND", "fireworks").lower()
+    settings = resilience_settings()
+
+    if backend == "fireworks":
+        # The client timeout backstops the per-request deadline enforced by ResilientBackend
+        client_settings = fireworks_client_settings(timeout=settings["timeout"] + 5)
+        fallback = None
+        fallback_model = os.getenv("FIREWORKS_FALLBACK_MODEL")
+        if fallback_model:
+            fallback = FireworksBackend(model=fallback_model, **client_settings)
+            fallback.name = "fireworks-fallback"
+        return ResilientBackend(FireworksBackend(**client_settings), fallback, **settings)
+    if backend == "demo":
+        return DemoBackend()
+    if backend == "stub":
+        stub = StubBackend(
+            ttft=float(os.getenv("STUB_TTFT_MS", "200")) / 1000.0,
+            tokens_per_second=float(os.getenv("STUB_TOKENS_PER_SECOND", "50")),
+            response_tokens=int(os.getenv("STUB_RESPONSE_TOKENS", "100")),
+            error_rate=float(os.getenv("STUB_ERROR_RATE", "0")),
+        )
+        return ResilientBackend(stub, **settings)
+    raise ValueError(f"Unknown LLM_BACKEND: {backend}")
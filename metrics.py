@@ -0,0 +1,320 @@
+"""
+IntelliMind Assistant - Metrics
+Minimal Prometheus-style counters, gauges and histograms for the hot path,
+rendered in the Prometheus text format by the /metrics endpoint.
+
+Each gunicorn worker keeps its own metrics. When METRICS_DIR is set, workers
+periodically write a snapshot there and /metrics merges every worker's
+snapshot, so whichever worker answers the scrape reports node-wide totals.
+Counters and histograms are summed; gauges are reported per worker.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _label_key(labelnames, labels):
+    """Canonical tuple of label values in declaration order"""
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """JSON-friendly copy of the current samples"""
+        with self._lock:
+            return [[list(key), value] for key, value in self._samples.items()]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set directly or read from a callback at collection"""
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._samples[key] = value
+
+    def set_function(self, function):
+        """Read the (unlabelled) gauge value from function() whenever metrics are collected"""
+        self._function = function
+
+    def snapshot(self):
+        if self._function is not None:
+            try:
+                self.set(self._function())
+            except Exception:
+                pass
+        return super().snapshot()
+
+
+class Histogram(_Metric):
+    """Bucketed distribution with sum and count"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                sample = self._samples[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample[i] += 1
+                    break
+            sample[-2] += value
+            sample[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), list(value)] for key, value in self._samples.items()]
+
+
+class MetricsRegistry:
+    """Collection of metrics with snapshot files for cross-worker aggregation"""
+
+    def __init__(self):
+        self._metrics = []
+        self._last_flush = 0.0
+        self.directory = os.getenv("METRICS_DIR")
+        self.flush_interval = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        """This worker's metrics as a JSON-friendly dict"""
+        return {
+            "pid": os.getpid(),
+            "metrics": {
+                metric.name: {
+                    "type": metric.type,
+                    "help": metric.documentation,
+                    "labelnames": list(metric.labelnames),
+                    "buckets": [_format_value(b) for b in metric.buckets] if metric.type == "histogram" else None,
+                    "samples": metric.snapshot(),
+                }
+                for metric in self._metrics
+            },
+        }
+
+    def flush_due(self):
+        """Whether flush() would write a snapshot now"""
+        return bool(self.directory) and time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self, force=False):
+        """Write this worker's snapshot to METRICS_DIR (at most once per flush interval)"""
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        os.makedirs(self.directory, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        # Atomic replace so a scrape never reads a half-written snapshot
+        os.replace(temp_path, os.path.join(self.directory, f"metrics-{os.getpid()}.json"))
+
+    def _worker_snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush(force=True)
+        snapshots = []
+        for filename in sorted(os.listdir(self.directory)):
+            if not (filename.startswith("metrics-") and filename.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as snapshot_file:
+                    snapshots.append(json.load(snapshot_file))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self):
+        """Prometheus text exposition of the metrics of every worker"""
+        merged = {}
+        for snapshot in self._worker_snapshots():
+            pid = snapshot["pid"]
+            alive = _pid_alive(pid)
+            for name, metric in snapshot["metrics"].items():
+                entry = merged.setdefault(name, dict(metric, samples={}))
+                for labels, value in metric["samples"]:
+                    if metric["type"] == "gauge":
+                        # Gauges from exited workers are stale; live ones are reported per worker
+                        if not alive:
+                            continue
+                        entry["samples"][tuple(labels) + (str(pid),)] = value
+                    elif metric["type"] == "counter":
+                        key = tuple(labels)
+                        entry["samples"][key] = entry["samples"].get(key, 0) + value
+                    else:
+                        key = tuple(labels)
+                        current = entry["samples"].get(key)
+                        entry["samples"][key] = value if current is None else [a + b for a, b in zip(current, value)]
+
+        lines = []
+        for name, metric in merged.items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labelnames = metric["labelnames"]
+            for labels, value in metric["samples"].items():
+                if metric["type"] == "gauge":
+                    pairs = list(zip(labelnames, labels)) + [("worker", labels[-1])]
+                    lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+                elif metric["type"] == "counter":
+                    lines.append(f"{name}{_format_labels(list(zip(labelnames, labels)))} {_format_value(value)}")
+                else:
+                    pairs = list(zip(labelnames, labels))
+                    cumulative = 0
+                    for bound, count in zip(metric["buckets"], value[:-2]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(pairs + [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(pairs)} {_format_value(value[-2])}")
+                    lines.append(f"{name}_count{_format_labels(pairs)} {_format_value(value[-1])}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.counter(
+    "intellimind_requests_total", "HTTP requests handled", ("endpoint", "method", "status"))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "intellimind_request_seconds", "Time to produce the HTTP response", ("endpoint",))
+STAGE_SECONDS = REGISTRY.histogram(
+    "intellimind_stage_seconds", "Time spent in each stage of handling a chat request", ("stage",))
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "intellimind_upstream_seconds", "Upstream LLM call latency", ("backend", "mode"))
+UPSTREAM_TTFT_SECONDS = REGISTRY.histogram(
+    "intellimind_upstream_ttft_seconds", "Time to the first streamed token from the upstream LLM", ("backend",))
+TOKENS_IN = REGISTRY.histogram(
+    "intellimind_prompt_tokens", "Estimated prompt tokens sent upstream", buckets=TOKEN_BUCKETS)
+TOKENS_OUT = REGISTRY.histogram(
+    "intellimind_completion_tokens", "Estimated completion tokens received from upstream", buckets=TOKEN_BUCKETS)
+ERRORS = REGISTRY.counter(
+    "intellimind_errors_total", "Errors raised while handling chat requests", ("type",))
+HISTORY_WINDOW_MESSAGES = REGISTRY.histogram(
+    "intellimind_history_window_messages", "Messages in the history window sent with each prompt",
+    buckets=(1, 2, 4, 6, 8, 10, 15, 20, 30, 50))
+CONVERSATION_SESSIONS = REGISTRY.gauge(
+    "intellimind_conversation_sessions", "Conversations held by the conversation store")
+CONVERSATION_BYTES = REGISTRY.gauge(
+    "intellimind_conversation_bytes", "Estimated memory held by in-process conversation history")
+SCHEDULER_QUEUE_DEPTH = REGISTRY.gauge(
+    "intellimind_scheduler_queue_depth", "Requests waiting for an upstream slot")
+SCHEDULER_RUNNING = REGISTRY.gauge(
+    "intellimind_scheduler_running", "Upstream calls in progress")
+UPSTREAM_FAILURES = REGISTRY.counter(
+    "intellimind_upstream_failures_total", "Failed upstream LLM attempts", ("backend", "type"))
+UPSTREAM_RETRIES = REGISTRY.counter(
+    "intellimind_upstream_retries_total", "Upstream LLM attempts that were retried", ("backend",))
+UPSTREAM_FALLBACKS = REGISTRY.counter(
+    "intellimind_upstream_fallbacks_total", "Requests handed to the fallback model", ("backend",))
+UPSTREAM_CIRCUIT_OPEN = REGISTRY.gauge(
+    "intellimind_upstream_circuit_open", "1 while the upstream circuit breaker is open", ("backend",))
+SUMMARY_JOBS = REGISTRY.counter(
+    "intellimind_summary_jobs_total", "Background conversation summary updates", ("result",))
+SUMMARY_SECONDS = REGISTRY.histogram(
+    "intellimind_summary_seconds", "Time to fold evicted turns into a conversation summary")
+SUMMARY_PENDING = REGISTRY.gauge(
+    "intellimind_summary_pending", "Conversations waiting for a summary update")
+CANCELLATIONS = REGISTRY.counter(
+    "intellimind_cancellations_total", "Generations abandoned because the client disconnected or the deadline passed",
+    ("reason", "mode"))
+RATE_LIMITED = REGISTRY.counter(
+    "intellimind_rate_limited_total", "Chat requests rejected by the rate limiter", ("key_by",))
+FAQ_ANSWERS = REGISTRY.counter(
+    "intellimind_faq_answers_total", "Messages answered by the FAQ fast-path without an upstream call", ("intent",))
+WARM_ANSWERS = REGISTRY.counter(
+    "intellimind_warm_answers_total", "Turns answered with a prepared opener or speculative answer", ("kind",))
+WARM_JOBS = REGISTRY.counter(
+    "intellimind_warm_jobs_total", "Background opener refreshes and next-turn speculations", ("kind", "result"))
+WARM_SECONDS = REGISTRY.histogram(
+    "intellimind_warm_seconds", "Time to prepare an opener or speculative answer", ("kind",))
@@ -0,0 +1,117 @@
+"""
+IntelliMind Assistant - Prompt Budget
+Token counting and prompt sizing. Picks the longest recent slice of the
+conversation that fits the model's context window and sizes max_tokens from
+the space that is left.
+
+Token counts come from a local approximate tokenizer (or tiktoken, when
+PROMPT_TOKENIZER=tiktoken and it is installed) and are cached per message
+text, so a turn only pays to count its new message.
+"""
+
+import os
+import re
+from functools import lru_cache
+
+# Per-message framing (role markers, separators) and per-prompt priming tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+PROMPT_OVERHEAD_TOKENS = 3
+
+# Rough BPE pieces: a word or number with its leading space, one symbol, or a whitespace run
+TOKEN_PIECE = re.compile(r" ?[A-Za-z]+| ?[0-9]{1,3}| ?[^\sA-Za-z0-9]|\s+")
+# Average letters per BPE token within a long word
+LETTERS_PER_TOKEN = 6
+
+
+class PromptTooLongError(ValueError):
+    """The newest message alone doesn't leave room for a response in the model's context"""
+
+
+def approximate_token_count(text):
+    """Approximate BPE token count: ~1 per short word, number group, symbol or non-ASCII character"""
+    count = 0
+    for piece in TOKEN_PIECE.findall(text):
+        word = piece.lstrip(" ")
+        if word.isascii() and word.isalpha():
+            count += (len(word) + LETTERS_PER_TOKEN - 1) // LETTERS_PER_TOKEN
+        else:
+            count += 1
+    return count
+
+
+def _tokenizer():
+    """Token counting function selected by PROMPT_TOKENIZER (approx or tiktoken)"""
+    if os.getenv("PROMPT_TOKENIZER", "approx").lower() == "tiktoken":
+        try:
+            import tiktoken
+        except ImportError:
+            return approximate_token_count
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    return approximate_token_count
+
+
+_count = _tokenizer()
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text):
+    """Tokens in a piece of text, cached so repeated history messages are counted once"""
+    return _count(text)
+
+
+def message_tokens(message):
+    """Tokens a message costs in the prompt"""
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def prompt_tokens(messages):
+    """Tokens a complete prompt costs"""
+    return PROMPT_OVERHEAD_TOKENS + sum(message_tokens(message) for message in messages)
+
+
+class PromptBudget:
+    """Fits a prompt into the model's context window and sizes the completion"""
+
+    def __init__(self, context_tokens=8192, max_output_tokens=500, min_output_tokens=64):
+        self.context_tokens = context_tokens
+        self.max_output_tokens = max_output_tokens
+        self.min_output_tokens = min_output_tokens
+
+    def fit(self, system_messages, history):
+        """Return (messages, max_tokens, prompt_tokens) for the longest history suffix that fits"""
+        used = PROMPT_OVERHEAD_TOKENS + sum(message_tokens(message) for message in system_messages)
+        limit = self.context_tokens - self.min_output_tokens
+
+        costs = []
+        start = len(history)
+        # Walk back from the newest message; the newest one is always included
+        for message in reversed(history):
+            cost = message_tokens(message)
+            if costs and used + cost > limit:
+                break
+            used += cost
+            costs.append(cost)
+            start -= 1
+
+        # Don't open the history with a reply whose question was cut off
+        while len(history) - start > 1 and history[start]["role"] == "assistant":
+            used -= costs.pop()
+            start += 1
+
+        remaining = self.context_tokens - used
+        if remaining < self.min_output_tokens:
+            raise PromptTooLongError(
+                f"Message is too long: the prompt needs {used} tokens of the model's {self.context_tokens}-token context"
+            )
+        max_tokens = min(self.max_output_tokens, remaining)
+        return list(system_messages) + list(history[start:]), max_tokens, used
+
+
+def create_prompt_budget():
+    """Prompt budget sized from the environment"""
+    return PromptBudget(
+        context_tokens=int(os.getenv("MODEL_CONTEXT_TOKENS", "8192")),
+        max_output_tokens=int(os.getenv("MAX_OUTPUT_TOKENS", "500")),
+        min_output_tokens=int(os.getenv("MIN_OUTPUT_TOKENS", "64")),
+    )
@@ -0,0 +1,282 @@
+"""
+IntelliMind Assistant - Rate Limiting
+Token-bucket rate limiting of chat requests per tenant (session, client IP or
+API key), plus per-tenant accounting of the upstream tokens each one uses.
+
+Buckets and usage live in process memory or in a SQLite file shared by every
+worker on the node, so a client can't multiply its allowance by landing on
+different gunicorn workers.
+
+When sessions are the tenants, every session from one address also draws on a
+shared, larger address bucket (as do requests without a session), so a new
+session cookie never brings a new allowance with it.
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+API_KEY_HEADER = 'X-API-Key'
+
+
+class RateLimitedError(Exception):
+    """The tenant has used up its request allowance; retry_after is in seconds"""
+
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("Too many requests, please slow down")
+        self.retry_after = retry_after
+
+
+def _refill(tokens, updated_at, now, rate, burst):
+    """Bucket level after refilling at rate tokens/second since updated_at"""
+    return min(burst, tokens + max(now - updated_at, 0.0) * rate)
+
+
+class MemoryRateLimitBackend:
+    """Per-process buckets and usage counters, bounded to the most recently seen tenants"""
+
+    def __init__(self, max_tenants=10000):
+        self.max_tenants = max_tenants
+        # tenant -> [tokens, updated_at], least recently used first
+        self._buckets = OrderedDict()
+        # tenant -> [requests, prompt_tokens, completion_tokens]
+        self._usage = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, tenant, rate, burst, cost=1.0):
+        """Take cost tokens from the tenant's bucket; returns seconds until that's possible (0 if taken)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(tenant, (burst, now))
+            tokens = _refill(tokens, updated_at, now, rate, burst)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate if rate > 0 else math.inf
+            self._buckets[tenant] = (tokens, now)
+            while len(self._buckets) > self.max_tenants:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def add_usage(self, tenant, prompt_tokens, completion_tokens):
+        with self._lock:
+            usage = self._usage.pop(tenant, None) or [0, 0, 0]
+            usage[0] += 1
+            usage[1] += prompt_tokens
+            usage[2] += completion_tokens
+            self._usage[tenant] = usage
+            while len(self._usage) > self.max_tenants:
+                self._usage.popitem(last=False)
+
+    def top_usage(self, limit):
+        with self._lock:
+            rows = [(tenant, *usage) for tenant, usage in self._usage.items()]
+        rows.sort(key=lambda row: row[2] + row[3], reverse=True)
+        return rows[:limit]
+
+
+class SQLiteRateLimitBackend:
+    """Buckets and usage counters in a SQLite file shared by every worker process on a node"""
+
+    def __init__(self, path="rate_limits.db"):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+        connection = self._connect()
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                tenant TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tenant_usage (
+                tenant TEXT PRIMARY KEY,
+                requests INTEGER NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def take(self, tenant, rate, burst, cost=1.0):
+        connection = self._connect()
+        # Wall-clock time, since the buckets are shared between processes
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent workers can't both spend the same tokens
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated_at FROM rate_limit_buckets WHERE tenant = ?", (tenant,)
+            ).fetchone()
+            tokens = _refill(*row, now, rate, burst) if row else burst
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate if rate > 0 else math.inf
+            connection.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (tenant, tokens, updated_at) VALUES (?, ?, ?)",
+                (tenant, tokens, now),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._takes += 1
+        if self._takes % 1000 == 0:
+            self.prune(rate, burst)
+        return wait
+
+    def add_usage(self, tenant, prompt_tokens, completion_tokens):
+        self._connect().execute(
+            """
+            INSERT INTO tenant_usage (tenant, requests, prompt_tokens, completion_tokens, updated_at)
+            VALUES (?, 1, ?, ?, ?)
+            ON CONFLICT (tenant) DO UPDATE SET
+                requests = requests + 1,
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                completion_tokens = completion_tokens + excluded.completion_tokens,
+                updated_at = excluded.updated_at
+            """,
+            (tenant, prompt_tokens, completion_tokens, time.time()),
+        )
+
+    def top_usage(self, limit):
+        return self._connect().execute(
+            """
+            SELECT tenant, requests, prompt_tokens, completion_tokens FROM tenant_usage
+            ORDER BY prompt_tokens + completion_tokens DESC LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+
+    def prune(self, rate, burst):
+        """Drop buckets idle long enough to have refilled; a missing bucket counts as full"""
+        if rate > 0:
+            self._connect().execute(
+                "DELETE FROM rate_limit_buckets WHERE updated_at < ?", (time.time() - burst / rate,))
+
+
+class RateLimiter:
+    """Token-bucket limiter for chat requests with per-tenant usage accounting"""
+
+    def __init__(self, backend, requests_per_minute=30, burst=10, key_by="session", trust_proxy=False,
+                 address_factor=4.0):
+        self.backend = backend
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst
+        self.key_by = key_by
+        # With key_by="session", the address bucket's rate and burst are this many times a session's
+        # (both scaled alike, so the two kinds of bucket take equally long to refill)
+        self.address_factor = address_factor
+        # Only honour X-Forwarded-For when a proxy we run sets it; otherwise clients could pick their own key
+        self.trust_proxy = trust_proxy
+        self.allowed = 0
+        self.limited = 0
+
+    def address(self, remote_addr, forwarded_for=None):
+        """The address tenant of a request"""
+        if self.trust_proxy and forwarded_for:
+            # The entry appended by our own proxy, i.e. the address it saw the request come from
+            return "ip:" + forwarded_for.split(",")[-1].strip()
+        return "ip:" + (remote_addr or "unknown")
+
+    def tenant(self, session_id, remote_addr, forwarded_for=None, api_key=None):
+        """The key a request is limited and accounted under"""
+        # session_id is None without a valid session cookie; such requests are limited by
+        # address, otherwise dropping the cookie would earn a fresh allowance every time
+        if self.key_by == "api_key" and api_key:
+            # Keys are hashed so the stats endpoint and the database never hold the secret itself
+            return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        if self.key_by == "session" and session_id:
+            return "session:" + hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:16]
+        return self.address(remote_addr, forwarded_for)
+
+    def check(self, tenant, address=None):
+        """Spend one request from the tenant's allowance, or raise RateLimitedError
+
+        With key_by="session" the request also spends from its address's bucket
+        (alone, for requests without a session), which caps all sessions from
+        one address together.
+        """
+        if self.key_by == "session" and address is not None:
+            wait = 0.0
+            if tenant != address:
+                wait = self.backend.take(tenant, self.rate, self.burst)
+            if not wait:
+                wait = self.backend.take(address, self.rate * self.address_factor, self.burst * self.address_factor)
+        else:
+            wait = self.backend.take(tenant, self.rate, self.burst)
+        if wait > 0:
+            self.limited += 1
+            metrics.RATE_LIMITED.inc(key_by=self.key_by)
+            raise RateLimitedError(retry_after=max(1, math.ceil(wait)) if wait != math.inf else 3600)
+        self.allowed += 1
+
+    def record_usage(self, tenant, prompt_tokens, completion_tokens):
+        """Charge an upstream generation's tokens to the tenant that asked for it"""
+        self.backend.add_usage(tenant, prompt_tokens, completion_tokens)
+
+    def stats(self, top=10):
+        """Counters for this worker and the heaviest tenants (shared across workers with SQLite)"""
+        return {
+            "key_by": self.key_by,
+            "requests_per_minute": self.rate * 60,
+            "burst": self.burst,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "top_tenants": [
+                {"tenant": tenant, "requests": requests, "prompt_tokens": prompt_tokens,
+                 "completion_tokens": completion_tokens}
+                for tenant, requests, prompt_tokens, completion_tokens in self.backend.top_usage(top)
+            ],
+        }
+
+
+def create_rate_limiter():
+    """Build the rate limiter selected by RATE_LIMIT, or None when disabled"""
+    backend = os.getenv("RATE_LIMIT", "off").lower()
+    if backend == "off":
+        return None
+    if backend == "memory":
+        limiter_backend = MemoryRateLimitBackend(max_tenants=int(os.getenv("RATE_LIMIT_MAX_TENANTS", "10000")))
+    elif backend == "sqlite":
+        limiter_backend = SQLiteRateLimitBackend(path=os.getenv("RATE_LIMIT_DB_PATH", "rate_limits.db"))
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT backend: {backend}")
+
+    key_by = os.getenv("RATE_LIMIT_KEY", "session").lower()
+    if key_by not in ("session", "ip", "api_key"):
+        raise ValueError(f"Unknown RATE_LIMIT_KEY: {key_by}")
+    return RateLimiter(
+        limiter_backend,
+        requests_per_minute=float(os.getenv("RATE_LIMIT_PER_MINUTE", "30")),
+        burst=float(os.getenv("RATE_LIMIT_BURST", "10")),
+        key_by=key_by,
+        trust_proxy=os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() in ("1", "true", "yes"),
+        address_factor=float(os.getenv("RATE_LIMIT_ADDRESS_FACTOR", "4")),
+    )
@@ -0,0 +1,422 @@
+"""
+IntelliMind Assistant - Upstream Resilience
+Deadlines, jittered exponential retries, a circuit breaker and an optional
+fallback model around the upstream LLM call, so a slow or failing FireworksAI
+fails fast with a proper HTTP status instead of holding a worker until
+gunicorn kills it.
+
+Each call's deadline is the shorter of UPSTREAM_TIMEOUT and the request's own
+deadline (see cancellation.py), and a blocked sync call gives up as soon as
+its client disconnects.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import metrics
+from cancellation import CANCEL_POLL_INTERVAL, RequestCancelledError, check_cancelled, count_cancellation, remaining
+from llm_backends import LLMBackend
+
+# Exception class names (from the FireworksAI SDK, httpx, aiohttp and the stdlib)
+# that indicate a transient upstream problem worth retrying
+RETRYABLE_ERRORS = {
+    "RateLimitError", "ServiceUnavailableError", "BadGatewayError", "InternalServerError",
+    "APITimeoutError", "TimeoutException", "ConnectError", "ConnectTimeout", "ReadTimeout",
+    "ReadError", "RemoteProtocolError", "ServerDisconnectedError", "ClientConnectionError",
+    "TimeoutError", "ConnectionError",
+}
+
+CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN = "closed", "half_open", "open"
+# What CircuitBreaker.allow() returns to the one call let through to test a recovering upstream
+PROBE = "probe"
+
+
+class UpstreamError(Exception):
+    """The upstream LLM failed; status_code is what the API route should return"""
+
+    status_code = 502
+
+
+class UpstreamTimeoutError(UpstreamError):
+    """The upstream LLM did not answer within the request deadline"""
+
+    status_code = 504
+
+
+class CircuitOpenError(UpstreamError):
+    """The circuit breaker is open, so the upstream is not being called"""
+
+    status_code = 503
+
+
+def is_retryable(error):
+    """Whether an upstream exception is transient"""
+    if isinstance(error, UpstreamTimeoutError):
+        return True
+    if any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__):
+        return True
+    # The FireworksAI SDK re-raises retryable errors as a plain Exception once its own retries run out
+    return str(error).startswith("Failed to create")
+
+
+def as_upstream_error(error):
+    """Wrap an upstream exception in the matching UpstreamError"""
+    if isinstance(error, UpstreamError):
+        return error
+    if "Timeout" in type(error).__name__:
+        return UpstreamTimeoutError(f"The model did not respond in time ({type(error).__name__})")
+    return UpstreamError(f"The model request failed: {error}")
+
+
+class Deadline:
+    """Absolute point in time a request must finish by"""
+
+    def __init__(self, seconds, client_limited=False):
+        self.expires_at = time.monotonic() + seconds
+        # Whether the request's own (client) deadline is shorter than the upstream timeout
+        self.client_limited = client_limited
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts=3, base_delay=0.25, max_delay=4.0):
+        # With no attempts the upstream would never be called, and no error ever reported
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Seconds to wait before retrying after the given (zero-based) failed attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets a single probe through after a cool-down"""
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go upstream now: True, PROBE for the single half-open probe, or False"""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let one probe request through; everything else keeps failing fast
+                self.state = CIRCUIT_HALF_OPEN
+                return PROBE
+            return False
+
+    def end_probe(self):
+        """Settle a finished probe that neither succeeded nor recorded a failure
+
+        A probe that was cancelled, disconnected, failed with a non-retryable error or
+        broke off mid-stream reopens the breaker with a fresh timer; otherwise the
+        breaker would stay half-open, turning every later request away.
+        """
+        with self._lock:
+            if self.state != CIRCUIT_HALF_OPEN:
+                return
+            self.state = CIRCUIT_OPEN
+            self.opened_at = time.monotonic()
+        metrics.UPSTREAM_CIRCUIT_OPEN.set(1, backend=self.name)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = CIRCUIT_CLOSED
+        metrics.UPSTREAM_CIRCUIT_OPEN.set(0, backend=self.name)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+            is_open = self.state == CIRCUIT_OPEN
+        metrics.UPSTREAM_CIRCUIT_OPEN.set(1 if is_open else 0, backend=self.name)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _upstream_executor():
+    """Thread pool that lets sync callers stop waiting on a hung upstream call at the deadline"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Created lazily so nothing is started before gunicorn forks its workers
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("UPSTREAM_THREADS", "32")),
+                thread_name_prefix="upstream",
+            )
+        return _executor
+
+
+class ResilientBackend(LLMBackend):
+    """Wraps a backend with deadlines, retries, a circuit breaker and an optional fallback"""
+
+    def __init__(self, primary, fallback=None, timeout=30.0, retry=None, failure_threshold=5, reset_timeout=30.0):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = primary.name
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        # Each model gets its own breaker, so a degraded primary doesn't block the fallback
+        self.breakers = {
+            backend: CircuitBreaker(backend.name, failure_threshold, reset_timeout)
+            for backend in self._backends()
+        }
+
+    @property
+    def warm(self):
+        return self.primary.warm
+
+    def start(self, warm_up=False):
+        self.primary.start(warm_up)
+        if self.fallback is not None:
+            self.fallback.start()
+
+    def stats(self):
+        """Circuit breaker state per model"""
+        return {breaker.name: breaker.state for breaker in self.breakers.values()}
+
+    def _backends(self):
+        return [self.primary] + ([self.fallback] if self.fallback is not None else [])
+
+    def _failed_attempt(self, backend, error, attempt, deadline):
+        """Record a failed attempt; returns the delay before retrying, or raises if we shouldn't"""
+        metrics.UPSTREAM_FAILURES.inc(backend=backend.name, type=type(error).__name__)
+        retryable = is_retryable(error)
+        # Running out of a client's short deadline says nothing about the upstream's health
+        if retryable and not (isinstance(error, UpstreamTimeoutError) and deadline.client_limited):
+            self.breakers[backend].record_failure()
+        if not retryable or attempt + 1 >= self.retry.max_attempts:
+            raise as_upstream_error(error) from error
+        delay = self.retry.delay(attempt)
+        if delay >= deadline.remaining():
+            raise as_upstream_error(error) from error
+        metrics.UPSTREAM_RETRIES.inc(backend=backend.name)
+        return delay
+
+    def _deadline(self):
+        """This call's deadline: UPSTREAM_TIMEOUT, or the request's own deadline if that's sooner"""
+        seconds = remaining(self.timeout)
+        return Deadline(seconds, client_limited=seconds < self.timeout)
+
+    @staticmethod
+    def _wait(future, deadline):
+        """Wait for a submitted upstream call until the deadline, giving up early if the client disconnects"""
+        while True:
+            try:
+                return future.result(timeout=min(CANCEL_POLL_INTERVAL, deadline.remaining()))
+            except FutureTimeoutError:
+                # The call itself may have raised a TimeoutError; that's its result, not ours
+                if future.done():
+                    raise
+                if deadline.expired():
+                    count_cancellation('deadline', 'complete')
+                    raise UpstreamTimeoutError("The model did not respond in time")
+                try:
+                    check_cancelled('complete')
+                except RequestCancelledError:
+                    # A call that hasn't started yet is dropped; a running one finishes in the background
+                    future.cancel()
+                    raise
+
+    def _with_fallback(self, call):
+        """Try the primary backend, then the fallback if the primary failed upstream"""
+        backends = self._backends()
+        for i, backend in enumerate(backends):
+            try:
+                return call(backend)
+            except UpstreamError:
+                if i + 1 == len(backends):
+                    raise
+                metrics.UPSTREAM_FALLBACKS.inc(backend=backend.name)
+
+    def complete(self, messages, max_tokens, temperature):
+        deadline = self._deadline()
+
+        def call(backend):
+            for attempt in range(self.retry.max_attempts):
+                check_cancelled('complete')
+                breaker = self.breakers[backend]
+                allowed = breaker.allow()
+                if not allowed:
+                    raise CircuitOpenError("The model is temporarily unavailable, please try again shortly")
+                try:
+                    future = _upstream_executor().submit(backend.complete, messages, max_tokens, temperature)
+                    try:
+                        result = self._wait(future, deadline)
+                    except UpstreamTimeoutError as error:
+                        # The abandoned call finishes in the background, bounded by the client timeout
+                        time.sleep(self._failed_attempt(backend, error, attempt, deadline))
+                        continue
+                    except RequestCancelledError:
+                        raise
+                    except Exception as e:
+                        time.sleep(self._failed_attempt(backend, e, attempt, deadline))
+                        continue
+                    breaker.record_success()
+                    return result
+                finally:
+                    if allowed == PROBE:
+                        breaker.end_probe()
+
+        return self._with_fallback(call)
+
+    def stream(self, messages, max_tokens, temperature):
+        deadline = self._deadline()
+        backends = self._backends()
+        for i, backend in enumerate(backends):
+            for attempt in range(self.retry.max_attempts):
+                check_cancelled('stream')
+                breaker = self.breakers[backend]
+                allowed = breaker.allow()
+                if not allowed:
+                    error = CircuitOpenError("The model is temporarily unavailable, please try again shortly")
+                    break
+                started = False
+                stream = backend.stream(messages, max_tokens, temperature)
+                try:
+                    for token in stream:
+                        if deadline.expired():
+                            count_cancellation('deadline', 'stream')
+                            raise UpstreamTimeoutError("The model did not finish in time")
+                        started = True
+                        yield token
+                    breaker.record_success()
+                    return
+                except Exception as e:
+                    # Once tokens have reached the client the stream can't be restarted
+                    if started:
+                        metrics.UPSTREAM_FAILURES.inc(backend=backend.name, type=type(e).__name__)
+                        raise as_upstream_error(e) from e
+                    try:
+                        time.sleep(self._failed_attempt(backend, e, attempt, deadline))
+                    except UpstreamError as upstream_error:
+                        error = upstream_error
+                        break
+                finally:
+                    # Also runs when our caller closes us early (the client went away),
+                    # so the upstream generation is cancelled rather than left running
+                    stream.close()
+                    if allowed == PROBE:
+                        breaker.end_probe()
+            if i + 1 == len(backends):
+                raise error
+            metrics.UPSTREAM_FALLBACKS.inc(backend=backend.name)
+
+    async def acomplete(self, messages, max_tokens, temperature):
+        deadline = self._deadline()
+
+        async def call(backend):
+            for attempt in range(self.retry.max_attempts):
+                breaker = self.breakers[backend]
+                allowed = breaker.allow()
+                if not allowed:
+                    raise CircuitOpenError("The model is temporarily unavailable, please try again shortly")
+                try:
+                    try:
+                        result = await asyncio.wait_for(
+                            backend.acomplete(messages, max_tokens, temperature), deadline.remaining())
+                    except asyncio.TimeoutError:
+                        count_cancellation('deadline', 'complete')
+                        error = UpstreamTimeoutError("The model did not respond in time")
+                        await asyncio.sleep(self._failed_attempt(backend, error, attempt, deadline))
+                        continue
+                    except Exception as e:
+                        await asyncio.sleep(self._failed_attempt(backend, e, attempt, deadline))
+                        continue
+                    breaker.record_success()
+                    return result
+                finally:
+                    # Cancellation (asyncio.CancelledError) included
+                    if allowed == PROBE:
+                        breaker.end_probe()
+
+        backends = self._backends()
+        for i, backend in enumerate(backends):
+            try:
+                return await call(backend)
+            except UpstreamError:
+                if i + 1 == len(backends):
+                    raise
+                metrics.UPSTREAM_FALLBACKS.inc(backend=backend.name)
+
+    async def astream(self, messages, max_tokens, temperature):
+        deadline = self._deadline()
+        backends = self._backends()
+        for i, backend in enumerate(backends):
+            for attempt in range(self.retry.max_attempts):
+                breaker = self.breakers[backend]
+                allowed = breaker.allow()
+                if not allowed:
+                    error = CircuitOpenError("The model is temporarily unavailable, please try again shortly")
+                    break
+                started = False
+                stream = backend.astream(messages, max_tokens, temperature)
+                try:
+                    while True:
+                        try:
+                            token = await asyncio.wait_for(stream.__anext__(), deadline.remaining())
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            count_cancellation('deadline', 'stream')
+                            raise UpstreamTimeoutError("The model did not finish in time")
+                        started = True
+                        yield token
+                    breaker.record_success()
+                    return
+                except Exception as e:
+                    if started:
+                        metrics.UPSTREAM_FAILURES.inc(backend=backend.name, type=type(e).__name__)
+                        raise as_upstream_error(e) from e
+                    try:
+                        await asyncio.sleep(self._failed_attempt(backend, e, attempt, deadline))
+                    except UpstreamError as upstream_error:
+                        error = upstream_error
+                        break
+                finally:
+                    await stream.aclose()
+                    if allowed == PROBE:
+                        breaker.end_probe()
+            if i + 1 == len(backends):
+                raise error
+            metrics.UPSTREAM_FALLBACKS.inc(backend=backend.name)
+
+
+def resilience_settings():
+    """Resilience policy from the environment"""
+    return {
+        "timeout": float(os.getenv("UPSTREAM_TIMEOUT", "30")),
+        "retry": RetryPolicy(
+            max_attempts=int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.25")),
+            max_delay=float(os.getenv("UPSTREAM_RETRY_MAX_DELAY", "4")),
+        ),
+        "failure_threshold": int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+        "reset_timeout": float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30")),
+    }
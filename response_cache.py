@@ -0,0 +1,198 @@
+"""
+IntelliMind Assistant - Response Cache
+Opt-in cache for repeated prompts ("hello", "what can you do?") so common
+openers skip the FireworksAI round trip.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_text(text):
+    """Normalize case, whitespace and trailing ?!. so trivially different phrasings share a cache key.
+
+    Other punctuation is kept: "What is 2+2?" and "What is 2*2?" are different questions.
+    """
+    text = " ".join(text.lower().split())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def cache_key(messages, params):
+    """Key on the normalized prompt window and the sampling parameters"""
+    payload = {
+        "messages": [[message["role"], normalize_text(message["content"])] for message in messages],
+        "max_tokens": params.get("max_tokens"),
+        "temperature": params.get("temperature"),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with TTL expiry"""
+
+    def __init__(self, ttl=3600, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (response, stored_at), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            response, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def set(self, key, response):
+        with self._lock:
+            self._entries[key] = (response, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """On-disk cache shared by every worker process on a node"""
+
+    def __init__(self, path="response_cache.db", ttl=3600, max_entries=10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._connect().execute(
+            "CREATE INDEX IF NOT EXISTS response_cache_accessed_at ON response_cache (accessed_at)"
+        )
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        connection = self._connect()
+        now = time.time()
+        row = connection.execute(
+            "SELECT response FROM response_cache WHERE key = ? AND stored_at >= ?",
+            (key, now - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        connection.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, response):
+        connection = self._connect()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO response_cache (key, response, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, response, now, now),
+        )
+        # Trim expired entries, then the least recently used ones past the cap
+        connection.execute("DELETE FROM response_cache WHERE stored_at < ?", (now - self.ttl,))
+        connection.execute(
+            """
+            DELETE FROM response_cache WHERE key IN (
+                SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """Response cache with hit/miss accounting and a temperature bypass"""
+
+    def __init__(self, backend, max_temperature=0.7):
+        self.backend = backend
+        # Sampling above this temperature is treated as non-deterministic and never cached
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def cacheable(self, params):
+        """Whether responses generated with these parameters may be reused"""
+        return (params.get("temperature") or 0.0) <= self.max_temperature
+
+    def get(self, messages, params):
+        """Return a cached response for this prompt, or None"""
+        if not self.cacheable(params):
+            self.bypasses += 1
+            return None
+        response = self.backend.get(cache_key(messages, params))
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    def set(self, messages, params, response):
+        """Store a response for this prompt"""
+        if self.cacheable(params) and response:
+            self.backend.set(cache_key(messages, params), response)
+
+    def stats(self):
+        """Hit/miss counters for this worker"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "entries": len(self.backend),
+        }
+
+
+def create_response_cache():
+    """Build the response cache selected by RESPONSE_CACHE, or None when disabled"""
+    backend = os.getenv("RESPONSE_CACHE", "off").lower()
+    ttl = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+    if backend == "off":
+        return None
+    if backend == "memory":
+        cache_backend = MemoryCacheBackend(ttl=ttl, max_entries=max_entries)
+    elif backend == "sqlite":
+        cache_backend = SQLiteCacheBackend(
+            path=os.getenv("RESPONSE_CACHE_DB_PATH", "response_cache.db"),
+            ttl=ttl,
+            max_entries=max_entries,
+        )
+    else:
+        raise ValueError(f"Unknown RESPONSE_CACHE backend: {backend}")
+
+    # The app samples every reply at 0.7, so a lower default would never store anything
+    return ResponseCache(cache_backend, max_temperature=float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.7")))
@@ -0,0 +1,127 @@
+"""
+IntelliMind Assistant - Lean Responses
+Negotiated gzip/brotli compression of API responses and compact JSON
+serialization, shared by the Flask and ASGI apps.
+
+orjson is used for JSON when installed, and brotli for "br" compression;
+without them the standard library's json and gzip are used.
+"""
+
+import json
+import os
+import zlib
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'true').lower() in ('1', 'true', 'yes')
+# Smaller bodies gain less than the compression costs (and often fit one packet anyway)
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+# Dynamic responses favour speed: gzip 6 and brotli 4 compress about as well as gzip 9 at a fraction of its CPU
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def dumps(obj):
+    """Compact JSON text"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def dump_bytes(obj):
+    """Compact JSON as UTF-8 bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class CompactJSONProvider(DefaultJSONProvider):
+    """jsonify() without indentation (even in debug mode), key sorting or \\u escapes, via orjson when available"""
+
+    compact = True
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=self.default).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is not None:
+            body = orjson.dumps(obj, default=self.default)
+        else:
+            body = super().dumps(obj).encode('utf-8')
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def choose_encoding(accept_encoding):
+    """The best encoding the client accepts, or None"""
+    if not RESPONSE_COMPRESSION or not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.partition(';')
+        params = params.strip()
+        try:
+            quality = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            quality = 1.0
+        if quality > 0:
+            accepted.add(name.strip())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compressible(content_type, size=None):
+    """Whether a body of this type (and size, if known) is worth compressing"""
+    if not content_type or not content_type.startswith(COMPRESSIBLE_TYPES):
+        return False
+    return size is None or size >= COMPRESS_MIN_BYTES
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte strings incrementally"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        finish = compressor.finish
+        process = compressor.process
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        finish = compressor.flush
+        process = compressor.compress
+    for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def weak_etag(etag):
+    """A compressed body isn't byte-identical to the original, so its validator becomes weak"""
+    if etag and not etag.startswith('W/'):
+        return 'W/' + etag
+    return etag
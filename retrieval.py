@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+IntelliMind Assistant - Retrieval
+Finds passages of the project documentation (and of a conversation's own
+earlier turns) that are relevant to the user's message, so the model can
+answer questions about installing, deploying and using IntelliMind.
+
+Documents are split into heading-scoped chunks and embedded with a hashed
+TF-IDF embedder (no model download, pure NumPy), or with a local
+sentence-transformers model when RETRIEVAL_EMBEDDER names one. Chunk vectors
+live in a memory-mapped float32 matrix on disk, so every worker shares one
+copy through the page cache; a query is a single matrix-vector product.
+
+The index is built incrementally: only files whose content changed are
+re-chunked, and rows of replaced chunks are retired until the next compaction.
+A compaction writes a new generation of the vector file, named by the metadata
+that replaces the old one, so readers never map a file of the wrong size.
+
+Examples:
+  python retrieval.py build
+  python retrieval.py search "how do I deploy with nginx"
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
+
+import numpy as np
+
+from prompt_budget import count_tokens
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+WORD = re.compile(r"[a-z0-9]+(?:[.'_-][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i if in is it its me my of on or so that the "
+    "this to was we what when where which who why will with you your".split()
+)
+HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+
+# Chunks are about a paragraph or two: big enough to answer from, small enough to rank sharply
+CHUNK_CHARS = 800
+CHUNK_OVERLAP = 150
+# Bump when chunking changes, so existing indexes are rebuilt rather than mixed
+INDEX_VERSION = 1
+
+
+def tokenize(text):
+    """Lowercased content words plus adjacent-word bigrams"""
+    words = [word for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+@lru_cache(maxsize=65536)
+def _bucket(term, dim):
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little") % dim
+
+
+class HashedTfidfEmbedder:
+    """Feature-hashed TF-IDF: sublinear term frequencies per chunk, IDF weights applied to the query"""
+
+    # IDF lives on the query side, so adding documents never invalidates stored vectors
+    uses_idf = True
+
+    def __init__(self, dim=4096):
+        self.dim = dim
+        self.name = f"hashed-tfidf-{dim}"
+
+    def counts(self, text):
+        counts = {}
+        for term in tokenize(text):
+            bucket = _bucket(term, self.dim)
+            counts[bucket] = counts.get(bucket, 0) + 1
+        return counts
+
+    def _vector(self, counts, idf=None):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not counts:
+            return vector
+        buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        if idf is not None:
+            weights *= idf[buckets]
+        vector[buckets] = weights
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts):
+        return np.stack([self._vector(self.counts(text)) for text in texts]) if texts else \
+            np.zeros((0, self.dim), dtype=np.float32)
+
+    def embed_query(self, text, idf=None):
+        return self._vector(self.counts(text), idf)
+
+
+class SentenceTransformerEmbedder:
+    """Dense embeddings from a local sentence-transformers model (CPU)"""
+
+    uses_idf = False
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+
+    def counts(self, text):
+        return {}
+
+    def embed_documents(self, texts):
+        return self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+    def embed_query(self, text, idf=None):
+        return self.embed_documents([text])[0]
+
+
+def chunk_markdown(text, source):
+    """Split a markdown document into heading-scoped, overlapping chunks"""
+    sections = []
+    headings = []
+    title = ""
+    lines = []
+    in_fence = False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        # A "#" inside a code block is a shell comment, not a heading
+        match = None if in_fence else HEADING.match(line)
+        if match:
+            sections.append((title, "\n".join(lines)))
+            level = len(match.group(1))
+            headings = headings[:level - 1] + [match.group(2).strip()]
+            # The nearest two headings; the document title would add the same words to every chunk
+            title = " > ".join(headings[-2:])
+            lines = []
+        else:
+            lines.append(line)
+    sections.append((title, "\n".join(lines)))
+
+    chunks = []
+    for title, body in sections:
+        body = body.strip()
+        if not body:
+            continue
+        start = 0
+        while start < len(body):
+            end = min(start + CHUNK_CHARS, len(body))
+            if end < len(body):
+                # Prefer to cut at a paragraph or line break
+                cut = body.rfind("\n", start + CHUNK_CHARS // 2, end)
+                end = cut if cut > 0 else end
+            piece = body[start:end].strip()
+            if piece:
+                # The heading path is part of the chunk so a section is found by its title too
+                chunks.append({"source": source, "title": title, "text": f"{title}\n{piece}" if title else piece})
+            if end >= len(body):
+                break
+            start = max(end - CHUNK_OVERLAP, start + 1)
+    return chunks
+
+
+class DocumentIndex:
+    """Memory-mapped vector index over document chunks, shared by every worker on the node"""
+
+    def __init__(self, directory, embedder):
+        self.directory = directory
+        self.embedder = embedder
+        self.meta_path = os.path.join(directory, "index.json")
+        self.df_path = os.path.join(directory, "df.npy")
+        self._loaded_mtime = None
+        self._matrix = None
+        self._live = None
+        self._idf = None
+        self.chunks = []
+        self._lock = threading.Lock()
+
+    # Building
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != INDEX_VERSION or meta.get("embedder") != self.embedder.name:
+            return None
+        return meta
+
+    def _vectors_path(self, meta):
+        # Indexes from before generations kept their vectors in vectors.f32
+        return os.path.join(self.directory, meta.get("vectors", "vectors.f32"))
+
+    def _new_vectors_file(self):
+        """Name of an unused generation of the vector file"""
+        generations = [int(name[len("vectors-"):-len(".f32")]) for name in os.listdir(self.directory)
+                       if re.fullmatch(r"vectors-\d+\.f32", name)]
+        return f"vectors-{max(generations, default=0) + 1}.f32"
+
+    def _remove_stale_vectors(self, meta):
+        """Delete vector files the current metadata no longer names (left by compactions or crashes)"""
+        current = os.path.basename(self._vectors_path(meta))
+        for name in os.listdir(self.directory):
+            if name != current and (name in ("vectors.f32", "vectors.f32.tmp") or re.fullmatch(r"vectors-\d+\.f32", name)):
+                try:
+                    # Readers still mapping it keep their pages until they reload
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:  # Windows won't delete a mapped file; the next build retries
+                    pass
+
+    def build(self, paths):
+        """Bring the index up to date with the given files; returns how many files were (re)indexed"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "LOCK"), "a+") as lock_file:
+            # One builder at a time across processes; the others wait, then find nothing to do
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                return self._build_locked(paths)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _build_locked(self, paths):
+        meta = self._read_meta()
+        if meta is None or not os.path.exists(self._vectors_path(meta)):
+            # A fresh file, never one an existing reader may still be mapping
+            meta = {"version": INDEX_VERSION, "embedder": self.embedder.name, "dim": self.embedder.dim,
+                    "vectors": self._new_vectors_file(), "chunks": [], "files": {}}
+            open(self._vectors_path(meta), "wb").close()
+            df = np.zeros(self.embedder.dim, dtype=np.float32)
+        else:
+            df = np.load(self.df_path)
+            # Drop rows a build appended before crashing short of its metadata swap; no reader maps them
+            with open(self._vectors_path(meta), "r+b") as f:
+                f.truncate(len(meta["chunks"]) * meta["dim"] * np.dtype(np.float32).itemsize)
+
+        chunks, files = meta["chunks"], meta["files"]
+        sources = {os.path.relpath(path, BASE_DIR): path for path in paths}
+        changed = 0
+
+        def retire(source):
+            for row in files.pop(source, {}).get("rows", []):
+                chunks[row]["live"] = False
+                for bucket in self.embedder.counts(chunks[row]["text"]):
+                    df[bucket] -= 1
+
+        for source in list(files):
+            if source not in sources:
+                retire(source)
+                changed += 1
+
+        for source, path in sorted(sources.items()):
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+            if files.get(source, {}).get("digest") == digest:
+                continue
+            retire(source)
+            new_chunks = chunk_markdown(text, source)
+            vectors = self.embedder.embed_documents([chunk["text"] for chunk in new_chunks])
+            with open(self._vectors_path(meta), "ab") as f:
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            rows = list(range(len(chunks), len(chunks) + len(new_chunks)))
+            for chunk in new_chunks:
+                chunk["live"] = True
+                for bucket in self.embedder.counts(chunk["text"]):
+                    df[bucket] += 1
+            chunks.extend(new_chunks)
+            files[source] = {"digest": digest, "rows": rows}
+            changed += 1
+
+        live = sum(1 for chunk in chunks if chunk["live"])
+        if len(chunks) - live > live:
+            self._compact(meta)
+
+        if changed or not os.path.exists(self.meta_path):
+            np.save(self.df_path + ".tmp.npy", df)
+            os.replace(self.df_path + ".tmp.npy", self.df_path)
+            # The metadata is replaced last: readers only see rows it lists, which are already on disk
+            tmp = self.meta_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp, self.meta_path)
+            self._remove_stale_vectors(meta)
+        return changed
+
+    def _compact(self, meta):
+        """Write the live rows to a new generation of the vector file
+
+        The old file stays in place until the new metadata has replaced the old,
+        so a reader (or a crash) in between still finds the file the metadata names.
+        """
+        dim = meta["dim"]
+        matrix = np.fromfile(self._vectors_path(meta), dtype=np.float32).reshape(-1, dim)
+        keep = [row for row, chunk in enumerate(meta["chunks"]) if chunk["live"]]
+        renumber = {old: new for new, old in enumerate(keep)}
+        meta["vectors"] = self._new_vectors_file()
+        matrix[keep].tofile(self._vectors_path(meta))
+        meta["chunks"] = [meta["chunks"][row] for row in keep]
+        for entry in meta["files"].values():
+            entry["rows"] = [renumber[row] for row in entry["rows"]]
+
+    # Searching
+
+    def _refresh(self):
+        """Map the latest index if it changed on disk"""
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._loaded_mtime:
+            return self._matrix is not None
+        with self._lock:
+            meta = self._read_meta()
+            if meta is None:
+                return False
+            chunks = meta["chunks"]
+            if chunks:
+                try:
+                    matrix = np.memmap(self._vectors_path(meta), dtype=np.float32, mode="r",
+                                       shape=(len(chunks), meta["dim"]))
+                except (OSError, ValueError):
+                    # A compaction swapped the metadata after we read it; keep the old mapping and retry next time
+                    return self._matrix is not None
+            else:
+                matrix = np.zeros((0, meta["dim"]), dtype=np.float32)
+            live = np.array([chunk["live"] for chunk in chunks], dtype=bool)
+            idf = None
+            if self.embedder.uses_idf:
+                df = np.load(self.df_path)
+                idf = (np.log((1.0 + live.sum()) / (1.0 + np.maximum(df, 0))) + 1.0).astype(np.float32)
+            self._matrix, self._live, self._idf, self.chunks = matrix, live, idf, chunks
+            self._loaded_mtime = mtime
+        return True
+
+    def query_vectors(self, queries):
+        self._refresh()
+        return np.stack([self.embedder.embed_query(query, self._idf) for query in queries])
+
+    def search_batch(self, queries, k=3):
+        """Top-k (score, chunk) pairs for each query, scored in one matrix product"""
+        if not self._refresh() or not len(self.chunks):
+            return [[] for _ in queries]
+        matrix, live, chunks = self._matrix, self._live, self.chunks
+        scores = self.query_vectors(queries) @ matrix.T
+        scores[:, ~live] = -np.inf
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(scores, top):
+            ordered = candidates[np.argsort(-row[candidates])]
+            results.append([(float(row[i]), chunks[i]) for i in ordered if np.isfinite(row[i])])
+        return results
+
+    def search(self, query, k=3):
+        return self.search_batch([query], k)[0]
+
+
+class TurnMemory:
+    """Vectors of each conversation's earlier turns, kept in this process"""
+
+    def __init__(self, embedder, turns_per_session=50, max_sessions=1000):
+        self.embedder = embedder
+        self.turns_per_session = turns_per_session
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, session_id, messages):
+        if not messages:
+            return
+        texts = [f"{message['role'].capitalize()}: {message['content']}" for message in messages]
+        vectors = self.embedder.embed_documents(texts)
+        with self._lock:
+            turns = self._sessions.pop(session_id, None) or deque(maxlen=self.turns_per_session)
+            turns.extend(zip(vectors, texts))
+            self._sessions[session_id] = turns
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def search(self, session_id, query_vector, k=2):
+        with self._lock:
+            turns = list(self._sessions.get(session_id, ()))
+        if not turns:
+            return []
+        scores = np.stack([vector for vector, _ in turns]) @ query_vector
+        top = np.argsort(-scores)[:k]
+        return [(float(scores[i]), {"source": "earlier in this conversation", "title": "", "text": turns[i][1]})
+                for i in top]
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class Retriever:
+    """Relevant documentation and earlier turns for a user message, formatted for the prompt"""
+
+    def __init__(self, index, memory=None, paths=(), top_k=3, min_score=0.15, max_tokens=600):
+        self.index = index
+        self.memory = memory
+        self.paths = list(paths)
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_tokens = max_tokens
+        self._built = False
+        self._build_lock = threading.Lock()
+
+    def ensure_index(self):
+        """Bring the on-disk index up to date once per process"""
+        if not self._built:
+            with self._build_lock:
+                if not self._built:
+                    self.index.build(self.paths)
+                    self._built = True
+
+    def retrieve(self, query, session_id=None):
+        """Passages above the relevance threshold, best first"""
+        self.ensure_index()
+        results = self.index.search(query, self.top_k)
+        if self.memory is not None and session_id is not None:
+            results += self.memory.search(session_id, self.index.query_vectors([query])[0])
+        results.sort(key=lambda result: result[0], reverse=True)
+        return [chunk for score, chunk in results if score >= self.min_score]
+
+    def context_message(self, query, session_id=None):
+        """A system message with the retrieved passages, within the token cap, or None"""
+        passages = []
+        used = 0
+        for chunk in self.retrieve(query, session_id):
+            passage = f"[{chunk['source']}] {chunk['text']}"
+            tokens = count_tokens(passage)
+            if used + tokens > self.max_tokens:
+                continue
+            passages.append(passage)
+            used += tokens
+        if not passages:
+            return None
+        return {
+            "role": "system",
+            "content": "Relevant excerpts from the IntelliMind documentation and this conversation; "
+                       "use them if they help answer the user:\n\n" + "\n\n".join(passages),
+        }
+
+    def remember(self, session_id, messages):
+        """Index turns that left the conversation window"""
+        if self.memory is not None:
+            self.memory.add(session_id, messages)
+
+    def forget(self, session_id):
+        if self.memory is not None:
+            self.memory.clear(session_id)
+
+
+def document_paths():
+    """Markdown files to index, from RETRIEVAL_DOCS (comma-separated globs relative to the app)"""
+    patterns = os.getenv("RETRIEVAL_DOCS", "*.md").split(",")
+    paths = set()
+    for pattern in patterns:
+        paths.update(glob.glob(os.path.join(BASE_DIR, pattern.strip())))
+    return sorted(paths)
+
+
+def create_embedder():
+    name = os.getenv("RETRIEVAL_EMBEDDER", "hashed-tfidf")
+    if name == "hashed-tfidf":
+        return HashedTfidfEmbedder(dim=int(os.getenv("RETRIEVAL_DIM", "4096")))
+    return SentenceTransformerEmbedder(name)
+
+
+def create_retriever():
+    """Build the retriever, or None when RETRIEVAL is off"""
+    if os.getenv("RETRIEVAL", "true").lower() not in ("1", "true", "yes"):
+        return None
+    embedder = create_embedder()
+    index = DocumentIndex(os.getenv("RETRIEVAL_INDEX_DIR", os.path.join(BASE_DIR, "retrieval_index")), embedder)
+    memory = None
+    if int(os.getenv("RETRIEVAL_TURN_MEMORY", "50")) > 0:
+        memory = TurnMemory(embedder, turns_per_session=int(os.getenv("RETRIEVAL_TURN_MEMORY", "50")))
+    return Retriever(
+        index,
+        memory,
+        paths=document_paths(),
+        top_k=int(os.getenv("RETRIEVAL_TOP_K", "3")),
+        min_score=float(os.getenv("RETRIEVAL_MIN_SCORE", "0.15")),
+        max_tokens=int(os.getenv("RETRIEVAL_MAX_TOKENS", "600")),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the IntelliMind documentation index")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("build", help="Index new and changed documents")
+    search = subcommands.add_parser("search", help="Show the passages retrieved for a query")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    retriever = create_retriever() or Retriever(DocumentIndex(
+        os.path.join(BASE_DIR, "retrieval_index"), create_embedder()), paths=document_paths())
+
+    if args.command == "build":
+        start = time.perf_counter()
+        changed = retriever.index.build(retriever.paths)
+        retriever.index._refresh()
+        print(f"📚 Indexed {changed} changed file(s); {int(retriever.index._live.sum())} chunks "
+              f"from {len(retriever.paths)} file(s) in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return 0
+
+    retriever.ensure_index()
+    start = time.perf_counter()
+    results = retriever.index.search(args.query, args.k)
+    elapsed = (time.perf_counter() - start) * 1000
+    for score, chunk in results:
+        marker = "✅" if score >= retriever.min_score else "  "
+        print(f"{marker} {score:.3f}  [{chunk['source']}] {chunk['title']}")
+        print("      " + chunk["text"][:160].replace("\n", " "))
+    print(f"⏱️  {elapsed:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+IntelliMind Assistant - Request Scheduler
+Sits between the routes and the upstream LLM call to smooth bursts:
+
+- single-flight: identical in-flight prompts share one upstream request; each
+  follower still waits only as long as its own deadline allows, and if the
+  leader gives up (its client went away or its deadline passed) a waiting
+  follower re-issues the call rather than failing with it
+- a concurrency limit on upstream calls per worker process
+- fair queuing: waiting requests are served round-robin across sessions, so
+  one busy session can't starve the others
+- background work (prepared answers) runs at low priority: only in the idle
+  half of the slots while nobody waits, and it never queues
+"""
+
+import asyncio
+import math
+import os
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+from cancellation import CANCEL_POLL_INTERVAL, RequestCancelledError, check_cancelled, count_cancellation, remaining
+from resilience import UpstreamTimeoutError
+
+
+class SchedulerBusyError(Exception):
+    """Raised when a request can't get an upstream slot (queue full or wait timed out)"""
+
+
+class _FairQueue:
+    """Slot accounting and per-session round-robin wait queues shared by both schedulers"""
+
+    def __init__(self, max_concurrency, max_queue, queue_timeout):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.queued = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.deferred = 0
+        # session_id -> deque of waiting tickets; sessions are served in insertion order
+        self._waiting = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _enter(self, session_id, make_ticket):
+        """Take a free slot (returns None) or enqueue and return a ticket to wait on"""
+        with self._lock:
+            if self.running < self.max_concurrency and not self.queued:
+                self.running += 1
+                return None
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerBusyError("Too many requests are waiting for the model")
+            ticket = make_ticket()
+            self._waiting.setdefault(session_id, deque()).append(ticket)
+            self.queued += 1
+            return ticket
+
+    def _enter_background(self):
+        """Take a slot for background work if the upstream is idle, else raise SchedulerBusyError"""
+        with self._lock:
+            # Half the slots stay free for requests, so a burst never finds them all taken
+            if self.queued or self.running >= max(1, self.max_concurrency // 2):
+                self.deferred += 1
+                raise SchedulerBusyError("The model is busy; background work waits for an idle moment")
+            self.running += 1
+
+    def _abandon(self, session_id, ticket, rejected=True):
+        """Withdraw a waiting ticket; returns False if it was granted meanwhile"""
+        with self._lock:
+            if ticket.is_set():
+                return False
+            queue = self._waiting[session_id]
+            queue.remove(ticket)
+            if not queue:
+                del self._waiting[session_id]
+            self.queued -= 1
+            if rejected:
+                self.rejected += 1
+            return True
+
+    def _leave(self):
+        """Free a slot, handing it straight to the next session in round-robin order"""
+        with self._lock:
+            if not self._waiting:
+                self.running -= 1
+                return
+            session_id, queue = self._waiting.popitem(last=False)
+            ticket = queue.popleft()
+            if queue:
+                # The session goes to the back of the line for its next request
+                self._waiting[session_id] = queue
+            self.queued -= 1
+            ticket.set()
+
+    def stats(self):
+        """Queue depth and counters for this worker"""
+        return {
+            "running": self.running,
+            "queue_depth": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "background_deferred": self.deferred,
+        }
+
+
+class _Flight:
+    """Result of an in-flight upstream call that identical requests wait on"""
+
+    def __init__(self, done):
+        self.done = done
+        self.result = None
+        self.error = None
+        # The leader gave up for reasons of its own; followers must not inherit its failure
+        self.abandoned = False
+
+
+class RequestScheduler(_FairQueue):
+    """Scheduler for the threaded (WSGI) serving path"""
+
+    @contextmanager
+    def slot(self, session_id):
+        """Hold one upstream slot for the duration of the block"""
+        ticket = self._enter(session_id, threading.Event)
+        # A request never waits in the queue past its own deadline
+        if ticket is not None and not ticket.wait(remaining(self.queue_timeout)):
+            if self._abandon(session_id, ticket):
+                raise SchedulerBusyError("Timed out waiting for a free model slot")
+        try:
+            yield
+        finally:
+            self._leave()
+
+    @contextmanager
+    def background_slot(self):
+        """Hold a low-priority slot for the block; raises SchedulerBusyError at once unless idle"""
+        self._enter_background()
+        try:
+            yield
+        finally:
+            self._leave()
+
+    @staticmethod
+    def _follow(flight):
+        """Wait for the leader's result until this request's own deadline, or until its client goes away"""
+        # Without a deadline of its own the follower waits as long as the leader, which has one
+        while not flight.done.wait(min(CANCEL_POLL_INTERVAL, remaining(math.inf))):
+            if remaining(math.inf) <= 0:
+                count_cancellation('deadline', 'complete')
+                raise UpstreamTimeoutError("The model did not respond in time")
+            check_cancelled('complete')
+
+    def run(self, session_id, key, fn):
+        """Call fn() under a slot, sharing the result with identical concurrent requests
+
+        Only the leader calls fn(); followers get its result (or error). If the
+        leader abandons the call, the first follower to notice takes over with its own fn().
+        """
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight(threading.Event())
+                else:
+                    self.coalesced += 1
+
+            if not leader:
+                self._follow(flight)
+                if flight.abandoned:
+                    continue
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+
+            try:
+                with self.slot(session_id):
+                    flight.result = fn()
+                return flight.result
+            except Exception as e:
+                # A cancelled leader, or one out of time, fails alone; anything else is shared
+                if not isinstance(e, RequestCancelledError) and remaining(math.inf) > 0:
+                    flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.abandoned = flight.result is None and flight.error is None
+                flight.done.set()
+
+
+class AsyncRequestScheduler(_FairQueue):
+    """Scheduler for the asyncio (ASGI) serving path"""
+
+    @asynccontextmanager
+    async def slot(self, session_id):
+        """Hold one upstream slot for the duration of the block"""
+        ticket = self._enter(session_id, asyncio.Event)
+        if ticket is not None:
+            try:
+                await asyncio.wait_for(ticket.wait(), remaining(self.queue_timeout))
+            except asyncio.TimeoutError:
+                if self._abandon(session_id, ticket):
+                    raise SchedulerBusyError("Timed out waiting for a free model slot")
+            except asyncio.CancelledError:
+                # A cancelled waiter must not leak the slot it may just have been handed
+                if not self._abandon(session_id, ticket, rejected=False):
+                    self._leave()
+                raise
+        try:
+            yield
+        finally:
+            self._leave()
+
+    async def run(self, session_id, key, coroutine_fn):
+        """Await coroutine_fn() under a slot, sharing the result with identical concurrent requests
+
+        Only the leader awaits coroutine_fn(); followers get its result (or error).
+        If the leader abandons the call, the first follower to wake takes over.
+        """
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            self.coalesced += 1
+            # Cancelling this request's task (its client went away) cancels only its own wait
+            timeout = remaining(math.inf)
+            try:
+                await asyncio.wait_for(flight.done.wait(), None if timeout == math.inf else timeout)
+            except asyncio.TimeoutError:
+                count_cancellation('deadline', 'complete')
+                raise UpstreamTimeoutError("The model did not respond in time")
+            if flight.abandoned:
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        flight = self._flights[key] = _Flight(asyncio.Event())
+        try:
+            async with self.slot(session_id):
+                flight.result = await coroutine_fn()
+            return flight.result
+        except Exception as e:
+            # A leader out of time fails alone; a cancelled one never gets here
+            if not isinstance(e, RequestCancelledError) and remaining(math.inf) > 0:
+                flight.error = e
+            raise
+        finally:
+            del self._flights[key]
+            flight.abandoned = flight.result is None and flight.error is None
+            flight.done.set()
+
+
+def scheduler_settings():
+    """Scheduler limits from the environment"""
+    return {
+        "max_concurrency": int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "16")),
+        "max_queue": int(os.getenv("SCHEDULER_MAX_QUEUE", "256")),
+        "queue_timeout": float(os.getenv("SCHEDULER_QUEUE_TIMEOUT", "30")),
+    }
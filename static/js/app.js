@@ -23,12 +23,21 @@ class IntelliMindApp {
         this.isSpeaking = false;
         this.lastAssistantMessage = '';
         
+        // Streaming state: the in-flight request's AbortController, the text received so far,
+        // and how much of it has already been handed to speech synthesis
+        this.controller = null;
+        this.streamingText = '';
+        this.speakingStream = false;
+        this.spokenLength = 0;
+        this.speechQueued = 0;
+        
         // Voice settings
         this.voiceSettings = {
             rate: 0.9,
             pitch: 1,
             volume: 0.8,
-            lang: 'en-US'
+            lang: 'en-US',
+            autoSpeak: false
         };
         
         this.initializeEventListeners();
@@ -39,8 +48,14 @@ class IntelliMindApp {
     }
     
     initializeEventListeners() {
-        // Send message on button click
-        this.sendButton.addEventListener('click', () => this.sendMessage());
+        // Send message on button click (the button stops the response while one is streaming)
+        this.sendButton.addEventListener('click', () => {
+            if (this.controller && !this.messageInput.value.trim()) {
+                this.abortRequest();
+            } else {
+                this.sendMessage();
+            }
+        });
         
         // Voice button click
         this.voiceButton.addEventListener('click', () => this.toggleVoiceRecognition());
@@ -69,6 +84,9 @@ class IntelliMindApp {
         // Clear conversation
         this.clearButton.addEventListener('click', () => this.clearConversation());
         
+        // Leaving the page cancels the response, so the server stops generating it
+        window.addEventListener('pagehide', () => this.abortRequest());
+        
         // Focus input on load
         this.messageInput.focus();
     }
@@ -134,44 +152,89 @@ class IntelliMindApp {
     
     speakLastResponse() {
         if (this.isSpeaking) {
-            this.synthesis.cancel();
-            this.isSpeaking = false;
-            this.speakButton.innerHTML = '<i class="fas fa-volume-up"></i>';
+            this.stopSpeaking();
             this.updateStatus('Speech stopped', 'ready');
             return;
         }
         
+        // A response that is still streaming is read out sentence by sentence as it arrives
+        if (this.controller) {
+            this.startStreamSpeech();
+            this.speakSentences(this.streamingText, false);
+            return;
+        }
+        
         if (!this.lastAssistantMessage) {
             this.updateStatus('No message to speak', 'error');
             return;
         }
         
+        this.queueUtterance(this.lastAssistantMessage);
+    }
+    
+    startStreamSpeech() {
+        this.stopSpeaking();
+        this.speakingStream = true;
+        this.spokenLength = 0;
+    }
+    
+    speakSentences(text, final) {
+        // Speak every sentence that has fully arrived; the rest waits for more tokens
+        // (a sentence ends at . ! or ? followed by whitespace, so "3.5" isn't split)
+        const pending = text.slice(this.spokenLength);
+        const complete = final ? pending : (pending.match(/^[\s\S]*[.!?](?=\s)/) || [''])[0];
+        if (!complete.trim()) return;
+        
+        this.spokenLength += complete.length;
+        this.queueUtterance(complete.trim());
+    }
+    
+    queueUtterance(text) {
         this.isSpeaking = true;
         this.speakButton.innerHTML = '<i class="fas fa-stop"></i>';
         this.updateStatus('Speaking...', 'typing');
         
-        const utterance = new SpeechSynthesisUtterance(this.lastAssistantMessage);
+        const utterance = new SpeechSynthesisUtterance(text);
         utterance.rate = this.voiceSettings.rate;
         utterance.pitch = this.voiceSettings.pitch;
         utterance.volume = this.voiceSettings.volume;
         utterance.lang = this.voiceSettings.lang;
         
+        // speechSynthesis plays queued utterances in order; we're done when the last one ends
+        this.speechQueued++;
         utterance.onend = () => {
-            this.isSpeaking = false;
-            this.speakButton.innerHTML = '<i class="fas fa-volume-up"></i>';
-            this.updateStatus('Ready', 'ready');
+            this.speechQueued = Math.max(this.speechQueued - 1, 0);
+            if (!this.speechQueued && !this.speakingStream) {
+                this.resetSpeakButton();
+                this.updateStatus('Ready', 'ready');
+            }
         };
         
         utterance.onerror = (event) => {
+            // Cancelling speech reports 'interrupted'/'canceled'; that's not a failure
+            if (event.error === 'interrupted' || event.error === 'canceled') return;
             console.error('Speech synthesis error:', event.error);
-            this.isSpeaking = false;
-            this.speakButton.innerHTML = '<i class="fas fa-volume-up"></i>';
+            this.stopSpeaking();
             this.updateStatus('Speech error', 'error');
         };
         
         this.synthesis.speak(utterance);
     }
     
+    stopSpeaking() {
+        this.speakingStream = false;
+        this.speechQueued = 0;
+        if (this.synthesis) {
+            this.synthesis.cancel();
+        }
+        this.resetSpeakButton();
+    }
+    
+    resetSpeakButton() {
+        this.isSpeaking = false;
+        this.speakButton.innerHTML = '<i class="fas fa-volume-up"></i>';
+    }
+    
     initializeSettings() {
         // Load saved settings from localStorage
         const savedSettings = localStorage.getItem('intellimind-voice-settings');
@@ -184,6 +247,7 @@ class IntelliMindApp {
         const pitchSlider = document.getElementById('voicePitch');
         const volumeSlider = document.getElementById('voiceVolume');
         const langSelect = document.getElementById('voiceLang');
+        const autoSpeakToggle = document.getElementById('autoSpeak');
         const testButton = document.getElementById('testVoice');
         
         // Update sliders with current values
@@ -191,6 +255,7 @@ class IntelliMindApp {
         pitchSlider.value = this.voiceSettings.pitch;
         volumeSlider.value = this.voiceSettings.volume;
         langSelect.value = this.voiceSettings.lang;
+        autoSpeakToggle.checked = this.voiceSettings.autoSpeak;
         
         // Update display values
         document.getElementById('rateValue').textContent = this.voiceSettings.rate;
@@ -224,6 +289,11 @@ class IntelliMindApp {
             this.saveSettings();
         });
         
+        autoSpeakToggle.addEventListener('change', (e) => {
+            this.voiceSettings.autoSpeak = e.target.checked;
+            this.saveSettings();
+        });
+        
         testButton.addEventListener('click', () => this.testVoiceSettings());
         
         // Close modal when clicking outside
@@ -291,6 +361,11 @@ class IntelliMindApp {
         const message = this.messageInput.value.trim();
         if (!message) return;
         
+        // Sending again while a response is streaming replaces it
+        this.abortRequest();
+        const controller = new AbortController();
+        this.controller = controller;
+        
         // Add user message to chat
         this.addMessage(message, 'user');
         
@@ -299,39 +374,147 @@ class IntelliMindApp {
         this.messageInput.style.height = 'auto';
         this.updateCharacterCount();
         
-        // Disable send button and show loading
-        this.sendButton.disabled = true;
+        // Turn the send button into a stop button and show loading
+        this.setSendButtonStopping(true);
         this.showLoading();
         this.updateStatus('IntelliMind is thinking...', 'typing');
         
         try {
-            const response = await fetch('/chat', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ message: message })
-            });
-            
-            const data = await response.json();
+            await this.streamResponse(message, controller.signal);
+            this.updateStatus('Ready', 'ready');
             
-            if (data.status === 'success') {
-                // Add assistant response to chat
-                this.addMessage(data.response, 'assistant');
-                this.updateStatus('Ready', 'ready');
+        } catch (error) {
+            if (error.name === 'AbortError') {
+                if (this.controller === controller) {
+                    this.updateStatus('Response stopped', 'ready');
+                }
             } else {
-                throw new Error(data.error || 'Unknown error occurred');
+                console.error('Error:', error);
+                this.addMessage(`I apologize, but I encountered an error: ${error.message}. Please try again.`, 'assistant');
+                this.updateStatus('Error occurred', 'error');
+            }
+        } finally {
+            // A newer request owns the UI if this one was replaced
+            if (this.controller === controller) {
+                this.controller = null;
+                this.hideLoading();
+                this.setSendButtonStopping(false);
+                this.messageInput.focus();
+            }
+        }
+    }
+    
+    abortRequest() {
+        // Closing the connection makes the server cancel the upstream generation
+        if (this.controller) {
+            this.controller.abort();
+        }
+    }
+    
+    setSendButtonStopping(stopping) {
+        this.sendButton.innerHTML = stopping ? '<i class="fas fa-stop"></i>' : '<i class="fas fa-paper-plane"></i>';
+        this.sendButton.title = stopping ? 'Stop response' : '';
+    }
+    
+    async streamResponse(message, signal) {
+        const response = await fetch('/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ message: message }),
+            signal: signal
+        });
+        
+        if (!response.ok || !response.body) {
+            const data = await response.json().catch(() => ({}));
+            throw new Error(data.error || `Request failed with status ${response.status}`);
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+        let messageText = null;
+        let frameRequest = null;
+        
+        // Tokens arrive faster than the screen refreshes, so the DOM is updated at most once per frame
+        const render = () => {
+            frameRequest = null;
+            messageText.innerHTML = this.formatMessage(text);
+            this.scrollToBottom();
+        };
+        
+        this.streamingText = '';
+        if (this.voiceSettings.autoSpeak && this.synthesis) {
+            this.startStreamSpeech();
+        }
+        
+        try {
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                
+                // SSE frames are separated by a blank line; keep any partial frame for the next chunk
+                buffer += decoder.decode(value, { stream: true });
+                const frames = buffer.split('\n\n');
+                buffer = frames.pop();
+                
+                for (const frame of frames) {
+                    const event = this.parseEvent(frame);
+                    if (event.type === 'error') {
+                        throw new Error(event.data.error || 'Unknown error occurred');
+                    }
+                    if (!event.data.token) continue;
+                    
+                    // Add the assistant message as soon as the first token arrives
+                    if (!messageText) {
+                        this.hideLoading();
+                        messageText = this.addMessage('', 'assistant');
+                    }
+                    text += event.data.token;
+                    this.streamingText = text;
+                    if (frameRequest === null) {
+                        frameRequest = requestAnimationFrame(render);
+                    }
+                    if (this.speakingStream) {
+                        this.speakSentences(text, false);
+                    }
+                }
             }
-            
-        } catch (error) {
-            console.error('Error:', error);
-            this.addMessage(`I apologize, but I encountered an error: ${error.message}. Please try again.`, 'assistant');
-            this.updateStatus('Error occurred', 'error');
         } finally {
-            this.hideLoading();
-            this.sendButton.disabled = false;
-            this.messageInput.focus();
+            // Show everything received, including a partial response that was stopped
+            if (frameRequest !== null) {
+                cancelAnimationFrame(frameRequest);
+                render();
+            }
+            if (this.speakingStream) {
+                this.speakSentences(text, true);
+                this.speakingStream = false;
+                if (!this.speechQueued) {
+                    this.resetSpeakButton();
+                }
+            }
+            if (messageText) {
+                this.lastAssistantMessage = text;
+            }
+        }
+        
+        if (!messageText) {
+            throw new Error('Empty response received');
+        }
+    }
+    
+    parseEvent(frame) {
+        const event = { type: 'message', data: {} };
+        for (const line of frame.split('\n')) {
+            if (line.startsWith('event:')) {
+                event.type = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                event.data = JSON.parse(line.slice(5));
+            }
         }
+        return event;
     }
     
     addMessage(text, sender) {
@@ -358,6 +541,7 @@ class IntelliMindApp {
         }
         
         this.scrollToBottom();
+        return messageDiv.querySelector('.message-text');
     }
     
     formatMessage(text) {
@@ -0,0 +1,170 @@
+"""
+IntelliMind Assistant - Conversation Summaries
+Folds turns that fall out of the conversation window into a rolling summary,
+so long sessions keep their context without sending every old turn upstream.
+
+Summaries are written by a background worker thread, off the request path. A
+request sends whatever summary is stored when it starts; turns evicted by that
+request are folded in before a later one reads it. Summaries live in a store
+namespace of their own, so they never count as conversations.
+
+Summary calls go upstream at low priority, through the same scheduler, usage
+accounting and metrics as requests; while the model is busy they wait and retry.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from conversation_store import create_conversation_store
+from scheduler import SchedulerBusyError
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and IntelliMind Assistant. "
+    "Update the summary with the new turns below. Keep names, facts, preferences, decisions and open "
+    "questions; drop pleasantries. Reply with the updated summary only, in at most {words} words."
+)
+# A job the busy upstream turned away is tried again after this long
+BUSY_RETRY_SECONDS = 2.0
+# Tenant the summary calls' tokens are accounted under
+SUMMARY_TENANT = "background:summaries"
+
+def format_turns(messages):
+    """Plain-text transcript of evicted messages"""
+    return "\n".join(f"{message['role'].capitalize()}: {message['content']}" for message in messages)
+
+
+class ConversationSummarizer:
+    """Background worker that keeps a rolling summary of each conversation's evicted turns"""
+
+    def __init__(self, store, generate, max_tokens=200, max_pending=1000):
+        # Keyed by session id, apart from the conversations themselves
+        self.store = store
+        # generate(messages, params, tenant) -> response at low priority; SchedulerBusyError when busy
+        self.generate = generate
+        self.max_tokens = max_tokens
+        self.max_pending = max_pending
+        self._pending = OrderedDict()
+        self._condition = threading.Condition()
+        # Session the worker is summarizing, and whether it was cleared meanwhile
+        self._current = None
+        self._cancelled = False
+        self._worker = None
+        self._pid = None
+
+    def summary(self, session_id):
+        """The session's stored summary text, or None"""
+        stored = self.store.load(session_id)
+        return stored[0]["content"] if stored else None
+
+    def load(self, session_id):
+        """The session's summary as a system message for the prompt, or None"""
+        summary = self.summary(session_id)
+        if summary is None:
+            return None
+        return {"role": "system", "content": f"Summary of the earlier conversation: {summary}"}
+
+    def submit(self, session_id, evicted):
+        """Queue evicted messages to be folded into the session's summary"""
+        if not evicted:
+            return
+        with self._condition:
+            if session_id in self._pending:
+                # Jobs for the same session are merged, so a busy session costs one upstream call
+                self._pending[session_id].extend(evicted)
+            elif len(self._pending) >= self.max_pending:
+                metrics.SUMMARY_JOBS.inc(result='dropped')
+                return
+            else:
+                self._pending[session_id] = list(evicted)
+            self._ensure_worker()
+            self._condition.notify()
+
+    def clear(self, session_id):
+        """Forget the session's summary and any turns waiting to be summarized"""
+        with self._condition:
+            self._pending.pop(session_id, None)
+            if self._current == session_id:
+                # The running job must not save its summary after this
+                self._cancelled = True
+            self.store.clear(session_id)
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def _ensure_worker(self):
+        # Threads don't survive fork(), so each process starts its own worker on first use
+        if self._worker is None or self._pid != os.getpid():
+            self._worker = threading.Thread(target=self._run, name='summarizer', daemon=True)
+            self._pid = os.getpid()
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                session_id, evicted = self._pending.popitem(last=False)
+                self._current, self._cancelled = session_id, False
+            start = time.perf_counter()
+            busy = False
+            try:
+                saved = self.summarize(session_id, evicted)
+                metrics.SUMMARY_JOBS.inc(result='ok' if saved else 'cancelled')
+            except SchedulerBusyError:
+                # Requests come first: put the turns back and try again shortly
+                metrics.SUMMARY_JOBS.inc(result='busy')
+                self._requeue(session_id, evicted)
+                busy = True
+            except Exception as e:
+                # The turns are lost from the summary, but the conversation itself is unaffected
+                metrics.SUMMARY_JOBS.inc(result='error')
+                print(f"⚠️  Summarizing conversation failed: {e}")
+            finally:
+                with self._condition:
+                    self._current = None
+            if busy:
+                time.sleep(BUSY_RETRY_SECONDS)
+                continue
+            metrics.SUMMARY_SECONDS.observe(time.perf_counter() - start)
+
+    def _requeue(self, session_id, evicted):
+        """Queue a turned-away job again, ahead of turns the session evicted since"""
+        with self._condition:
+            # Unless the session was cleared while the job ran
+            if not self._cancelled:
+                self._pending[session_id] = evicted + self._pending.get(session_id, [])
+                self._pending.move_to_end(session_id, last=False)
+
+    def summarize(self, session_id, evicted):
+        """Fold evicted messages into the stored summary; False if the session was cleared meanwhile"""
+        previous = self.summary(session_id)
+        turns = format_turns(evicted)
+        if previous is not None:
+            turns = f"Current summary:\n{previous}\n\nNew turns:\n{turns}"
+        messages = [
+            {"role": "system", "content": SUMMARY_PROMPT.format(words=self.max_tokens * 3 // 4)},
+            {"role": "user", "content": turns},
+        ]
+        summary = self.generate(messages, {"max_tokens": self.max_tokens, "temperature": 0.0}, SUMMARY_TENANT)
+        with self._condition:
+            # Checked and saved under the lock clear() takes, so a summary never outlives /clear
+            if self._cancelled and self._current == session_id:
+                return False
+            self.store.save(session_id, [{"role": "system", "content": summary.strip()}])
+        return True
+
+
+def create_summarizer(generate):
+    """Build the conversation summarizer, or None when CONVERSATION_SUMMARY is off"""
+    if os.getenv("CONVERSATION_SUMMARY", "true").lower() not in ("1", "true", "yes"):
+        return None
+    return ConversationSummarizer(
+        create_conversation_store(namespace="summaries"),
+        generate,
+        max_tokens=int(os.getenv("SUMMARY_MAX_TOKENS", "200")),
+        max_pending=int(os.getenv("SUMMARY_MAX_PENDING", "1000")),
+    )
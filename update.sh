@@ -58,6 +58,9 @@ source venv/bin/activate
 pip install --upgrade pip
 pip install -r requirements.txt
 
+# Rebuild the fingerprinted static assets
+python assets.py
+
 # Step 3: Set proper permissions
 print_status "Setting proper permissions..."
 sudo chown -R www-data:www-data $APP_DIR
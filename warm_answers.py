@@ -0,0 +1,316 @@
+"""
+IntelliMind Assistant - Warm Answers
+Answers prepared before anyone asks, so the turns users most often open with
+come back without waiting on FireworksAI.
+
+- Openers: the canonical first messages in intents.json's "warm" set ("hi",
+  "what can you do?") are generated when the worker starts and regenerated
+  every half TTL. An answer older than the TTL is never served, so if
+  refreshing fails the opener simply goes to the model again.
+- Speculation (optional): after each turn of a high-value session, the model
+  guesses the user's next question and its answer is prepared in advance.
+  It runs within an hourly token budget, charged to the session's tenant.
+
+Everything runs on one background thread per worker process. Its model calls
+go through the scheduler at low priority: they only take an idle slot and
+never queue, so when the upstream is busy a job is put off and retried
+rather than waiting (or holding the thread) for capacity.
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from intents import IntentEngine, load_intents
+from prompt_budget import prompt_tokens
+from response_cache import normalize_text
+from scheduler import SchedulerBusyError
+
+PREDICT_PROMPT = (
+    "Given the conversation below between a user and IntelliMind Assistant, write the single most likely "
+    "next message from the user. Reply with that message only."
+)
+# A guessed question is used when it shares this much of its wording with the real one
+MATCH_SIMILARITY = 0.8
+# Work put off because the upstream was busy is tried again after this long...
+BUSY_RETRY_SECONDS = 2.0
+# ...and a speculation job still waiting this long after its turn is dropped
+SPECULATION_MAX_AGE_SECONDS = 30
+# Tenant the opener answers' tokens are accounted under
+OPENERS_TENANT = "warm:openers"
+
+
+def history_digest(messages):
+    """Identifies the turn a speculative answer was made for, by the exchange that preceded it"""
+    # Only the last exchange: older messages may be evicted from the window between turns
+    digest = hashlib.sha256()
+    for message in messages[-2:]:
+        digest.update(f"{message['role']}\0{message['content']}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def similarity(first, second):
+    """Word-set overlap (Jaccard) of two normalized messages"""
+    first, second = set(first.split()), set(second.split())
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class WarmAnswers:
+    """Precomputed opener answers and speculative next-turn answers"""
+
+    def __init__(self, openers, build_prompt, generate, ttl=3600, speculate=False,
+                 tokens_per_hour=50000, high_value_keys=(), max_sessions=1000):
+        self.engine = IntentEngine(openers, whole_message=True)
+        self.openers = [opener for opener in openers if opener.prompt]
+        # build_prompt(session_id, history, user_message) -> (messages, params), as a real turn would send
+        self.build_prompt = build_prompt
+        # generate(messages, params, tenant) -> response at low priority; SchedulerBusyError when busy
+        self.generate = generate
+        self.ttl = ttl
+        self.speculate_enabled = speculate
+        self.tokens_per_hour = tokens_per_hour
+        # Compared against API keys in constant time; the keys themselves are never logged
+        self.high_value_keys = [key.encode("utf-8") for key in high_value_keys if key]
+        self.max_sessions = max_sessions
+
+        # opener name -> (response, generated_at)
+        self._answers = {}
+        self._refresh_due = 0.0
+        # session_id -> (history to speculate from, queued_at, not_before), oldest first
+        self._jobs = OrderedDict()
+        # session_id -> (history digest, normalized guessed question, response, generated_at)
+        self._speculations = OrderedDict()
+        # session_id -> tenant its speculation is charged to
+        self._high_value = OrderedDict()
+        self._budget_window = 0.0
+        self._budget_used = 0
+        self._condition = threading.Condition()
+        self._worker = None
+        self._pid = None
+
+    # Request path
+
+    def start(self):
+        """Start this process's background worker (idempotent; threads don't survive fork())"""
+        with self._condition:
+            if self._worker is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._answers = {}
+                self._refresh_due = 0.0
+                self._worker = threading.Thread(target=self._run, name='warm-answers', daemon=True)
+                self._worker.start()
+
+    def answer(self, session_id, history, user_message):
+        """A prepared answer to user_message given the earlier history, or None"""
+        self.start()
+        if not history:
+            opener = self.engine.match(user_message)
+            if opener is not None:
+                entry = self._answers.get(opener.name)
+                if entry is not None and time.time() - entry[1] <= self.ttl:
+                    metrics.WARM_ANSWERS.inc(kind='opener')
+                    return entry[0]
+            return None
+
+        with self._condition:
+            entry = self._speculations.pop(session_id, None)
+        if entry is None:
+            return None
+        digest, question, response, generated_at = entry
+        if (digest == history_digest(history) and time.time() - generated_at <= self.ttl
+                and similarity(question, normalize_text(user_message)) >= MATCH_SIMILARITY):
+            metrics.WARM_ANSWERS.inc(kind='speculative')
+            return response
+        metrics.WARM_JOBS.inc(kind='speculative', result='unused')
+        return None
+
+    def mark_high_value(self, session_id, api_key, tenant=None):
+        """Flag the session for speculation if it presents one of the high-value API keys"""
+        if not self.speculate_enabled or not api_key:
+            return
+        key = api_key.encode("utf-8")
+        if any(hmac.compare_digest(key, candidate) for candidate in self.high_value_keys):
+            with self._condition:
+                self._high_value[session_id] = tenant
+                self._high_value.move_to_end(session_id)
+                while len(self._high_value) > self.max_sessions:
+                    self._high_value.popitem(last=False)
+
+    def turn_finished(self, session_id, history):
+        """Queue speculation on the next turn of a high-value session"""
+        with self._condition:
+            if session_id not in self._high_value:
+                return
+            # A newer turn supersedes a job still waiting for the same session
+            self._jobs.pop(session_id, None)
+            if len(self._jobs) >= self.max_sessions:
+                metrics.WARM_JOBS.inc(kind='speculative', result='dropped')
+                return
+            now = time.time()
+            self._jobs[session_id] = (list(history), now, now)
+            self._condition.notify()
+
+    def forget(self, session_id):
+        with self._condition:
+            self._jobs.pop(session_id, None)
+            self._speculations.pop(session_id, None)
+            self._high_value.pop(session_id, None)
+
+    # Background worker
+
+    def _next_job(self):
+        """Wait for the opener refresh or a speculation job to come due; None means refresh"""
+        with self._condition:
+            while True:
+                now = time.time()
+                if now >= self._refresh_due:
+                    self._refresh_due = now + self.ttl / 2
+                    return None
+                for session_id, (history, queued_at, not_before) in self._jobs.items():
+                    if not_before <= now:
+                        del self._jobs[session_id]
+                        return session_id, history, queued_at
+                wake = min([self._refresh_due] + [job[2] for job in self._jobs.values()])
+                self._condition.wait(timeout=max(wake - now, 0.01))
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._refresh_openers()
+            else:
+                self._speculate(*job)
+
+    def _refresh_openers(self):
+        for opener in self.openers:
+            entry = self._answers.get(opener.name)
+            if entry is not None and time.time() - entry[1] < self.ttl / 2:
+                # Refreshed on an earlier pass that the busy upstream cut short
+                continue
+            start = time.perf_counter()
+            try:
+                messages, params = self.build_prompt(None, [], opener.prompt)
+                response = self.generate(messages, params, OPENERS_TENANT)
+                self._answers[opener.name] = (response, time.time())
+                metrics.WARM_JOBS.inc(kind='opener', result='ok')
+            except SchedulerBusyError:
+                # Requests come first: try the rest again shortly
+                metrics.WARM_JOBS.inc(kind='opener', result='busy')
+                with self._condition:
+                    self._refresh_due = min(self._refresh_due, time.time() + BUSY_RETRY_SECONDS)
+                return
+            except Exception as e:
+                # The previous answer stays until its TTL runs out, then the opener goes upstream again
+                metrics.WARM_JOBS.inc(kind='opener', result='error')
+                print(f"⚠️  Preparing the '{opener.name}' opener failed: {e}")
+            metrics.WARM_SECONDS.observe(time.perf_counter() - start, kind='opener')
+
+    def _spend(self, tokens):
+        """Charge tokens to the hourly speculation budget; False if that would exceed it"""
+        now = time.time()
+        if now - self._budget_window >= 3600:
+            self._budget_window, self._budget_used = now, 0
+        if self._budget_used + tokens > self.tokens_per_hour:
+            return False
+        self._budget_used += tokens
+        return True
+
+    def _refund(self, tokens):
+        """Return tokens reserved for a call that never ran"""
+        self._budget_used = max(0, self._budget_used - tokens)
+
+    def _defer(self, session_id, history, queued_at):
+        """Retry a speculation job the busy upstream turned away, unless it went stale or was superseded"""
+        now = time.time()
+        with self._condition:
+            if (now - queued_at < SPECULATION_MAX_AGE_SECONDS and session_id in self._high_value
+                    and session_id not in self._jobs):
+                self._jobs[session_id] = (history, queued_at, now + BUSY_RETRY_SECONDS)
+                return
+        metrics.WARM_JOBS.inc(kind='speculative', result='busy')
+
+    def _speculate(self, session_id, history, queued_at):
+        with self._condition:
+            if session_id not in self._high_value:
+                return
+            tenant = self._high_value[session_id]
+        start = time.perf_counter()
+        try:
+            transcript = "\n".join(f"{message['role'].capitalize()}: {message['content']}" for message in history[-6:])
+            predict_messages = [
+                {"role": "system", "content": PREDICT_PROMPT},
+                {"role": "user", "content": transcript},
+            ]
+            # Reserve the worst case up front: the prediction plus the answer's prompt and completion
+            predict_cost = prompt_tokens(predict_messages) + 40
+            if not self._spend(predict_cost):
+                metrics.WARM_JOBS.inc(kind='speculative', result='over_budget')
+                return
+            try:
+                question = self.generate(predict_messages, {"max_tokens": 40, "temperature": 0.0}, tenant).strip()
+            except SchedulerBusyError:
+                self._refund(predict_cost)
+                raise
+
+            messages, params = self.build_prompt(session_id, history, question)
+            answer_cost = prompt_tokens(messages) + params.get("max_tokens", 0)
+            if not self._spend(answer_cost):
+                metrics.WARM_JOBS.inc(kind='speculative', result='over_budget')
+                return
+            try:
+                response = self.generate(messages, params, tenant)
+            except SchedulerBusyError:
+                self._refund(answer_cost)
+                raise
+            with self._condition:
+                # The session moved on, or was cleared, while we were generating
+                if session_id not in self._high_value or session_id in self._jobs:
+                    return
+                self._speculations[session_id] = (
+                    history_digest(history), normalize_text(question), response, time.time())
+                self._speculations.move_to_end(session_id)
+                while len(self._speculations) > self.max_sessions:
+                    self._speculations.popitem(last=False)
+            metrics.WARM_JOBS.inc(kind='speculative', result='ok')
+        except SchedulerBusyError:
+            # Requests come first; the job is tried again once the upstream has room
+            self._defer(session_id, history, queued_at)
+            return
+        except Exception as e:
+            metrics.WARM_JOBS.inc(kind='speculative', result='error')
+            print(f"⚠️  Speculating on the next turn failed: {e}")
+        metrics.WARM_SECONDS.observe(time.perf_counter() - start, kind='speculative')
+
+    def stats(self):
+        now = time.time()
+        return {
+            "openers": {name: round(now - generated_at) for name, (_, generated_at) in self._answers.items()},
+            "ttl": self.ttl,
+            "speculation": self.speculate_enabled,
+            "speculations_ready": len(self._speculations),
+            "speculation_tokens_used": self._budget_used,
+            "speculation_tokens_per_hour": self.tokens_per_hour,
+        }
+
+
+def create_warm_answers(build_prompt, generate):
+    """Build the warm-answer layer, or None when WARM_ANSWERS is off (the default)"""
+    if os.getenv("WARM_ANSWERS", "false").lower() not in ("1", "true", "yes"):
+        return None
+    openers, _ = load_intents().get("warm", ([], {}))
+    keys = [key.strip() for key in os.getenv("WARM_SPECULATE_API_KEYS", "").split(",")]
+    return WarmAnswers(
+        openers,
+        build_prompt,
+        generate,
+        ttl=int(os.getenv("WARM_ANSWERS_TTL", "3600")),
+        speculate=os.getenv("WARM_SPECULATE", "false").lower() in ("1", "true", "yes"),
+        tokens_per_hour=int(os.getenv("WARM_SPECULATE_TOKENS_PER_HOUR", "50000")),
+        high_value_keys=keys,
+    )